@@ -0,0 +1,247 @@
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from jose import jwk, jwt
+from sqlalchemy.orm import Session
+
+from booking_states import TRANSITIONS, apply_transition, check_owner
+from models import Airport, Booking, Car
+from utils import metrics
+from utils.time_utils import as_utc
+
+# =====================================================
+# Offline access bundles for kerbside key pickup.
+#
+# Car parks often have no signal, so once a booking is confirmed the app
+# fetches a bundle (a JWS, ES256) holding what it needs at the car: the
+# lockbox BLE name and serial, the keyfob code, and the booking window.
+# The app caches it and checks the signature and nbf/exp offline against
+# the public key from /bookings/access-bundle/keys.
+#
+# The bundle is signed, not encrypted: it carries nothing the member's
+# availability and booking responses don't already show them.
+#
+# Key retrieved / returned events recorded offline are uploaded later in
+# one batch (record_key_events) and applied with the time they happened.
+# Replays are harmless: an event whose timestamp is already set is
+# reported as a duplicate and changes nothing.
+# =====================================================
+
+ALGORITHM = "ES256"
+ISSUER = "flydrive-connect"
+AUDIENCE = "lockbox"
+
+# Bookings a bundle is issued for (expired = overdue, keys not yet back)
+ISSUABLE_STATUSES = ("confirmed", "in_progress", "expired")
+
+# Window the bundle is valid for: from a little before start_time until
+# a grace period after end_time (or after now, for overdue hires)
+EARLY_ACCESS = timedelta(minutes=int(os.getenv("ACCESS_BUNDLE_EARLY_MINUTES", "30")))
+RETURN_GRACE = timedelta(hours=int(os.getenv("ACCESS_BUNDLE_GRACE_HOURS", "6")))
+
+# Device clocks drift; events stamped this far outside the bundle's
+# window (or ahead of now) are still accepted
+CLOCK_SKEW = timedelta(minutes=5)
+MAX_KEY_EVENTS = 100
+
+# Uploaded event -> transition (booking_states) it applies
+KEY_EVENTS = {
+    "keys_retrieved": "complete_keys",
+    "keys_returned": "complete_keys_return",
+}
+
+# complete_keys takes any status and sets in_progress; a pickup uploaded
+# after the hire ended mustn't reopen it
+PICKUP_STATUSES = ("confirmed", "in_progress")
+
+_key = None
+_key_lock = threading.Lock()
+
+
+# -------------------------
+# Signing key
+# -------------------------
+def signing_key() -> dict:
+    """{"pem", "kid", "jwk"} from ACCESS_BUNDLE_PRIVATE_KEY (EC P-256, PEM)."""
+    global _key
+    if _key is not None:
+        return _key
+
+    pem = os.getenv("ACCESS_BUNDLE_PRIVATE_KEY", "").replace("\\n", "\n").strip()
+    if not pem:
+        raise HTTPException(status_code=503, detail="Offline access is not configured")
+
+    with _key_lock:
+        if _key is None:
+            public = jwk.construct(pem, ALGORITHM).public_key().to_dict()
+            # Thumbprint-style id, so every worker derives the same one
+            kid = hashlib.sha256(f"{public['x']}.{public['y']}".encode()).hexdigest()[:16]
+            _key = {"pem": pem, "kid": kid, "jwk": {**public, "kid": kid, "use": "sig"}}
+    return _key
+
+
+def public_keys() -> dict:
+    """JWKS the app caches to verify bundles offline."""
+    return {"keys": [signing_key()["jwk"]]}
+
+
+# -------------------------
+# Bundles
+# -------------------------
+def issue_bundle(db: Session, bookings_id: int, member_id: int) -> dict:
+    row = (
+        db.query(
+            Booking.bookings_id,
+            Booking.status,
+            Booking.start_time,
+            Booking.end_time,
+            Car.cars_id,
+            Car.registration,
+            Car.make_model,
+            Car.lockbox_ble_name,
+            Car.lockbox_serial,
+            Car.keyfob_code,
+            Airport.name,
+            Airport.parking_description,
+        )
+        .join(Car, Car.cars_id == Booking.car_id)
+        .outerjoin(Airport, Airport.airports_id == Car.airport_id)
+        .filter(Booking.bookings_id == bookings_id, Booking.member_id == member_id)
+        .first()
+    )
+    if row is None:
+        check_owner(db, bookings_id, member_id)
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if row.status not in ISSUABLE_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot issue access bundle: booking is {row.status}",
+        )
+    if not row.lockbox_ble_name:
+        raise HTTPException(status_code=409, detail="This car has no lockbox")
+
+    now = datetime.now(timezone.utc)
+    start, end = as_utc(row.start_time), as_utc(row.end_time)
+    not_before = start - EARLY_ACCESS
+    expires_at = max(end, now) + RETURN_GRACE
+
+    key = signing_key()
+    claims = {
+        "iss": ISSUER,
+        "aud": AUDIENCE,
+        "sub": str(member_id),
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "nbf": not_before,
+        "exp": expires_at,
+        "bid": row.bookings_id,
+        "start_time": start.isoformat(),
+        "end_time": end.isoformat(),
+        "car": {
+            "cars_id": row.cars_id,
+            "registration": row.registration,
+            "make_model": row.make_model,
+            "lockbox_ble_name": row.lockbox_ble_name,
+            "lockbox_serial": row.lockbox_serial,
+            "keyfob_code": row.keyfob_code,
+        },
+        "airport": {"name": row.name, "parking_description": row.parking_description},
+    }
+    bundle = jwt.encode(claims, key["pem"], algorithm=ALGORITHM, headers={"kid": key["kid"]})
+    metrics.incr("access_bundles.issued")
+    return {
+        "bundle": bundle,
+        "kid": key["kid"],
+        "not_before": not_before,
+        "expires_at": expires_at,
+    }
+
+
+# -------------------------
+# Offline key events
+# -------------------------
+def event_window(booking, event: str, now: datetime) -> tuple[datetime, datetime]:
+    """
+    When `event` can have happened for `booking`: while its bundle was
+    valid, give or take CLOCK_SKEW. Keys come back from an overdue hire
+    after end_time, so for those the bound is now.
+    """
+    start, end = as_utc(booking.start_time), as_utc(booking.end_time)
+    latest = end + RETURN_GRACE
+    if event == "keys_returned" and booking.status == "expired":
+        latest = now
+    return start - EARLY_ACCESS - CLOCK_SKEW, min(latest, now) + CLOCK_SKEW
+
+
+def record_key_events(db: Session, member_id: int, events: list) -> tuple[list, list]:
+    """
+    Applies uploaded events oldest first (pickup before return), each as its
+    own transition. Returns (results in upload order, applied bookings).
+    """
+    now = datetime.now(timezone.utc)
+    results = [None] * len(events)
+    applied = []
+
+    # Windows for the whole batch in one query; bookings that aren't the
+    # member's are left to apply_transition to report
+    windows = {
+        row.bookings_id: row
+        for row in db.query(Booking.bookings_id, Booking.status, Booking.start_time, Booking.end_time)
+        .filter(
+            Booking.bookings_id.in_({e.bookings_id for e in events}),
+            Booking.member_id == member_id,
+        )
+    }
+
+    order = sorted(
+        range(len(events)),
+        key=lambda i: as_utc(events[i].occurred_at) if events[i].occurred_at.tzinfo else now,
+    )
+    for i in order:
+        e = events[i]
+        result = {"bookings_id": e.bookings_id, "event": e.event, "result": "applied", "detail": None}
+        results[i] = result
+
+        if e.occurred_at.tzinfo is None:
+            result.update(result="rejected", detail="occurred_at must include timezone information (UTC)")
+            continue
+        occurred_at = e.occurred_at.astimezone(timezone.utc)
+        if occurred_at > now + CLOCK_SKEW:
+            result.update(result="rejected", detail="occurred_at is in the future")
+            continue
+        booking = windows.get(e.bookings_id)
+        if booking is not None:
+            earliest, latest = event_window(booking, e.event, now)
+            if not earliest <= occurred_at <= latest:
+                result.update(result="rejected", detail="occurred_at is outside the booking's access window")
+                continue
+            if e.event == "keys_retrieved" and booking.status not in PICKUP_STATUSES:
+                result.update(result="rejected", detail=f"Cannot complete key retrieval: booking is {booking.status}")
+                continue
+
+        action = KEY_EVENTS[e.event]
+        stamp = getattr(Booking, TRANSITIONS[action].stamp)
+        try:
+            booking = apply_transition(
+                db,
+                e.bookings_id,
+                member_id,
+                action,
+                # Only the first upload of an event counts
+                conditions=(stamp.is_(None),),
+                at=occurred_at,
+                conflict_detail="Already recorded",
+            )
+        except HTTPException as exc:
+            duplicate = exc.status_code == 409
+            result.update(result="duplicate" if duplicate else "rejected", detail=exc.detail)
+            continue
+        applied.append(booking)
+
+    for r in results:
+        metrics.incr(f"key_events.{r['result']}")
+    return results, applied
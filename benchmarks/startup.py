@@ -0,0 +1,108 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+# =====================================================
+# Cold start benchmark: what a new container pays before serving.
+#
+#   python benchmarks/startup.py            # import time + first response
+#   python benchmarks/startup.py --top 20   # and the slowest imports
+#
+# import time:     python -X importtime -c "import main", summed from the
+#                  cumulative column for main (best of RUNS)
+# first response:  uvicorn main:app started, until GET / answers
+#
+# Each run is a fresh interpreter, so nothing is already imported.
+# tests/test_startup.py holds the results to STARTUP_*_BUDGET_MS.
+# =====================================================
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 3
+
+# Kept out of startup: imported on first use by utils/aws.py, routers/auth.py,
+# utils/images.py and the occupancy report (routers/cars.py)
+DEFERRED_MODULES = ("boto3", "botocore", "requests", "PIL", "numpy")
+
+
+def import_profile() -> tuple[float, dict]:
+    """(ms to import main, {package: cumulative ms}) for one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    total = None
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        ms = int(cumulative) / 1000
+        if name.strip() == "main":
+            total = ms
+        # Per package: the cumulative time of its first (outermost) import
+        package = name.strip().split(".")[0]
+        if package != "main":
+            modules[package] = max(ms, modules.get(package, 0))
+    return total, modules
+
+
+def import_time_ms(runs: int = RUNS) -> float:
+    return min(import_profile()[0] for _ in range(runs))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_response_ms(timeout: float = 30) -> float:
+    """ms from launching uvicorn until GET / returns 200."""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"No response within {timeout} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def imported_modules() -> set:
+    """Top-level packages loaded by `import main`."""
+    proc = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print('\\n'.join(sys.modules))"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return {name.split(".")[0] for name in proc.stdout.split()}
+
+
+if __name__ == "__main__":
+    top = int(sys.argv[sys.argv.index("--top") + 1]) if "--top" in sys.argv else 0
+
+    print(f"import main:     {import_time_ms():.0f} ms (best of {RUNS})")
+    print(f"first response:  {min(first_response_ms() for _ in range(RUNS)):.0f} ms (best of {RUNS})")
+    loaded = sorted(set(DEFERRED_MODULES) & imported_modules())
+    print(f"deferred modules imported at startup: {', '.join(loaded) or 'none'}")
+
+    if top:
+        _, modules = import_profile()
+        print(f"\nslowest {top} imports (cumulative):")
+        for name, ms in sorted(modules.items(), key=lambda m: -m[1])[:top]:
+            print(f"  {ms:8.1f} ms  {name}")
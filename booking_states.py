@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from crud import commit_fresh
+from models import Booking
+
+# =====================================================
+# Booking state machine.
+#
+#   confirmed --start / complete_keys--> in_progress --end--> completed
+#                                        in_progress --(overdue)--> expired --end--> completed
+#
+# complete_keys, complete_keys_return and end accept a booking in any
+# status, as they always have (the app calls them from whatever state it
+# is in at the car); only start and extend check it.
+#
+# Every transition is ONE conditional statement:
+#
+#   UPDATE bookings SET status = ..., <timestamp> = now
+#   WHERE bookings_id = ? AND member_id = ? [AND status IN (...)] [AND ...]
+#   RETURNING ...
+#
+# so two concurrent calls can't both win, and nothing is read before the
+# write. Only when no row matched do we look the booking up, to say why.
+# =====================================================
+
+
+@dataclass(frozen=True)
+class Transition:
+    label: str                      # for error messages: "Cannot <label>"
+    from_statuses: tuple | None     # None = any status
+    to_status: str | None = None    # None = status unchanged
+    stamp: str | None = None        # timestamp column set to now
+    done_statuses: tuple = ()       # already there -> return booking as is
+
+
+TRANSITIONS = {
+    "start": Transition(
+        "start hire", ("confirmed",), "in_progress", "hire_started_at",
+    ),
+    # Key pickup also starts the hire if /start wasn't called
+    "complete_keys": Transition(
+        "complete key retrieval", None, "in_progress", "keys_retrieved_at",
+    ),
+    "complete_keys_return": Transition(
+        "complete key return", None, None, "keys_returned_at",
+    ),
+    "end": Transition(
+        "end hire", None, "completed", "hire_ended_at",
+        done_statuses=("completed",),
+    ),
+    "extend": Transition(
+        "extend booking", ("in_progress",),
+    ),
+}
+
+
+def apply_transition(
+    db: Session,
+    bookings_id: int,
+    member_id: int,
+    action: str,
+    conditions=(),
+    values: dict | None = None,
+    conflict_detail: str = "Booking changed, please retry",
+    at: datetime | None = None,
+) -> Booking:
+    """
+    Runs TRANSITIONS[action] as a compare-and-set and commits.
+
+    conditions: extra WHERE clauses; if the status allows the transition but
+    one of these fails, the caller gets 409 with conflict_detail.
+    at: when it happened, for events recorded offline (default now).
+    """
+    t = TRANSITIONS[action]
+    changes = dict(values or {})
+    if t.to_status:
+        changes["status"] = t.to_status
+    if t.stamp:
+        changes[t.stamp] = at or datetime.now(timezone.utc)
+
+    where = [Booking.bookings_id == bookings_id, Booking.member_id == member_id]
+    if t.from_statuses is not None:
+        where.append(Booking.status.in_(t.from_statuses))
+    if t.done_statuses:
+        # Already there: leave the row (and its timestamp) alone
+        where.append(or_(Booking.status.is_(None), Booking.status.not_in(t.done_statuses)))
+
+    stmt = (
+        update(Booking)
+        .where(*where, *conditions)
+        .values(**changes)
+        .returning(Booking)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    booking = db.scalars(stmt).first()
+    if booking is not None:
+        # The returned row is what was committed; don't reload it
+        commit_fresh(db)
+        return booking
+
+    db.rollback()
+    return explain_failure(db, bookings_id, member_id, t, conflict_detail)
+
+
+def check_owner(db: Session, bookings_id: int, member_id: int):
+    """404 / 403 like the routes do; returns (member_id, status) otherwise."""
+    current = (
+        db.query(Booking.member_id, Booking.status)
+        .filter(Booking.bookings_id == bookings_id)
+        .first()
+    )
+    if current is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if current.member_id != member_id:
+        raise HTTPException(status_code=403, detail="Not your booking")
+    return current
+
+
+def explain_failure(db: Session, bookings_id: int, member_id: int, t: Transition, conflict_detail: str):
+    current = check_owner(db, bookings_id, member_id)
+    if current.status in t.done_statuses:
+        return db.get(Booking, bookings_id)
+    if t.from_statuses is not None and current.status not in t.from_statuses:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot {t.label}: booking is {current.status}",
+        )
+    raise HTTPException(status_code=409, detail=conflict_detail)
+
+
+def expire_overdue(db: Session, member_id: int, now: datetime) -> list:
+    """in_progress -> expired for the member's hires past end_time. Returns (bookings_id, car_id) rows."""
+    stmt = (
+        update(Booking)
+        .where(
+            Booking.member_id == member_id,
+            Booking.status == "in_progress",
+            Booking.end_time < now,
+        )
+        .values(status="expired")
+        .returning(Booking.bookings_id, Booking.car_id)
+        .execution_options(synchronize_session=False)
+    )
+    expired = db.execute(stmt).all()
+    if expired:
+        db.commit()
+    else:
+        db.rollback()
+    return expired
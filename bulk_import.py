@@ -0,0 +1,323 @@
+import codecs
+import csv
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Type
+
+import anyio.from_thread
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import inspect, insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from utils.time_utils import utcnow
+
+# =====================================================
+# Bulk CSV / NDJSON import for admin onboarding.
+#
+# The request body is parsed as it streams in. Rows are validated against
+# the route's *Create schema in chunks, and each chunk is written with two
+# executemany statements (INSERT for new rows, UPDATE by primary key for
+# existing ones), all in ONE transaction.
+#
+# The import runs in one threadpool call with a session of its own: every
+# statement goes through the same thread and connection, and the body is
+# pulled from the event loop as the loop needs it.
+#
+# Rows are matched on a natural key (e.g. a car's registration):
+#   mode=insert  a row whose key already exists is an error
+#   mode=upsert  it updates the existing row instead
+#
+# By default nothing is written if any row fails; with partial=true the
+# valid rows are committed and the failures reported.
+#
+# updated_at is stamped as each chunk is written, but nothing is visible
+# until the commit, which can be minutes later: longer than delta sync's
+# SYNC_LAG, so a client could be handed a cursor past those stamps and
+# never see the rows. Just before committing, the rows written are
+# re-stamped (restamp) so they land after any cursor already handed out.
+# =====================================================
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+MAX_IMPORT_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "50000"))
+MAX_REPORTED_ERRORS = 200
+
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    model: Type[Any]
+    schema: Type[BaseModel]
+    key: tuple            # natural key columns, e.g. ("registration",)
+    track: str | None = None  # column whose old and new values are reported (cache invalidation)
+
+
+class RowError(Exception):
+
+    def __init__(self, errors: list[dict]):
+        self.errors = errors
+
+
+# -------------------------
+# Parsing (streamed)
+# -------------------------
+def body_format(request: Request, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in CSV_TYPES:
+        return "csv"
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    raise HTTPException(
+        status_code=415,
+        detail="Send text/csv or application/x-ndjson, or set ?format=csv|ndjson",
+    )
+
+
+async def body_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def csv_records(request: Request):
+    """(line number, dict) per record; empty cells are left out."""
+    header = None
+    record, start = "", 0
+    line_no = 0
+    async for line in body_lines(request):
+        line_no += 1
+        if not record:
+            start = line_no
+        record += line + "\n"
+        if record.count('"') % 2:
+            continue  # quoted field spans lines
+        text, record = record, ""
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) != len(header):
+            yield start, RowError([{
+                "field": None,
+                "message": f"expected {len(header)} columns, got {len(values)}",
+            }])
+            continue
+        yield start, {k: v for k, v in zip(header, values) if v.strip() != ""}
+
+
+async def ndjson_records(request: Request):
+    line_no = 0
+    async for line in body_lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, RowError([{"field": None, "message": f"invalid JSON: {e.msg}"}])
+            continue
+        if not isinstance(value, dict):
+            yield line_no, RowError([{"field": None, "message": "each line must be a JSON object"}])
+            continue
+        yield line_no, value
+
+
+def validate_row(spec: ImportSpec, raw: dict) -> dict:
+    try:
+        data = spec.schema.model_validate(raw).model_dump(exclude_unset=True)
+    except ValidationError as e:
+        raise RowError([
+            {"field": ".".join(str(p) for p in err["loc"]) or None, "message": err["msg"]}
+            for err in e.errors()
+        ])
+    missing = [k for k in spec.key if data.get(k) is None]
+    if missing:
+        raise RowError([{"field": k, "message": "required for import"} for k in missing])
+    return data
+
+
+# -------------------------
+# Writing (sync, on the import's thread)
+# -------------------------
+def write_chunk(db: Session, spec: ImportSpec, rows: list, upsert: bool, result: dict):
+    """rows: (line, data). Returns (line, errors) for rows rejected on their key."""
+    pk = inspect(spec.model).primary_key[0]
+    key_columns = [getattr(spec.model, k) for k in spec.key]
+
+    def key_of(data):
+        return tuple(data[k] for k in spec.key)
+
+    tracked = [getattr(spec.model, spec.track)] if spec.track else []
+
+    keys = list({key_of(data) for _, data in rows})
+    existing = {}   # key -> (pk, tracked value)
+    if keys:
+        q = db.query(pk, *tracked, *key_columns)
+        if len(key_columns) == 1:
+            q = q.filter(key_columns[0].in_([k[0] for k in keys]))
+        else:
+            q = q.filter(tuple_(*key_columns).in_(keys))
+        offset = 1 + len(tracked)
+        existing = {
+            tuple(row[offset:]): (row[0], row[1] if tracked else None)
+            for row in q
+        }
+
+    inserts, updates, failed = [], [], []
+    for line, data in rows:
+        key = key_of(data)
+        seen = result["seen_keys"].get(key)
+        if seen is not None:
+            failed.append((line, [{"field": ",".join(spec.key), "message": f"duplicate of line {seen}"}]))
+            continue
+        result["seen_keys"][key] = line
+
+        if key in existing:
+            if not upsert:
+                failed.append((line, [{"field": ",".join(spec.key), "message": "already exists (use mode=upsert)"}]))
+                continue
+            row_pk, old_value = existing[key]
+            updates.append({pk.key: row_pk, **data})
+            if spec.track:
+                result["touched"].update({old_value, data.get(spec.track, old_value)})
+        else:
+            inserts.append(data)
+            if spec.track:
+                result["touched"].add(data.get(spec.track))
+
+    # executemany: one round trip per statement for the whole chunk
+    if inserts:
+        db.execute(insert(spec.model), inserts)
+    if updates:
+        db.execute(update(spec.model), updates)
+
+    result["inserted"] += len(inserts)
+    result["updated"] += len(updates)
+    return failed
+
+
+def restamp(db: Session, spec: ImportSpec, since):
+    """updated_at = now for rows stamped since the import started (models without it: no-op)."""
+    table = spec.model.__table__
+    column = table.c.get("updated_at")
+    if column is None:
+        return
+    now = utcnow()
+    # A range on the indexed column rather than a list of ids. Rows other
+    # writers stamped in the meantime get bumped too; they just sync again.
+    db.execute(update(table).where(column >= since, column <= now).values(updated_at=now))
+
+
+# -------------------------
+# Entry point
+# -------------------------
+async def run_import(
+    request: Request,
+    spec: ImportSpec,
+    fmt: str | None,
+    mode: str,
+    partial: bool,
+) -> dict:
+    """
+    Returns an ImportResult dict; "touched" holds the spec.track values
+    (old and new) of every written row, for cache invalidation.
+    Raises 422 with the same report if rows failed and nothing was committed.
+    """
+    fmt = body_format(request, fmt)
+    records = csv_records(request) if fmt == "csv" else ndjson_records(request)
+
+    async def next_record():
+        return await anext(records, None)
+
+    def pull():
+        # Called from the import's thread; parsing stays on the event loop
+        return anyio.from_thread.run(next_record)
+
+    return await run_in_threadpool(import_rows, pull, spec, mode, partial)
+
+
+def import_rows(pull, spec: ImportSpec, mode: str, partial: bool) -> dict:
+    """The whole import on one thread, with its own session; pull() -> (line, raw) or None."""
+    upsert = mode == "upsert"
+    result = {"inserted": 0, "updated": 0, "seen_keys": {}, "touched": set()}
+    errors = []
+    rows = 0
+    chunk = []
+    failed_count = 0
+
+    def fail(line, row_errors):
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line, "errors": row_errors})
+
+    db = SessionLocal()
+    started = utcnow()
+    try:
+        while (record := pull()) is not None:
+            line, raw = record
+            rows += 1
+            if rows > MAX_IMPORT_ROWS:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Imports are limited to {MAX_IMPORT_ROWS} rows",
+                )
+            try:
+                if isinstance(raw, RowError):
+                    raise raw
+                chunk.append((line, validate_row(spec, raw)))
+            except RowError as e:
+                failed_count += 1
+                fail(line, e.errors)
+
+            if len(chunk) >= CHUNK_SIZE:
+                for line_failed in write_chunk(db, spec, chunk, upsert, result):
+                    failed_count += 1
+                    fail(*line_failed)
+                chunk = []
+
+        if chunk:
+            for line_failed in write_chunk(db, spec, chunk, upsert, result):
+                failed_count += 1
+                fail(*line_failed)
+
+        committed = failed_count == 0 or partial
+        if committed:
+            restamp(db, spec, started)
+            db.commit()
+        else:
+            db.rollback()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    report = {
+        "mode": mode,
+        "rows": rows,
+        "inserted": result["inserted"] if committed else 0,
+        "updated": result["updated"] if committed else 0,
+        "failed": failed_count,
+        "committed": committed,
+        "errors": sorted(errors, key=lambda e: e["line"]),
+    }
+    if not committed:
+        raise HTTPException(status_code=422, detail=report)
+    report["touched"] = result["touched"] - {None}
+    return report
@@ -1,16 +1,74 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, inspect, update
+from sqlalchemy.orm import Session, undefer
 from typing import Type, Any
 
+# Write helpers: one statement per write, no refresh() afterwards.
+#
+# Every write is INSERT / UPDATE ... RETURNING the whole row, so whatever
+# the database fills in (created_at DEFAULT now(), triggers) comes back in
+# the same statement. Objects are then not expired on commit: the response
+# is built from the returned row without reading it again. Deferred
+# columns are included in RETURNING, so serialising never lazy-loads.
+
+
+def commit_fresh(db: Session):
+    """Commit without expiring loaded objects (skips the reload SELECT)."""
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = True
+
+
+def deferred_columns(model: Type[Any]):
+    return [
+        getattr(model, prop.key)
+        for prop in inspect(model).column_attrs
+        if prop.deferred
+    ]
+
+
 def create_record(db: Session, model: Type[Any], data: dict):
-    obj = model(**data)
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    """INSERT ... RETURNING *: the new object, server defaults included."""
+    stmt = (
+        insert(model)
+        .values(**data)
+        .returning(model)
+        .options(*[undefer(c) for c in deferred_columns(model)])
+    )
+    obj = db.scalars(stmt).one()
+    commit_fresh(db)
     return obj
 
+
 def update_record(db: Session, obj: Any, data: dict):
-    for k, v in data.items():
-        setattr(obj, k, v)
-    db.commit()
-    db.refresh(obj)
+    """update_by_id for an object already loaded (e.g. current_user); obj is refreshed in place."""
+    pk = inspect(obj).identity[0]
+    return update_by_id(db, type(obj), pk, data) or obj
+
+
+def update_by_id(db: Session, model: Type[Any], pk: Any, data: dict, *conditions):
+    """
+    UPDATE ... WHERE pk = ? [AND conditions] RETURNING *, in one statement.
+    Returns the updated object, or None if no row matched.
+    """
+    undeferred = [undefer(c) for c in deferred_columns(model)]
+    pk_column = inspect(model).primary_key[0]
+    if not data:
+        # Nothing to write; still one statement
+        return db.query(model).options(*undeferred).filter(pk_column == pk, *conditions).first()
+
+    stmt = (
+        update(model)
+        .where(pk_column == pk, *conditions)
+        .values(**data)
+        .returning(model)
+        .options(*undeferred)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    obj = db.scalars(stmt).first()
+    if obj is None:
+        db.rollback()
+        return None
+    commit_fresh(db)
     return obj
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 import os
+import threading
+import time
+
+from utils import metrics
+from utils.redis_client import get_redis
 
 # Load local .env (has no effect on App Runner, but helps local dev)
 load_dotenv()
@@ -9,25 +15,49 @@ load_dotenv()
 # Get URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Optional read replica for pure-read routes (see get_read_db)
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+
+# After a member writes, their reads stay on the primary for this long
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Replica further behind than this -> reads go to the primary
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+
+# Connection pool per engine. Sessions from get_db are admitted up to the
+# pool's capacity (see threadpool.py), so requests queue in the event loop,
+# not on a thread blocked waiting for a connection.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
 # Safe fallback for App Runner import-time
 if not DATABASE_URL:
     print("Warning from database.py: DATABASE_URL not set at import time.")
     # Use a local SQLite fallback so import doesn't crash
     DATABASE_URL = "sqlite:///./fallback.db"
 
-# Create SQLAlchemy engine
-# For SQLite, need special connect args
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
+
+def make_engine(url: str):
+    # For SQLite, need special connect args
+    if url.startswith("sqlite"):
+        return create_engine(
+            url, connect_args={"check_same_thread": False}
+        )
     # For PostgreSQL / Neon
-    engine = create_engine(
-        DATABASE_URL,
+    return create_engine(
+        url,
         pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
     )
 
+
+# Create SQLAlchemy engine
+engine = make_engine(DATABASE_URL)
+replica_engine = make_engine(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None
+
 # Session factory
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -35,14 +65,132 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+ReplicaSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=replica_engine,
+) if replica_engine is not None else None
+
 # Base class for ORM models
 Base = declarative_base()
 
+async def db_slot():
+    """Admission for a request's session, held until get_db closes it."""
+    # threadpool imports this module
+    from threadpool import connection_slot
+
+    async with connection_slot():
+        yield
+
+
 # Dependency used in routes
-def get_db():
+def get_db(_slot: None = Depends(db_slot)):
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+
+# =====================================================
+# Read replica routing
+# =====================================================
+
+_recent_writes = {}          # token subject -> monotonic time of last write
+_recent_writes_lock = threading.Lock()
+_lag = {"value": None, "checked_at": 0.0}
+LAG_CHECK_INTERVAL_SECONDS = 1.0
+
+
+def note_write(subject: str):
+    """Pins the member's reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    if replica_engine is None:
+        return
+
+    client = get_redis()
+    if client is not None:
+        # Shared so the pin holds whichever worker serves the next read
+        client.set(f"ryw:{subject}", 1, px=int(READ_YOUR_WRITES_SECONDS * 1000))
+        return
+
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[subject] = now
+        if len(_recent_writes) > 10_000:
+            for key, at in list(_recent_writes.items()):
+                if now - at > READ_YOUR_WRITES_SECONDS:
+                    del _recent_writes[key]
+
+
+def wrote_recently(subject: str) -> bool:
+    client = get_redis()
+    if client is not None:
+        return bool(client.exists(f"ryw:{subject}"))
+
+    at = _recent_writes.get(subject)
+    return at is not None and time.monotonic() - at < READ_YOUR_WRITES_SECONDS
+
+
+def replica_lag_seconds():
+    """Replication delay, checked at most once a second. None = unknown."""
+    now = time.monotonic()
+    if now - _lag["checked_at"] < LAG_CHECK_INTERVAL_SECONDS:
+        return _lag["value"]
+
+    lag = None
+    try:
+        if replica_engine.dialect.name == "postgresql":
+            with replica_engine.connect() as conn:
+                lag = conn.execute(text(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )).scalar()
+                lag = float(lag or 0)
+        else:
+            # No replication to measure (e.g. two local SQLite files)
+            lag = 0.0
+    except Exception as e:
+        print(f"Replica lag check failed: {e!r}")
+
+    _lag.update(value=lag, checked_at=now)
+    return lag
+
+
+def use_replica(subject) -> bool:
+    if replica_engine is None:
+        return False
+    if subject and wrote_recently(subject):
+        return False
+    lag = replica_lag_seconds()
+    return lag is not None and lag <= REPLICA_MAX_LAG_SECONDS
+
+
+def get_read_db(request: Request, primary=Depends(get_db)):
+    """
+    Like get_db, but for routes that only read. Goes to the replica unless
+    the caller wrote within READ_YOUR_WRITES_SECONDS or the replica lags.
+
+    Otherwise it hands back the request's own get_db session (the one auth
+    already used), so a request never holds two primary connections.
+    """
+    # security imports this module
+    from security import bearer_token, token_subject
+
+    subject = token_subject(bearer_token(request.headers.get("Authorization")))
+    try:
+        replica = use_replica(subject)
+    except Exception as e:
+        print(f"Replica routing failed, using primary: {e!r}")
+        replica = False
+
+    metrics.incr("db.reads.total")
+    metrics.incr("db.reads.replica" if replica else "db.reads.primary")
+    if not replica:
+        yield primary
+        return
+
+    db = ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,109 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import SyncTombstone
+from utils.time_utils import as_utc, utcnow
+
+# =====================================================
+# Delta sync for the mobile app (GET /sync).
+#
+# Bookings, cars, members and rates carry updated_at, set on every insert
+# and update (models.py). A client keeps the cursor from its last sync and
+# gets back only rows with updated_at after it, plus tombstones for rows
+# deleted since. No cursor (or one older than tombstone retention) means
+# a full snapshot, which the client uses to replace its local copy.
+#
+# updated_at is stamped when the statement runs, not when the transaction
+# commits, so a row can become visible slightly after a later-stamped one.
+# The cursor handed back therefore trails the sync by SYNC_LAG_SECONDS:
+# the next sync re-reads that short window (clients upsert by id, so the
+# repeats are harmless) and a write that commits within it isn't missed.
+# Transactions that can run longer (bulk_import.py) re-stamp their rows
+# just before committing.
+# =====================================================
+
+SYNC_LAG = timedelta(seconds=int(os.getenv("SYNC_LAG_SECONDS", "5")))
+TOMBSTONE_RETENTION = timedelta(days=int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30")))
+SWEEP_INTERVAL_SECONDS = 60 * 60
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+_last_sweep = 0.0
+
+
+# -------------------------
+# Cursors
+# -------------------------
+def encode_cursor(at: datetime) -> str:
+    """Opaque to clients; microseconds since the epoch."""
+    return str((as_utc(at) - EPOCH) // MICROSECOND)
+
+
+def decode_cursor(cursor: str) -> datetime:
+    try:
+        return EPOCH + int(cursor) * MICROSECOND
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+
+
+def next_cursor(now: datetime) -> str:
+    return encode_cursor(now - SYNC_LAG)
+
+
+def needs_full_sync(since: datetime | None, now: datetime) -> bool:
+    # Tombstones before the retention window are gone; a delta would
+    # leave deleted rows on the device
+    return since is None or since < now - TOMBSTONE_RETENTION
+
+
+# -------------------------
+# Tombstones
+# -------------------------
+def record_deletion(db: Session, entity: str, entity_id: int, member_id: int | None = None):
+    """Adds a tombstone; commit it with the delete."""
+    db.add(SyncTombstone(entity=entity, entity_id=entity_id, member_id=member_id, deleted_at=utcnow()))
+
+
+def deletions_since(db: Session, since: datetime, member_id: int) -> dict:
+    """{entity: [ids]} deleted after `since` that this member can see."""
+    rows = (
+        db.query(SyncTombstone.entity, SyncTombstone.entity_id)
+        .filter(
+            SyncTombstone.deleted_at > since,
+            or_(SyncTombstone.member_id.is_(None), SyncTombstone.member_id == member_id),
+        )
+        .order_by(SyncTombstone.deleted_at)
+    )
+    deleted = {}
+    for entity, entity_id in rows:
+        deleted.setdefault(entity, []).append(entity_id)
+    return deleted
+
+
+def sweep_tombstones():
+    """Drops tombstones past retention; at most once per SWEEP_INTERVAL_SECONDS."""
+    global _last_sweep
+    if time.monotonic() - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = time.monotonic()
+
+    db = SessionLocal()
+    try:
+        deleted = db.query(SyncTombstone).filter(
+            SyncTombstone.deleted_at < utcnow() - TOMBSTONE_RETENTION
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            print(f"Sync: dropped {deleted} expired tombstones")
+    except Exception as e:
+        db.rollback()
+        print(f"Sync tombstone sweep failed: {e!r}")
+    finally:
+        db.close()
@@ -0,0 +1,83 @@
+# =====================================================
+# Production server: gunicorn managing uvicorn workers.
+#
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# Tunables (env): PORT, WEB_CONCURRENCY, MAX_REQUESTS, MAX_REQUESTS_JITTER,
+# GRACEFUL_TIMEOUT, WORKER_TIMEOUT
+# =====================================================
+import os
+
+
+def available_cores() -> int:
+    """CPUs this container may actually use (affinity + cgroup v2 quota)."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, cores)
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Routes are sync and run on each worker's threadpool, so one worker per core
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or available_cores()
+
+# Import the app once in the master; workers fork with it already loaded
+preload_app = True
+
+# Recycle workers to contain slow memory growth (jitter avoids all at once)
+max_requests = int(os.getenv("MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "200"))
+
+# SIGTERM: stop accepting, let in-flight requests (e.g. a booking being
+# created) finish for up to graceful_timeout seconds before killing
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+# In-process state is per worker. Without Redis, cache invalidation would
+# only reach the worker that handled the write, so disable the caches (or,
+# for the airport index, rebuild it often) rather than serve stale data.
+# (Config is read before the app preloads.)
+if workers > 1 and not os.getenv("REDIS_URL"):
+    os.environ.setdefault("AVAILABILITY_CACHE_TTL_SECONDS", "0")
+    os.environ.setdefault("CALENDAR_CACHE_TTL_SECONDS", "0")
+    os.environ.setdefault("AIRPORT_INDEX_MAX_AGE_SECONDS", "30")
+    print(
+        "gunicorn.conf: REDIS_URL not set with multiple workers - availability "
+        "and calendar caches disabled, airport index rebuilt every 30 s; rate "
+        "limits and read-your-writes are per worker."
+    )
+
+
+def post_fork(server, worker):
+    # Connections, clients and pools must never be shared with the master
+    from database import engine, replica_engine
+    from utils import aws, images, redis_client
+
+    engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.dispose(close=False)
+    aws.reset_clients()
+    redis_client.reset()
+    images.reset_pool()
+
+
+def worker_exit(server, worker):
+    from utils import images
+
+    images.shutdown_pool()
@@ -0,0 +1,249 @@
+import hashlib
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import anyio
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from database import SessionLocal
+from models import IdempotencyKey
+from security import bearer_token, token_subject
+from threadpool import run_db
+from utils.time_utils import as_utc
+
+# =====================================================
+# Idempotency-Key support for booking writes.
+#
+# The app retries booking calls on flaky airport networks. With an
+# Idempotency-Key header, the first request claims the key, its response
+# is stored, and any retry (same caller, route, key and body) gets the
+# stored response back without running the route again.
+# =====================================================
+
+IDEMPOTENCY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+# Lease on an in-progress claim; longer than a request can run (gunicorn
+# WORKER_TIMEOUT is 60 s) so it only lapses if the worker died
+IDEMPOTENCY_LOCK = timedelta(seconds=int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "90")))
+SWEEP_INTERVAL_SECONDS = 10 * 60
+MAX_KEY_LENGTH = 255
+
+# (method, path) pairs that honour the header
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"^/bookings/?$")),
+    ("PUT", re.compile(r"^/bookings/\d+/(start|extend|end|complete-keys|complete-keys-return)$")),
+]
+
+_last_sweep = 0.0
+
+
+def is_idempotent_route(method: str, path: str) -> bool:
+    return any(method == m and pattern.match(path) for m, pattern in IDEMPOTENT_ROUTES)
+
+
+def request_fingerprint(request: Request, body: bytes) -> str:
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(request.url.path.encode())
+    h.update(request.url.query.encode())
+    h.update(body)
+    return h.hexdigest()
+
+
+# -------------------------
+# Storage (sync, run in the threadpool with a DB slot: threadpool.run_db)
+# -------------------------
+def claim_key(scope: str, fingerprint: str):
+    """
+    Returns None if this request now owns the key, otherwise the existing row.
+    """
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        existing = db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope).first()
+        if existing and as_utc(existing.expires_at) <= now:
+            db.delete(existing)
+            db.commit()
+            existing = None
+
+        if existing and lease_lapsed(existing, now) and existing.request_hash == fingerprint:
+            if take_over(db, scope, now):
+                return None
+            existing = db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope).first()
+
+        if existing:
+            db.expunge(existing)
+            return existing
+
+        db.add(IdempotencyKey(
+            scope=scope,
+            request_hash=fingerprint,
+            created_at=now,
+            expires_at=now + IDEMPOTENCY_TTL,
+            locked_until=now + IDEMPOTENCY_LOCK,
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent retry claimed it first
+            db.rollback()
+            existing = db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope).first()
+            db.expunge(existing)
+            return existing
+        return None
+    finally:
+        db.close()
+
+
+def lease_lapsed(row: IdempotencyKey, now: datetime) -> bool:
+    if row.status_code is not None:
+        return False
+    # Rows claimed before leases existed: measure from created_at
+    locked_until = row.locked_until or (row.created_at and row.created_at + IDEMPOTENCY_LOCK)
+    return locked_until is None or as_utc(locked_until) <= now
+
+
+def take_over(db, scope: str, now: datetime) -> bool:
+    """Claims a lapsed in-progress key; False if another retry got it first."""
+    stale_after = now - IDEMPOTENCY_LOCK
+    taken = db.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.status_code.is_(None),
+            or_(
+                IdempotencyKey.locked_until <= now,
+                IdempotencyKey.locked_until.is_(None) & (IdempotencyKey.created_at <= stale_after),
+            ),
+        )
+        .values(locked_until=now + IDEMPOTENCY_LOCK)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return taken == 1
+
+
+def store_response(scope: str, status_code: int, body: bytes):
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope).update(
+            {
+                IdempotencyKey.status_code: status_code,
+                IdempotencyKey.response_body: body.decode("utf-8"),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def release_key(scope: str):
+    # The route failed; let the next retry run it again
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.scope == scope).delete(
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def sweep_expired():
+    global _last_sweep
+    if time.monotonic() - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = time.monotonic()
+
+    db = SessionLocal()
+    try:
+        deleted = db.query(IdempotencyKey).filter(
+            IdempotencyKey.expires_at < datetime.now(timezone.utc)
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            print(f"Idempotency: evicted {deleted} expired keys")
+    finally:
+        db.close()
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+
+    async def dispatch(self, request: Request, call_next):
+        key = request.headers.get("Idempotency-Key")
+        if not key or not is_idempotent_route(request.method, request.url.path):
+            return await call_next(request)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return JSONResponse({"detail": "Idempotency-Key is too long"}, status_code=400)
+
+        subject = token_subject(bearer_token(request.headers.get("Authorization")))
+        if not subject:
+            # Unauthenticated; the route will answer 401
+            return await call_next(request)
+
+        body = await request.body()
+        scope = f"{subject}:{request.method}:{request.url.path}:{key}"
+        fingerprint = request_fingerprint(request, body)
+
+        try:
+            existing = await run_db(claim_key, scope, fingerprint)
+        except SQLAlchemyError as e:
+            # Never block bookings because the key store is unavailable
+            print(f"Idempotency store unavailable: {e!r}")
+            return await call_next(request)
+
+        if existing is not None:
+            if existing.request_hash != fingerprint:
+                return JSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request"},
+                    status_code=422,
+                )
+            if existing.status_code is None:
+                return JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress"},
+                    status_code=409,
+                    headers={"Retry-After": "1"},
+                )
+            return Response(
+                content=existing.response_body,
+                status_code=existing.status_code,
+                media_type="application/json",
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+        try:
+            response = await call_next(request)
+        except BaseException:
+            # Including cancellation (client gone, shutdown): shielded, or
+            # the release itself would be cancelled and the key left held
+            with anyio.CancelScope(shield=True):
+                await run_db(release_key, scope)
+            raise
+
+        if response.status_code >= 500:
+            await run_db(release_key, scope)
+            return response
+
+        content = b"".join([chunk async for chunk in response.body_iterator])
+        try:
+            await run_db(store_response, scope, response.status_code, content)
+            await run_db(sweep_expired)
+        except SQLAlchemyError as e:
+            print(f"Idempotency store unavailable: {e!r}")
+
+        return Response(
+            content=content,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            media_type=response.media_type,
+        )
@@ -1,10 +1,53 @@
-from fastapi import FastAPI
+import hmac
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from routers import airports, rates, cars, members, bookings, subscriptions, search_logs, availability, auth, uploads
+from database import note_write, replica_engine
+from idempotency import IdempotencyMiddleware
+from security import bearer_token, token_subject
+import search_log_partitions
+import threadpool
+from utils import metrics
+from routers import airports, rates, cars, members, bookings, subscriptions, search_logs, availability, auth, uploads, calendar_feed, events, sync
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Threadpool size and DB session admission (see threadpool.py)
+    threadpool.configure()
+    # Search log partitions and retention, off the request path
+    search_log_partitions.start_background_maintenance()
+    yield
+    search_log_partitions.stop_background_maintenance()
+
+
+app = FastAPI(title="FlyDrive API", lifespan=lifespan)
+
+# Replays stored responses for retried booking writes (Idempotency-Key header)
+app.add_middleware(IdempotencyMiddleware)
 
-app = FastAPI(title="FlyDrive API")
+# Read-your-writes: a member's reads skip the replica right after they write
+@app.middleware("http")
+async def track_member_writes(request: Request, call_next):
+    response = await call_next(request)
+    if (
+        replica_engine is not None
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        subject = token_subject(bearer_token(request.headers.get("Authorization")))
+        if subject:
+            try:
+                await run_in_threadpool(note_write, subject)
+            except Exception as e:
+                print(f"Could not record write for read-your-writes: {e!r}")
+    return response
 
-# CORS (loose for now; tighten later)
+# CORS (loose for now; tighten later). Added last so it is outermost:
+# preflights are answered before anything else, and 503s / replayed
+# responses still carry the CORS headers the browser needs to read them
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
@@ -15,15 +58,48 @@ app.include_router(airports.router)
 app.include_router(rates.router)
 app.include_router(cars.router)
 app.include_router(members.router)
+app.include_router(bookings.public_router)
 app.include_router(bookings.router)
 app.include_router(subscriptions.router)
 app.include_router(search_logs.router)
 app.include_router(availability.router)
 app.include_router(auth.router)
+app.include_router(calendar_feed.router)
+app.include_router(events.router)
 app.include_router(uploads.router)
+app.include_router(sync.router)
 
 @app.get("/")
 def root():
     return {"ok": True, "service": "FlyDrive API"}
-    
 
+
+# GET /metrics takes `Authorization: Bearer <METRICS_TOKEN>`; no DB lookup,
+# so it still answers when every session slot is taken. Unset = disabled.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def require_metrics_token(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = bearer_token(request.headers.get("Authorization")) or ""
+    if not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+def get_metrics():
+    """Per-process counters (this worker only)."""
+    data = metrics.snapshot()
+    data["ratios"] = {
+        "availability_coalesced": metrics.ratio("availability.coalesced", "availability.requests"),
+        "availability_cache_hit": metrics.ratio("availability.cache.hits", "availability.requests"),
+        "reads_on_replica": metrics.ratio("db.reads.replica", "db.reads.total"),
+        "threadpool_saturated": metrics.ratio("threadpool.saturated", "threadpool.requests"),
+        "threadpool_rejected": metrics.ratio("threadpool.rejected", "threadpool.requests"),
+    }
+    return data
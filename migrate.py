@@ -0,0 +1,47 @@
+import glob
+import os
+
+from sqlalchemy import text
+
+from database import engine
+
+# =====================================================
+# Applies migrations/*.sql in name order (Postgres).
+#
+#   python migrate.py
+#
+# The scripts are idempotent, so every run applies all of them; there is
+# no version table. start.sh runs this before starting the server. One
+# transaction per file, under an advisory lock so instances deploying at
+# the same time don't run them side by side.
+# =====================================================
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def migration_files() -> list[str]:
+    return sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql")))
+
+
+def migrate():
+    if engine.dialect.name != "postgresql":
+        # Local SQLite: create_all() builds new tables; a database made
+        # before a column was added needs recreating
+        from database import Base
+        import models  # noqa: F401 (registers the tables)
+
+        Base.metadata.create_all(engine)
+        print(f"migrate.py: {engine.dialect.name} database, ran create_all() only")
+        return
+
+    for path in migration_files():
+        with open(path) as f:
+            sql = f.read()
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('migrate.py'))"))
+            conn.exec_driver_sql(sql)
+        print(f"migrate.py: applied {os.path.basename(path)}")
+
+
+if __name__ == "__main__":
+    migrate()
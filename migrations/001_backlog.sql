@@ -0,0 +1,85 @@
+-- =====================================================
+-- Schema changes for the backlog series (Postgres).
+--
+-- create_all() only creates missing tables; it never adds columns to an
+-- existing one. Everything here is idempotent (IF NOT EXISTS / guarded
+-- UPDATEs), so it is safe to run on every deploy: start.sh applies it
+-- through migrate.py before the server starts.
+-- =====================================================
+
+
+-- [user-028] Image derivatives: {column: {size: {fmt: url}}}
+ALTER TABLE cars ADD COLUMN IF NOT EXISTS image_variants JSON;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS photo_variants JSON;
+
+
+-- [user-032] Idempotency-Key replay store
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_keys_id SERIAL PRIMARY KEY,
+    scope VARCHAR NOT NULL,
+    request_hash VARCHAR NOT NULL,
+    status_code INTEGER,
+    response_body TEXT,
+    locked_until TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE,
+    expires_at TIMESTAMP WITH TIME ZONE
+);
+-- Tables created before claims were leased
+ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP WITH TIME ZONE;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_idempotency_keys_scope ON idempotency_keys (scope);
+CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+
+
+-- [user-039] Key return and end of hire, stamped by the state machine
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS keys_returned_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS hire_ended_at TIMESTAMP WITH TIME ZONE;
+
+
+-- [user-040] Writes read created_at back through RETURNING; the database fills it
+ALTER TABLE airports ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE cars ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE members ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE bookings ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE rates ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE subscriptions ALTER COLUMN created_at SET DEFAULT now();
+
+
+-- [user-044] Search logs rolled up past retention
+CREATE TABLE IF NOT EXISTS search_log_daily (
+    search_log_daily_id SERIAL PRIMARY KEY,
+    day DATE,
+    airport_id INTEGER REFERENCES airports (airports_id),
+    searches INTEGER NOT NULL,
+    members INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_search_log_daily_day ON search_log_daily (day);
+
+
+-- [user-046] Secret in the member's .ics feed URL
+ALTER TABLE members ADD COLUMN IF NOT EXISTS calendar_token VARCHAR;
+CREATE UNIQUE INDEX IF NOT EXISTS members_calendar_token_key ON members (calendar_token);
+
+
+-- [user-049] Delta sync: updated_at on synced tables, tombstones for deletes
+ALTER TABLE cars ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE members ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE rates ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE;
+-- Existing rows: a full sync returns them whatever the value; a delta
+-- after one needs it set
+UPDATE cars SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+UPDATE members SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+UPDATE bookings SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+UPDATE rates SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+CREATE INDEX IF NOT EXISTS ix_cars_updated_at ON cars (updated_at);
+CREATE INDEX IF NOT EXISTS ix_rates_updated_at ON rates (updated_at);
+CREATE INDEX IF NOT EXISTS ix_bookings_member_id_updated_at ON bookings (member_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    sync_tombstones_id SERIAL PRIMARY KEY,
+    entity VARCHAR NOT NULL,
+    entity_id INTEGER NOT NULL,
+    member_id INTEGER,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sync_tombstones_deleted_at ON sync_tombstones (deleted_at);
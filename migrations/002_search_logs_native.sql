@@ -0,0 +1,69 @@
+-- =====================================================
+-- [user-044] search_logs as a native partitioned table (Postgres).
+--
+-- Converts a plain search_logs table (layout "single" in
+-- search_log_partitions.py) to PARTITION BY RANGE (search_time), with
+-- monthly partitions search_logs_pYYYY_MM from its oldest row to two
+-- months ahead and a default partition. Rows are copied across and the
+-- old table dropped, all in migrate.py's transaction for this file.
+--
+-- Idempotent: does nothing once search_logs is partitioned (or before
+-- it exists). The copy holds an exclusive lock on search_logs for its
+-- duration, so deploy the first run in a quiet period.
+-- =====================================================
+
+DO $$
+DECLARE
+    month date;
+    last_month date := (date_trunc('month', now()) + interval '2 months')::date;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = 'search_logs' AND c.relkind = 'r' AND n.nspname = current_schema()
+    ) THEN
+        RETURN;
+    END IF;
+
+    LOCK TABLE search_logs IN ACCESS EXCLUSIVE MODE;
+    ALTER TABLE search_logs RENAME TO search_logs_legacy;
+    -- Index names are per schema; free them for the new table
+    ALTER INDEX IF EXISTS search_logs_pkey RENAME TO search_logs_legacy_pkey;
+    ALTER INDEX IF EXISTS ix_search_logs_search_logs_id RENAME TO ix_search_logs_legacy_search_logs_id;
+
+    -- Same columns and id sequence; the partition key has to be in the key
+    CREATE TABLE search_logs (LIKE search_logs_legacy INCLUDING DEFAULTS)
+        PARTITION BY RANGE (search_time);
+    ALTER TABLE search_logs ADD PRIMARY KEY (search_logs_id, search_time);
+    CREATE INDEX ix_search_logs_search_logs_id ON search_logs (search_logs_id);
+    CREATE INDEX ix_search_logs_search_time ON search_logs (search_time);
+    ALTER SEQUENCE IF EXISTS search_logs_search_logs_id_seq OWNED BY search_logs.search_logs_id;
+    CREATE TABLE search_logs_default PARTITION OF search_logs DEFAULT;
+
+    -- Month partitions first: a row left in the default partition would
+    -- stop maintenance from creating its month later. Bounds as
+    -- ensure_native() creates them (UTC month starts).
+    SELECT LEAST(
+        date_trunc('month', min(search_time) AT TIME ZONE 'UTC')::date,
+        date_trunc('month', now())::date
+    ) INTO month FROM search_logs_legacy;
+    month := COALESCE(month, date_trunc('month', now())::date);
+    WHILE month <= last_month LOOP
+        EXECUTE 'CREATE TABLE ' || quote_ident('search_logs_p' || to_char(month, 'YYYY_MM'))
+            || ' PARTITION OF search_logs FOR VALUES FROM ('
+            || quote_literal((month::timestamp AT TIME ZONE 'UTC')::text) || ') TO ('
+            || quote_literal(((month + interval '1 month')::timestamp AT TIME ZONE 'UTC')::text) || ')';
+        month := (month + interval '1 month')::date;
+    END LOOP;
+
+    -- A row without search_time would never age out (log_search always sets it)
+    INSERT INTO search_logs (
+        search_logs_id, member_id, airport_id, search_date, search_time, desired_start, desired_end
+    )
+    SELECT search_logs_id, member_id, airport_id, search_date, COALESCE(search_time, now()),
+           desired_start, desired_end
+    FROM search_logs_legacy;
+
+    DROP TABLE search_logs_legacy;
+END
+$$;
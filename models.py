@@ -8,9 +8,13 @@ from sqlalchemy import (
     Date,
     TIMESTAMP,
     ForeignKey,
+    JSON,
+    Index,
+    func,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from database import Base
+from utils.time_utils import utcnow
 
 
 class Airport(Base):
@@ -23,7 +27,7 @@ class Airport(Base):
     longitude = Column(Numeric)
     parking_description = Column(Text)
     is_active = Column(Boolean)
-    created_at = Column(TIMESTAMP(timezone=True))
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     cars = relationship("Car", back_populates="airport")
     rates = relationship("Rate", back_populates="airport")
@@ -41,15 +45,20 @@ class Car(Base):
     lockbox_ble_name = Column(String)
     lockbox_serial = Column(String)
     keyfob_code = Column(String)
-    created_at = Column(TIMESTAMP(timezone=True))
-
-    # Image fields
-    image_url = Column(Text)
-    carleft_url = Column(Text)
-    carright_url = Column(Text)
-    carback_url = Column(Text)
-    carfront_url = Column(Text)
-    cardash_url = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # Set on every insert/update; /sync reads changes by it
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow, index=True)
+
+    # Image fields (deferred: loaded together on first access,
+    # or up front with undefer_group("images"))
+    image_url = deferred(Column(Text), group="images")
+    carleft_url = deferred(Column(Text), group="images")
+    carright_url = deferred(Column(Text), group="images")
+    carback_url = deferred(Column(Text), group="images")
+    carfront_url = deferred(Column(Text), group="images")
+    cardash_url = deferred(Column(Text), group="images")
+    # {column: {size: {fmt: url}}} written by the derivative pipeline
+    image_variants = deferred(Column(JSON), group="images")
 
     airport = relationship("Airport", back_populates="cars")
     bookings = relationship("Booking", back_populates="car")
@@ -65,7 +74,7 @@ class Member(Base):
     address = Column(Text)
     renewal_date = Column(TIMESTAMP(timezone=True))
     platform = Column(String)
-    created_at = Column(TIMESTAMP(timezone=True))
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     status = Column(String, default="pending_verification")
 
     licence_front_url = Column(Text, nullable=True)
@@ -73,6 +82,9 @@ class Member(Base):
     selfie_url = Column(Text, nullable=True)
     licence_number = Column(String, nullable=True)
     licence_expiry = Column(Date, nullable=True)
+    # "<members_id>.<random>", the secret in the member's .ics feed URL
+    calendar_token = Column(String, unique=True, nullable=True)
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow)
 
     bookings = relationship("Booking", back_populates="member")
     subscriptions = relationship("Subscription", back_populates="member")
@@ -89,26 +101,39 @@ class Booking(Base):
     end_time = Column(TIMESTAMP(timezone=True))
     status = Column(String)
 
+    # Inspection photos are deferred: no booking response returns them,
+    # they load together on first access (or with undefer_group("photos"))
+
     # BEFORE photos
-    photourl_before_front = Column(Text)
-    photourl_before_left  = Column(Text)
-    photourl_before_right = Column(Text)
-    photourl_before_rear  = Column(Text)
+    photourl_before_front = deferred(Column(Text), group="photos")
+    photourl_before_left  = deferred(Column(Text), group="photos")
+    photourl_before_right = deferred(Column(Text), group="photos")
+    photourl_before_rear  = deferred(Column(Text), group="photos")
     
     # AFTER photos
-    photourl_after_front  = Column(Text)
-    photourl_after_left   = Column(Text)
-    photourl_after_right  = Column(Text)
-    photourl_after_rear   = Column(Text)
-    photourl_after_dash   = Column(Text)
-
-    created_at = Column(TIMESTAMP(timezone=True))
+    photourl_after_front  = deferred(Column(Text), group="photos")
+    photourl_after_left   = deferred(Column(Text), group="photos")
+    photourl_after_right  = deferred(Column(Text), group="photos")
+    photourl_after_rear   = deferred(Column(Text), group="photos")
+    photourl_after_dash   = deferred(Column(Text), group="photos")
+    # {column: {size: {fmt: url}}} written by the derivative pipeline
+    photo_variants = deferred(Column(JSON), group="photos")
+
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     hire_started_at = Column(TIMESTAMP(timezone=True))
     keys_retrieved_at = Column(TIMESTAMP(timezone=True))
+    keys_returned_at = Column(TIMESTAMP(timezone=True))
+    hire_ended_at = Column(TIMESTAMP(timezone=True))
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow)
 
     member = relationship("Member", back_populates="bookings")
     car = relationship("Car", back_populates="bookings")
 
+    __table_args__ = (
+        # A member's bookings changed since a /sync cursor
+        Index("ix_bookings_member_id_updated_at", "member_id", "updated_at"),
+    )
+
 
 class Rate(Base):
     __tablename__ = "rates"
@@ -126,8 +151,8 @@ class Rate(Base):
     active_to = Column(Date)
     is_active = Column(Boolean)
 
-    created_at = Column(TIMESTAMP(timezone=True))
-    updated_at = Column(TIMESTAMP(timezone=True))
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow, index=True)
 
     airport = relationship("Airport", back_populates="rates")
 
@@ -143,7 +168,7 @@ class Subscription(Base):
 
     renewal_date = Column(TIMESTAMP(timezone=True))
     last_checked = Column(TIMESTAMP(timezone=True))
-    created_at = Column(TIMESTAMP(timezone=True))
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     member = relationship("Member", back_populates="subscriptions")
 
@@ -160,3 +185,45 @@ class SearchLog(Base):
     desired_start = Column(TIMESTAMP(timezone=True))
     desired_end = Column(TIMESTAMP(timezone=True))
 
+
+class SearchLogDaily(Base):
+    # Search logs past retention, rolled up (see search_log_partitions.py).
+    # A day can appear in more than one row; sum them when reading.
+    __tablename__ = "search_log_daily"
+
+    search_log_daily_id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    airport_id = Column(Integer, ForeignKey("airports.airports_id"), nullable=True)
+    searches = Column(Integer, nullable=False)
+    members = Column(Integer, nullable=False)   # distinct signed-in members
+
+
+class SyncTombstone(Base):
+    # Deleted rows, kept a while so /sync can tell clients to drop them
+    # (see delta_sync.py)
+    __tablename__ = "sync_tombstones"
+
+    sync_tombstones_id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String, nullable=False)         # "bookings" | "cars" | "rates"
+    entity_id = Column(Integer, nullable=False)
+    member_id = Column(Integer, nullable=True)      # owner of a member's row; NULL = everyone's
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    idempotency_keys_id = Column(Integer, primary_key=True, index=True)
+    # "<token subject>:<method>:<path>:<Idempotency-Key header>"
+    scope = Column(String, unique=True, index=True, nullable=False)
+    request_hash = Column(String, nullable=False)
+
+    # NULL while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    # While running, the claim is only held until then; after that a retry
+    # may take it over (the first request's worker may have died)
+    locked_until = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    created_at = Column(TIMESTAMP(timezone=True))
+    expires_at = Column(TIMESTAMP(timezone=True), index=True)
@@ -0,0 +1,179 @@
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request
+
+from security import bearer_token, token_subject
+from utils.redis_client import get_redis
+
+# =====================================================
+# Token-bucket rate limiting for expensive public routes.
+#
+# Buckets are keyed by member (token subject) or, for anonymous callers,
+# client IP. Each route names a policy; members and anonymous callers get
+# separate limits because many anonymous users can share one airport NAT.
+#
+# Backend: in-memory per process by default. Set REDIS_URL to share buckets
+# across workers/instances.
+# =====================================================
+
+# Proxies in front of the app that append to X-Forwarded-For (App Runner's
+# load balancer = 1). 0 = ignore the header, key on the socket address.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    capacity: int         # burst size
+    per_minute: float     # sustained refill rate
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.per_minute / 60
+
+
+def policy_from_env(name: str, default: str) -> RatePolicy:
+    # e.g. RATE_LIMIT_AVAILABILITY_MEMBER="30/20" -> burst 30, 20 per minute
+    capacity, per_minute = os.getenv(name, default).split("/")
+    return RatePolicy(int(capacity), float(per_minute))
+
+
+POLICIES = {
+    "availability": {
+        "member": policy_from_env("RATE_LIMIT_AVAILABILITY_MEMBER", "30/30"),
+        "anonymous": policy_from_env("RATE_LIMIT_AVAILABILITY_ANONYMOUS", "60/60"),
+    },
+    "free_slots": {
+        "member": policy_from_env("RATE_LIMIT_FREE_SLOTS_MEMBER", "10/10"),
+        "anonymous": policy_from_env("RATE_LIMIT_FREE_SLOTS_ANONYMOUS", "20/20"),
+    },
+}
+
+
+# -------------------------
+# Backends
+# -------------------------
+class InMemoryBackend:
+
+    def __init__(self, max_buckets: int = 100_000):
+        self._buckets = {}   # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self._max_buckets = max_buckets
+
+    def take(self, key: str, policy: RatePolicy) -> float:
+        """Consumes one token. Returns 0 if allowed, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (policy.capacity, now))
+            tokens = min(policy.capacity, tokens + (now - updated) * policy.refill_per_second)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / policy.refill_per_second
+
+            if len(self._buckets) > self._max_buckets:
+                self._evict(now, policy)
+            return wait
+
+    def _evict(self, now: float, policy: RatePolicy):
+        # Buckets idle long enough to be full again carry no state
+        idle = policy.capacity / policy.refill_per_second
+        self._buckets = {
+            k: v for k, v in self._buckets.items() if now - v[1] < idle
+        }
+
+
+class RedisBackend:
+
+    # Atomic refill + take; returns seconds to wait (0 = allowed)
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, client):
+        self._redis = client
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    def take(self, key: str, policy: RatePolicy) -> float:
+        return float(self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[policy.capacity, policy.refill_per_second, time.time()],
+        ))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                client = get_redis()
+                _backend = RedisBackend(client) if client else InMemoryBackend()
+    return _backend
+
+
+# -------------------------
+# Dependency
+# -------------------------
+def client_ip(request: Request) -> str:
+    # Each proxy appends the address it received the request from, so only
+    # the last TRUSTED_PROXY_HOPS entries are ours; anything to the left of
+    # them is whatever the client chose to send
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(policy_name: str):
+    """Route dependency: Depends(rate_limit("availability"))."""
+    policies = POLICIES[policy_name]
+
+    def check(request: Request):
+        subject = token_subject(bearer_token(request.headers.get("Authorization")))
+        if subject:
+            key, policy = f"{policy_name}:member:{subject}", policies["member"]
+        else:
+            key, policy = f"{policy_name}:ip:{client_ip(request)}", policies["anonymous"]
+
+        try:
+            wait = get_backend().take(key, policy)
+        except Exception as e:
+            # Fail open: a limiter outage must not take the route down
+            print(f"Rate limiter unavailable: {e!r}")
+            return
+
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    return check
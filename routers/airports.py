@@ -1,20 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import get_db
+from bulk_import import ImportSpec, run_import
+from crud import create_record, update_by_id
+from database import get_db, get_read_db
+from security import get_current_member
 from models import Airport
-from schemas import AirportCreate, AirportUpdate, AirportOut
+from schemas import AirportCreate, AirportUpdate, AirportOut, AirportNearbyOut, AirportSearchOut, ImportFormat, ImportMode, ImportResult
+from utils.airport_index import get_airport_index, invalidate_airport_index
 
 router = APIRouter(prefix="/airports", tags=["airports"])
 
+AIRPORT_IMPORT = ImportSpec(Airport, AirportCreate, key=("icao_code",))
+
+def require_admin(current_user = Depends(get_current_member)):
+    # Later replace with user.is_admin Boolean
+    if getattr(current_user, "platform", "") != "admin":
+        raise HTTPException(403, "Admin access required.")
+    return current_user
+
 @router.get("/", response_model=list[AirportOut])
-def list_airports(db: Session = Depends(get_db), active_only: bool = True):
+def list_airports(db: Session = Depends(get_read_db), active_only: bool = True):
     q = db.query(Airport)
     if active_only:
         q = q.filter(Airport.is_active == True)
     return q.order_by(Airport.name).all()
 
+# Must stay above /{airport_id}
+@router.get("/nearby", response_model=list[AirportNearbyOut])
+def nearby_airports(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float | None = Query(None, gt=0, le=2000, description="km; omit for the nearest `limit` airports"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    # Active airports only, closest first. The session is only used when
+    # the index has to be (re)built, and then reads from the primary.
+    return get_airport_index(db).nearby(lat, lon, radius, limit)
+
+@router.get("/search", response_model=list[AirportSearchOut])
+def search_airports(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    # Typeahead over active airports by name or ICAO code; exact and prefix
+    # matches first, then typo-tolerant ones. Same index as /nearby.
+    return get_airport_index(db).search(q, limit)
+
 @router.get("/{airport_id}", response_model=AirportOut)
-def get_airport(airport_id: int, db: Session = Depends(get_db)):
+def get_airport(airport_id: int, db: Session = Depends(get_read_db)):
     obj = db.query(Airport).get(airport_id)
     if not obj:
         raise HTTPException(404, "Airport not found")
@@ -22,21 +58,16 @@ def get_airport(airport_id: int, db: Session = Depends(get_db)):
 
 @router.post("/", response_model=AirportOut)
 def create_airport(payload: AirportCreate, db: Session = Depends(get_db)):
-    obj = Airport(**payload.model_dump(exclude_unset=True))
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    obj = create_record(db, Airport, payload.model_dump(exclude_unset=True))
+    invalidate_airport_index()
     return obj
 
 @router.put("/{airport_id}", response_model=AirportOut)
 def update_airport(airport_id: int, payload: AirportUpdate, db: Session = Depends(get_db)):
-    obj = db.query(Airport).get(airport_id)
+    obj = update_by_id(db, Airport, airport_id, payload.model_dump(exclude_unset=True))
     if not obj:
         raise HTTPException(404, "Airport not found")
-    for k, v in payload.model_dump(exclude_unset=True).items():
-        setattr(obj, k, v)
-    db.commit()
-    db.refresh(obj)
+    invalidate_airport_index()
     return obj
 
 @router.delete("/{airport_id}")
@@ -46,4 +77,20 @@ def delete_airport(airport_id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "Airport not found")
     db.delete(obj)
     db.commit()
+    invalidate_airport_index()
     return {"ok": True}
+
+@router.post("/import", response_model=ImportResult, dependencies=[Depends(require_admin)])
+async def import_airports(
+    request: Request,
+    format: ImportFormat | None = None,
+    mode: ImportMode = "insert",
+    partial: bool = False,
+):
+    """
+    Bulk create (or with mode=upsert, update) airports from a CSV body with a
+    header row, or NDJSON. Rows are matched on icao_code.
+    """
+    report = await run_import(request, AIRPORT_IMPORT, format, mode, partial)
+    await run_in_threadpool(invalidate_airport_index)
+    return report
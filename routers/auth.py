@@ -1,12 +1,12 @@
 import os
-import requests
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
+from crud import create_record
 from database import get_db
 from models import Member
 from schemas import SocialLoginRequest, AuthResponse, MemberOut
-from security import create_access_token
+from security import create_member_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -18,6 +18,9 @@ GOOGLE_WEB_CLIENT_ID = os.getenv("GOOGLE_WEB_CLIENT_ID")
 # Validate Google ID Token (DEBUG ADDED)
 # ---------------------------------------------------------
 def verify_google_id_token(id_token: str):
+    # Deferred: only the login route needs requests
+    import requests
+
     try:
         print("\nDEBUG: Verifying Google token...")
         resp = requests.get(GOOGLE_TOKENINFO_URL, params={"id_token": id_token})
@@ -81,15 +84,12 @@ def login_with_google(
 
     if not member:
         print(" DEBUG: Creating NEW member")
-        member = Member(
-            email=email,
-            name=name,
-            platform="google",
-            status="new_user",
-        )
-        db.add(member)
-        db.commit()
-        db.refresh(member)
+        member = create_record(db, Member, {
+            "email": email,
+            "name": name,
+            "platform": "google",
+            "status": "new_user",
+        })
     else:
         print(" DEBUG: Existing member found → ID:", member.members_id)
         print(" DEBUG: Existing status:", member.status)
@@ -106,7 +106,7 @@ def login_with_google(
     }
 
     if member.status in ["new_user", "verified"]:
-        token = create_access_token({"sub": member.email})
+        token = create_member_token(member)
         response["access_token"] = token
         response["token_type"] = "bearer"
 
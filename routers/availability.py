@@ -1,26 +1,45 @@
+import heapq
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, undefer_group
 from sqlalchemy import and_
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from database import get_db
-from security import get_current_member_optional  # NEW (optional auth)
-from models import Car, Booking, Airport, SearchLog
-from schemas import AvailabilityCarOut, AvailabilityResponse
+from database import get_db, get_read_db
+from rate_limit import rate_limit
+from search_log_partitions import log_search
+from security import get_current_claims_optional  # NEW (optional auth)
+from models import Car, Booking, Airport
+from schemas import (
+    AvailabilityCarOut,
+    AvailabilityResponse,
+    FreeSlotsResponse,
+    ImageSize,
+    ImageFormat,
+)
+from utils import metrics
+from utils.cache import availability_cache
+from utils.fieldsets import FIELDS_QUERY, parse_fields, serialize
+from utils.images import CAR_IMAGE_COLUMNS, pick_image_url
+from utils.singleflight import SingleFlight
+from utils.time_utils import as_utc
 
 router = APIRouter(prefix="/availability", tags=["availability"])
 
+BLOCKING_STATUSES = ["active", "confirmed", "in_progress"]
 
-@router.get("/", response_model=AvailabilityResponse)
-def check_availability(
-    airport_id: int = Query(..., description="Airport ID"),
-    start_time: datetime = Query(..., description="Desired hire start time (UTC)"),
-    end_time: datetime = Query(..., description="Desired hire end time (UTC)"),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_member_optional),   # NEW: optional login
-):
+# Same handover buffer as extend_booking / is-preceding-booking
+HANDOVER_BUFFER = timedelta(minutes=30)
+
+
+# Concurrent identical searches (same airport + window) share one computation
+availability_flights = SingleFlight()
+
+
+def compute_availability(db: Session, airport_id: int, start_time: datetime, end_time: datetime) -> dict:
     """
-    Returns cars NOT booked in this window and automatically logs the search.
+    Airport name + available cars as plain dicts, so one result can be
+    handed to every coalesced request.
     """
 
     # -------------------------------------
@@ -33,20 +52,11 @@ def check_availability(
 
     if not airport:
         raise HTTPException(status_code=404, detail="Airport not found or inactive")
-    
-    if start_time.tzinfo is None or end_time.tzinfo is None:
-        raise HTTPException(
-            status_code=400,
-            detail="start_time and end_time must include timezone information (UTC)"
-        )
-
-    if end_time <= start_time:
-        raise HTTPException(status_code=400, detail="End time must be after start time")
 
     # -------------------------------------
     # 2. Fetch all cars at the airport
     # -------------------------------------
-    all_cars = db.query(Car).filter(
+    all_cars = db.query(Car).options(undefer_group("images")).filter(
         Car.airport_id == airport_id,
         Car.status.in_(["active", "available"])
     ).all()
@@ -56,54 +66,288 @@ def check_availability(
     # -------------------------------------
     overlapping = db.query(Booking.car_id).filter(
         Booking.car_id.in_([c.cars_id for c in all_cars]),
-        Booking.status.in_(["active", "confirmed", "in_progress"]),
+        Booking.status.in_(BLOCKING_STATUSES),
         and_(Booking.start_time < end_time, Booking.end_time > start_time)
     ).distinct().all()
 
     booked_ids = {row.car_id for row in overlapping}
-    available = [c for c in all_cars if c.cars_id not in booked_ids]
+
+    return {
+        "airport": airport.name,
+        "cars": [
+            {
+                "cars_id": c.cars_id,
+                "registration": c.registration,
+                "make_model": c.make_model,
+                "price_hourly": float(c.price_hourly) if c.price_hourly else None,
+                "keyfob_code": c.keyfob_code,
+                "lockbox_ble_name": c.lockbox_ble_name,
+                "status": c.status,
+                "image_variants": c.image_variants,
+                **{column: getattr(c, column) for column in CAR_IMAGE_COLUMNS},
+            }
+            for c in all_cars
+            if c.cars_id not in booked_ids
+        ],
+    }
+
+
+@router.get("/", response_model=AvailabilityResponse, dependencies=[Depends(rate_limit("availability"))])
+def check_availability(
+    airport_id: int = Query(..., description="Airport ID"),
+    start_time: datetime = Query(..., description="Desired hire start time (UTC)"),
+    end_time: datetime = Query(..., description="Desired hire end time (UTC)"),
+    image_size: ImageSize = Query("original", description="Car image variant to return"),
+    image_format: ImageFormat = Query("webp", description="Variant format (ignored for original)"),
+    fields: str | None = FIELDS_QUERY,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_claims_optional),   # NEW: optional login
+):
+    """
+    Returns cars NOT booked in this window and automatically logs the search.
+    fields= narrows each available car (AvailabilityCarOut fields).
+    """
+    selected = parse_fields(fields, AvailabilityCarOut, always=("cars_id",))
+
+    if start_time.tzinfo is None or end_time.tzinfo is None:
+        raise HTTPException(
+            status_code=400,
+            detail="start_time and end_time must include timezone information (UTC)"
+        )
+
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="End time must be after start time")
+
+    # -------------------------------------
+    # 1-3. Airport, cars, overlaps (cached, then coalesced)
+    # -------------------------------------
+    scope = f"airport:{airport_id}"
+    key = (airport_id, start_time.astimezone(timezone.utc), end_time.astimezone(timezone.utc))
+    metrics.incr("availability.requests")
+
+    cached = availability_cache.get(scope, key)
+    if cached is not None:
+        result, age = cached
+        metrics.incr("availability.cache.hits")
+        metrics.observe("availability.cache.age_seconds", age)
+    else:
+        metrics.incr("availability.cache.misses")
+        # Read the generation BEFORE the data; a booking committed after
+        # this point makes put() refuse the (possibly stale) result
+        try:
+            generation = availability_cache.generation(scope)
+        except Exception:
+            generation = None
+
+        result, shared = availability_flights.do(
+            (key, generation),
+            lambda: compute_availability(db, airport_id, start_time, end_time),
+        )
+        metrics.incr("availability.coalesced" if shared else "availability.computed")
+
+        if generation is not None and not shared and availability_cache.enabled:
+            if not availability_cache.put(scope, key, result, generation):
+                metrics.incr("availability.cache.stale_discards")
 
     # -------------------------------------
-    # 4. AUTO-LOG THE SEARCH (SECURE)
+    # 4. AUTO-LOG THE SEARCH (SECURE) - every request, coalesced or not
     # -------------------------------------
-    log = SearchLog(
+    log_search(db, dict(
         member_id=getattr(current_user, "members_id", None),  # None if anonymous
         airport_id=airport_id,
         search_date=start_time.date(),
         search_time=datetime.now(timezone.utc),
         desired_start=start_time,
         desired_end=end_time
-    )
-    db.add(log)
-    db.commit()
+    ))
 
     # -------------------------------------
     # 5. Return clean response
     # -------------------------------------
+    # The cached result is shared by every fieldset, so fields= trims the
+    # response (and skips picking images nobody asked for), not the query
+    available = result["cars"]
+    image_columns = [c for c in CAR_IMAGE_COLUMNS if selected is None or c in selected]
+    cars = [
+        {
+            **{k: v for k, v in c.items() if k != "image_variants"},
+            **{
+                column: pick_image_url(c[column], c["image_variants"], column, image_size, image_format)
+                for column in image_columns
+            },
+        }
+        for c in available
+    ]
+    if selected is not None:
+        return JSONResponse({
+            "airport": result["airport"],
+            "total_available": len(available),
+            "available_cars": serialize(AvailabilityCarOut, selected, cars),
+        })
     return {
-        "airport": airport.name,
+        "airport": result["airport"],
         "total_available": len(available),
-        "available_cars": [
+        "available_cars": cars,
+    }
+
+
+# ===================================================================
+# EARLIEST FREE SLOTS (+ max extension of an in-progress hire)
+# ===================================================================
+def sweep_free_gaps(bookings, car_ids, window_start, window_end, duration):
+    """
+    Single pass over bookings sorted by (car_id, start_time).
+    Yields (car_id, gap_start, gap_end) for every gap that fits `duration`
+    plus the handover buffer before the next booking. The last gap of a car
+    has nothing booked after it within the window: gap_end is None (open
+    ended), and it is yielded if `duration` fits before window_end.
+    """
+    seen = set()
+    car_id = None
+    cursor = window_start
+
+    for b in bookings:
+        if b.car_id != car_id:
+            if car_id is not None and window_end - cursor >= duration:
+                yield car_id, cursor, None
+            car_id = b.car_id
+            seen.add(car_id)
+            cursor = window_start
+
+        gap_end = as_utc(b.start_time) - HANDOVER_BUFFER
+        if gap_end - cursor >= duration:
+            yield car_id, cursor, gap_end
+        cursor = max(cursor, as_utc(b.end_time))
+
+    if car_id is not None and window_end - cursor >= duration:
+        yield car_id, cursor, None
+
+    # Cars without any booking in the window are free throughout
+    for cid in car_ids:
+        if cid not in seen:
+            yield cid, window_start, None
+
+
+@router.get("/free-slots", response_model=FreeSlotsResponse, dependencies=[Depends(rate_limit("free_slots"))])
+def find_free_slots(
+    duration_minutes: int = Query(..., gt=0, description="Desired hire length"),
+    airport_id: int | None = Query(None, description="Search every car at this airport"),
+    car_id: int | None = Query(None, description="Search a single car"),
+    booking_id: int | None = Query(None, description="Also report max extension for this in-progress booking"),
+    after: datetime | None = Query(None, description="Search from (UTC), defaults to now"),
+    horizon_hours: int = Query(72, gt=0, le=24 * 31),
+    limit: int = Query(5, gt=0, le=50),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_claims_optional),
+):
+    """
+    Earliest gaps that fit the requested duration, per car or across an airport.
+    """
+    booking = None
+    if booking_id is not None:
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="Login required for booking_id")
+
+        booking = db.query(Booking).get(booking_id)
+        if not booking:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        if booking.member_id != current_user.members_id:
+            raise HTTPException(status_code=403, detail="Not your booking")
+        if booking.status != "in_progress":
+            raise HTTPException(status_code=400, detail="Only active hires can be extended")
+        car_id = booking.car_id
+
+    if car_id is None and airport_id is None:
+        raise HTTPException(status_code=400, detail="airport_id, car_id or booking_id is required")
+
+    if after is not None and after.tzinfo is None:
+        raise HTTPException(
+            status_code=400,
+            detail="after must include timezone information (UTC)",
+        )
+
+    window_start = after.astimezone(timezone.utc) if after else datetime.now(timezone.utc)
+    if booking is not None:
+        window_start = max(window_start, as_utc(booking.end_time))
+    window_end = window_start + timedelta(hours=horizon_hours)
+    duration = timedelta(minutes=duration_minutes)
+
+    # -------------------------------------
+    # 1. Candidate cars
+    # -------------------------------------
+    q = db.query(Car.cars_id, Car.registration, Car.make_model)
+    if car_id is not None:
+        q = q.filter(Car.cars_id == car_id)
+    else:
+        q = q.join(Car.airport).filter(
+            Car.airport_id == airport_id,
+            Car.status.in_(["active", "available"]),
+            Airport.is_active == True,
+        )
+    cars = {c.cars_id: c for c in q.all()}
+
+    if car_id is not None and not cars:
+        raise HTTPException(status_code=404, detail="Car not found")
+
+    # -------------------------------------
+    # 2. One sorted read of every booking that can touch the window
+    # -------------------------------------
+    bookings = (
+        db.query(Booking.bookings_id, Booking.car_id, Booking.start_time, Booking.end_time, Booking.status)
+        .filter(
+            Booking.car_id.in_(list(cars)),
+            Booking.status.in_(BLOCKING_STATUSES),
+            Booking.end_time > window_start,
+            Booking.start_time < window_end + HANDOVER_BUFFER,
+        )
+        .order_by(Booking.car_id, Booking.start_time)
+        .all()
+    )
+
+    # -------------------------------------
+    # 3. Sweep, keep the earliest N
+    # -------------------------------------
+    blocking = [b for b in bookings if booking is None or b.bookings_id != booking.bookings_id]
+    gaps = heapq.nsmallest(
+        limit,
+        sweep_free_gaps(blocking, list(cars), window_start, window_end, duration),
+        key=lambda g: (g[1], g[0]),
+    )
+
+    response = {
+        "duration_minutes": duration_minutes,
+        "search_start": window_start,
+        "search_end": window_end,
+        "slots": [
             {
-                "cars_id": c.cars_id,
-                "registration": c.registration,
-                "make_model": c.make_model,
-                "price_hourly": float(c.price_hourly) if c.price_hourly else None,
-                "keyfob_code": c.keyfob_code,
-                "lockbox_ble_name": c.lockbox_ble_name,
-                "status": c.status,
-        
-                # NEW IMAGES
-                "image_url": c.image_url,
-                "carleft_url": c.carleft_url,
-                "carright_url": c.carright_url,
-                "carback_url": c.carback_url,
-                "carfront_url": c.carfront_url,
-                "cardash_url": c.cardash_url,
+                "cars_id": cid,
+                "registration": cars[cid].registration,
+                "make_model": cars[cid].make_model,
+                "slot_start": start,
+                "slot_end": end,
             }
-            for c in available
-        ]
+            for cid, start, end in gaps
+        ],
     }
 
+    # -------------------------------------
+    # 4. Max extension: same rule as extend_booking
+    # -------------------------------------
+    if booking is not None:
+        end = as_utc(booking.end_time)
+        next_start = next(
+            (
+                as_utc(b.start_time)
+                for b in blocking
+                if b.status == "confirmed" and as_utc(b.start_time) >= end
+            ),
+            None,
+        )
+        response["booking_id"] = booking.bookings_id
+        response["next_booking_start"] = next_start
+        if next_start is not None:
+            response["max_extension_minutes"] = max(
+                0, int((next_start - HANDOVER_BUFFER - end).total_seconds() // 60)
+            )
 
-
+    return response
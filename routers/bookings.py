@@ -1,43 +1,203 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, aliased, load_only, contains_eager
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, desc, select
 from datetime import datetime, timedelta, timezone
 
+from access_bundles import MAX_KEY_EVENTS, issue_bundle, public_keys, record_key_events
+from booking_states import apply_transition, check_owner, expire_overdue
+from crud import create_record, update_by_id
+from delta_sync import record_deletion
+from utils.cache import invalidate_airport_availability, invalidate_member_calendar
+from utils.events import member_channel, publish
 from utils.email_utils import send_booking_confirmation_email
-from database import get_db
-from security import get_current_member
-from models import Booking, Member, Car
+from utils.fieldsets import FIELDS_QUERY, model_columns, parse_fields, partial_model, render
+from utils.images import pick_image_url
+from utils.time_utils import as_utc
+from database import get_db, get_read_db
+from security import TokenClaims, check_active, get_current_claims, get_current_claims_fresh, get_current_member
+from models import Booking, Member, Car, Airport
 from schemas import (
     BookingCreate,
     BookingUpdate,
     BookingOut,
     BookingPhotoUpdate,
+    AccessBundleOut,
+    KeyEventBatch,
+    KeyEventBatchOut,
+    ImageSize,
+    ImageFormat,
 )
 
 router = APIRouter(
     prefix="/bookings",
     tags=["bookings"],
-    dependencies=[Depends(get_current_member)],
+    dependencies=[Depends(get_current_claims)],
 )
 
+# Routes under /bookings that take no token (included in main.py)
+public_router = APIRouter(prefix="/bookings", tags=["bookings"])
+
+
+def invalidate_availability(db: Session, *car_ids):
+    """Drop cached /availability results for these cars' airports. Call after commit."""
+    airport_ids = [a for (a,) in db.query(Car.airport_id).filter(Car.cars_id.in_(car_ids))]
+    invalidate_airport_availability(*airport_ids)
+
+
+AIRPORT_BRIEF_COLUMNS = (
+    Airport.airports_id,
+    Airport.name,
+    Airport.icao_code,
+    Airport.parking_description,
+    Airport.latitude,
+    Airport.longitude,
+)
+
+
+def car_brief_columns(image_size: str = "original"):
+    columns = [
+        Car.cars_id,
+        Car.registration,
+        Car.make_model,
+        Car.image_url,
+        Car.price_hourly,
+        Car.airport_id,
+    ]
+    if image_size != "original":
+        columns.append(Car.image_variants)
+    return columns
+
+
+BOOKING_OUT_COLUMNS = (
+    Booking.bookings_id,
+    Booking.member_id,
+    Booking.car_id,
+    Booking.start_time,
+    Booking.end_time,
+    Booking.status,
+    Booking.created_at,
+    Booking.hire_started_at,
+    Booking.keys_retrieved_at,
+    Booking.keys_returned_at,
+    Booking.hire_ended_at,
+)
+
+
+def booking_out_options(image_size: str = "original", fields: frozenset | None = None):
+    """
+    load_only projection matching BookingOut -> CarBrief -> AirportBrief,
+    for queries that already join Booking.car and Car.airport.
+    Photo URLs and the other car images are never selected.
+
+    fields: a sparse fieldset (utils/fieldsets.py); the car and airport
+    columns are only loaded when it includes "car".
+    """
+    if fields is None:
+        booking_columns = BOOKING_OUT_COLUMNS
+    else:
+        booking_columns = model_columns(Booking, fields)
+        if "car" not in fields:
+            return (load_only(*booking_columns),)
+    return (
+        load_only(*booking_columns),
+        contains_eager(Booking.car).load_only(*car_brief_columns(image_size)),
+        contains_eager(Booking.car).contains_eager(Car.airport).load_only(*AIRPORT_BRIEF_COLUMNS),
+    )
+
+
+def load_car_brief(db: Session, car_id: int):
+    """A car with just the CarBrief/AirportBrief columns, in one query."""
+    return (
+        db.query(Car)
+        .outerjoin(Car.airport)
+        .options(
+            load_only(*car_brief_columns()),
+            contains_eager(Car.airport).load_only(*AIRPORT_BRIEF_COLUMNS),
+        )
+        .filter(Car.cars_id == car_id)
+        .first()
+    )
+
+
+def load_booking_car(db: Session, booking: Booking):
+    """
+    Loads the car brief of a booking returned by a write and attaches it
+    as booking.car (no lazy loads later).
+    """
+    car = load_car_brief(db, booking.car_id)
+    set_committed_value(booking, "car", car)
+    return car
+
+
+def publish_booking(member_id: int, bookings_id: int, change: str, booking: Booking | None = None):
+    """Booking change notice for the member's /events/stream. Call after commit."""
+    event = {"type": "booking", "change": change, "bookings_id": bookings_id}
+    if booking is not None:
+        event.update(
+            status=booking.status,
+            car_id=booking.car_id,
+            start_time=as_utc(booking.start_time).isoformat() if booking.start_time else None,
+            end_time=as_utc(booking.end_time).isoformat() if booking.end_time else None,
+        )
+    publish(member_channel(member_id), event)
+
+
+def transitioned(db: Session, booking: Booking, invalidate: bool = True):
+    """
+    Response for a booking write. Notifies the member's event stream, and
+    drops cached availability and calendar if the booking's slot changed.
+    """
+    car = load_booking_car(db, booking)
+    if invalidate:
+        invalidate_member_calendar(booking.member_id)
+        if car is not None:
+            invalidate_airport_availability(car.airport_id)
+    publish_booking(booking.member_id, booking.bookings_id, "updated", booking)
+    return booking
+
+
+def with_image_size(booking, image_size: str, image_format: str, schema=BookingOut):
+    """Swap the car image for the requested variant (original = unchanged)."""
+    if booking is None or image_size == "original" or "car" not in schema.model_fields:
+        return booking
+
+    out = schema.model_validate(booking)
+    out.car.image_url = pick_image_url(
+        booking.car.image_url,
+        booking.car.image_variants,
+        "image_url",
+        image_size,
+        image_format,
+    )
+    return out
+
 # ===================================================================
 # 1. LIST BOOKINGS
 # ===================================================================
 @router.get("/", response_model=list[BookingOut])
 def list_bookings(
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    image_size: ImageSize = Query("original"),
+    image_format: ImageFormat = Query("webp"),
+    fields: str | None = FIELDS_QUERY,
+    db: Session = Depends(get_read_db),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
+    selected = parse_fields(fields, BookingOut, always=("bookings_id",))
+    schema = BookingOut if selected is None else partial_model(BookingOut, selected)
+
     bookings = (
         db.query(Booking)
         .join(Booking.car)
         .join(Car.airport)
+        .options(*booking_out_options(image_size, selected))
         .filter(Booking.member_id == current_user.members_id)
         .order_by(Booking.start_time.desc())
         .all()
     )
-    return bookings
+    bookings = [with_image_size(b, image_size, image_format, schema) for b in bookings]
+    return bookings if selected is None else render(BookingOut, selected, bookings)
 
 # ===================================================================
 # 2. CREATE BOOKING
@@ -48,6 +208,7 @@ def create_booking(
     db: Session = Depends(get_db),
     current_user: Member = Depends(get_current_member),
 ):
+    check_active(current_user.status)
     payload.member_id = current_user.members_id
 
     # ---- Defensive: ensure timezone-aware UTC datetimes ----
@@ -63,7 +224,7 @@ def create_booking(
     if payload.end_time <= payload.start_time:
         raise HTTPException(status_code=400, detail="End time must be after start time")
 
-    car = db.query(Car).filter(Car.cars_id == payload.car_id).first()
+    car = load_car_brief(db, payload.car_id)
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
 
@@ -82,10 +243,11 @@ def create_booking(
             detail="This car is already booked during the selected period.",
         )
 
-    new_booking = Booking(**payload.model_dump(exclude_unset=True))
-    db.add(new_booking)
-    db.commit()
-    db.refresh(new_booking)
+    new_booking = create_record(db, Booking, payload.model_dump(exclude_unset=True))
+    set_committed_value(new_booking, "car", car)
+    invalidate_airport_availability(car.airport_id)
+    invalidate_member_calendar(current_user.members_id)
+    publish_booking(current_user.members_id, new_booking.bookings_id, "created", new_booking)
 
     # ---- Fire-and-forget email ----
     try:
@@ -108,21 +270,19 @@ def update_booking(
     bookings_id: int,
     payload: BookingUpdate,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
-    booking = db.query(Booking).get(bookings_id)
+    booking = update_by_id(
+        db,
+        Booking,
+        bookings_id,
+        payload.model_dump(exclude_unset=True),
+        Booking.member_id == current_user.members_id,
+    )
     if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    if booking.member_id != current_user.members_id:
-        raise HTTPException(status_code=403, detail="Not your booking")
+        check_owner(db, bookings_id, current_user.members_id)
 
-    for key, value in payload.model_dump(exclude_unset=True).items():
-        setattr(booking, key, value)
-
-    db.commit()
-    db.refresh(booking)
-    return booking
+    return transitioned(db, booking)
 
 # ===================================================================
 # 4. DELETE BOOKING
@@ -131,7 +291,7 @@ def update_booking(
 def delete_booking(
     bookings_id: int,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
     booking = db.query(Booking).get(bookings_id)
     if not booking:
@@ -140,8 +300,13 @@ def delete_booking(
     if booking.member_id != current_user.members_id:
         raise HTTPException(status_code=403, detail="Not your booking")
 
+    car_id = booking.car_id
     db.delete(booking)
+    record_deletion(db, "bookings", bookings_id, current_user.members_id)
     db.commit()
+    invalidate_availability(db, car_id)
+    invalidate_member_calendar(current_user.members_id)
+    publish_booking(current_user.members_id, bookings_id, "deleted")
     return {"status": "deleted", "booking_id": bookings_id}
 
 # ===================================================================
@@ -151,24 +316,10 @@ def delete_booking(
 def start_hire(
     bookings_id: int,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
-    booking = db.query(Booking).get(bookings_id)
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    if booking.member_id != current_user.members_id:
-        raise HTTPException(status_code=403, detail="Not your booking")
-
-    if booking.status != "confirmed":
-        raise HTTPException(status_code=400, detail="Cannot start hire")
-
-    booking.status = "in_progress"
-    booking.hire_started_at = datetime.now(timezone.utc)
-
-    db.commit()
-    db.refresh(booking)
-    return booking
+    booking = apply_transition(db, bookings_id, current_user.members_id, "start")
+    return transitioned(db, booking)
 
 # ===================================================================
 # 5.5 COMPLETE KEY RETRIEVAL (Physical Confirmation) - to Start Hire
@@ -177,52 +328,81 @@ def start_hire(
 def complete_keys(
     bookings_id: int,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
-    booking = db.query(Booking).get(bookings_id)
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    # Sets keys_retrieved_at - the "Physical Truth" milestone - and makes
+    # sure the hire is in_progress
+    booking = apply_transition(db, bookings_id, current_user.members_id, "complete_keys")
+    return transitioned(db, booking)
 
-    if booking.member_id != current_user.members_id:
-        raise HTTPException(status_code=403, detail="Not your booking")
+# ===================================================================
+# 5.6 OFFLINE ACCESS BUNDLE - cached by the app for key pickup
+# without signal (see access_bundles.py)
+# ===================================================================
+@public_router.get("/access-bundle/keys")
+def access_bundle_keys():
+    # Public keys (JWKS) the app verifies bundles with; no token, so the
+    # app can fetch them before sign-in or with an expired session
+    return public_keys()
 
-    # Set the key retrieval timestamp - the "Physical Truth" milestone
-    booking.keys_retrieved_at = datetime.now(timezone.utc)
-    
-    # Ensure status is definitely in_progress if it wasn't already
-    booking.status = "in_progress"
 
-    db.commit()
-    db.refresh(booking)
-    return booking
+@router.get("/{bookings_id}/access-bundle", response_model=AccessBundleOut)
+def get_access_bundle(
+    bookings_id: int,
+    # Primary: fetched right after the booking is confirmed
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(get_current_claims_fresh),
+):
+    return issue_bundle(db, bookings_id, current_user.members_id)
+
+# ===================================================================
+# 5.7 UPLOAD KEY EVENTS RECORDED OFFLINE
+# Each event gets its own result; one bad event doesn't fail the batch.
+# ===================================================================
+@router.post("/key-events", response_model=KeyEventBatchOut)
+def upload_key_events(
+    payload: KeyEventBatch,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(get_current_claims_fresh),
+):
+    if len(payload.events) > MAX_KEY_EVENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_KEY_EVENTS} events per upload")
+
+    results, applied = record_key_events(db, current_user.members_id, payload.events)
+    if applied:
+        invalidate_availability(db, *{b.car_id for b in applied})
+        invalidate_member_calendar(current_user.members_id)
+        for booking in applied:
+            publish_booking(booking.member_id, booking.bookings_id, "updated", booking)
+    return {"results": results}
 
 # ===================================================================
 # 6. GET ACTIVE BOOKING
 # ===================================================================
 @router.get("/active", response_model=BookingOut | None)
 def get_active_booking(
+    image_size: ImageSize = Query("original"),
+    image_format: ImageFormat = Query("webp"),
+    fields: str | None = FIELDS_QUERY,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
+    selected = parse_fields(fields, BookingOut, always=("bookings_id",))
+    schema = BookingOut if selected is None else partial_model(BookingOut, selected)
     now = datetime.now(timezone.utc)
 
-    expired = (
-        db.query(Booking)
-        .filter(
-            Booking.member_id == current_user.members_id,
-            Booking.status == "in_progress",
-            Booking.end_time < now,
-        )
-        .update({Booking.status: "expired"}, synchronize_session=False)
-    )
-
+    expired = expire_overdue(db, current_user.members_id, now)
     if expired:
-        db.commit()
+        invalidate_availability(db, *[row.car_id for row in expired])
+        invalidate_member_calendar(current_user.members_id)
+        for row in expired:
+            publish_booking(current_user.members_id, row.bookings_id, "expired")
 
     booking = (
         db.query(Booking)
         .join(Booking.car)
         .join(Car.airport)
+        .options(*booking_out_options(image_size, selected))
         .filter(
             Booking.member_id == current_user.members_id,
             Booking.status == "in_progress",
@@ -233,7 +413,10 @@ def get_active_booking(
         .first()
     )
 
-    return booking
+    booking = with_image_size(booking, image_size, image_format, schema)
+    if selected is None or booking is None:
+        return booking
+    return render(BookingOut, selected, booking, many=False)
 
 # ===================================================================
 # 6.5 GET BOOKING BY ID
@@ -241,13 +424,20 @@ def get_active_booking(
 @router.get("/{bookings_id}", response_model=BookingOut)
 def get_booking_by_id(
     bookings_id: int,
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    image_size: ImageSize = Query("original"),
+    image_format: ImageFormat = Query("webp"),
+    fields: str | None = FIELDS_QUERY,
+    db: Session = Depends(get_read_db),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
+    selected = parse_fields(fields, BookingOut, always=("bookings_id",))
+    schema = BookingOut if selected is None else partial_model(BookingOut, selected)
+
     booking = (
         db.query(Booking)
         .join(Booking.car)
         .join(Car.airport)
+        .options(*booking_out_options(image_size, selected))
         .filter(
             Booking.bookings_id == bookings_id,
             Booking.member_id == current_user.members_id,
@@ -258,7 +448,8 @@ def get_booking_by_id(
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    return booking
+    booking = with_image_size(booking, image_size, image_format, schema)
+    return booking if selected is None else render(BookingOut, selected, booking, many=False)
 
 # ===================================================================
 # 7. CHECK PRECEDING BOOKING
@@ -267,8 +458,8 @@ def get_booking_by_id(
 def is_preceding_booking(
     car_id: int,
     start_time: datetime,
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    db: Session = Depends(get_read_db),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
     if start_time.tzinfo is None:
         raise HTTPException(
@@ -301,8 +492,8 @@ def is_preceding_booking(
 def get_next_booking_start(
     car_id: int,
     current_end_time: datetime,
-    db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    db: Session = Depends(get_read_db),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
     if current_end_time.tzinfo is None:
         raise HTTPException(
@@ -336,15 +527,8 @@ def update_booking_photo(
     booking_id: int,
     payload: BookingPhotoUpdate,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
-    booking = db.query(Booking).get(booking_id)
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    if booking.member_id != current_user.members_id:
-        raise HTTPException(status_code=403, detail="Not your booking")
-
     column_name = f"photourl_{payload.phase}_{payload.angle}"
 
     if not hasattr(Booking, column_name):
@@ -353,10 +537,15 @@ def update_booking_photo(
             detail=f"Invalid photo slot: {column_name}",
         )
 
-    setattr(booking, column_name, payload.url)
-
-    db.commit()
-    db.refresh(booking)
+    booking = update_by_id(
+        db,
+        Booking,
+        booking_id,
+        {column_name: payload.url},
+        Booking.member_id == current_user.members_id,
+    )
+    if not booking:
+        check_owner(db, booking_id, current_user.members_id)
 
     return {
         "status": "updated",
@@ -373,50 +562,51 @@ def extend_booking(
     bookings_id: int,
     extension_minutes: int, # Sent as a query param or part of a small schema
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims_fresh),
 ):
-    booking = db.query(Booking).get(bookings_id)
-    if not booking:
+    # Scoped to the caller: someone else's end time is never read
+    current_end = (
+        db.query(Booking.end_time)
+        .filter(Booking.bookings_id == bookings_id, Booking.member_id == current_user.members_id)
+        .scalar()
+    )
+    if current_end is None:
+        check_owner(db, bookings_id, current_user.members_id)
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    if booking.member_id != current_user.members_id:
-        raise HTTPException(status_code=403, detail="Not your booking")
-
-    if booking.status != "in_progress":
-        raise HTTPException(status_code=400, detail="Only active hires can be extended")
-
     # 1. Calculate the proposed new end time
-    new_end_time = booking.end_time + timedelta(minutes=extension_minutes)
-    
+    new_end_time = current_end + timedelta(minutes=extension_minutes)
+
     # 2. Define the 'Handover Buffer' (30 mins)
     buffer = timedelta(minutes=30)
 
-    # 3. Check for overlaps with FUTURE confirmed bookings
-    # A conflict exists if another booking starts BEFORE our (new_end_time + buffer)
+    # 3. No FUTURE confirmed booking may start before (new_end_time + buffer).
+    # Checked inside the UPDATE, together with end_time still being the one
+    # we extended from, so a concurrent extension can't be applied twice.
+    other = aliased(Booking)
     conflict = (
-        db.query(Booking)
-        .filter(
-            Booking.car_id == booking.car_id,
-            Booking.status == "confirmed",
-            Booking.bookings_id != bookings_id, # Don't conflict with yourself
-            Booking.start_time < new_end_time + buffer,
-            Booking.start_time >= booking.end_time # Starts after our current slot
+        select(other.bookings_id)
+        .where(
+            other.car_id == Booking.car_id,
+            other.status == "confirmed",
+            other.bookings_id != Booking.bookings_id, # Don't conflict with yourself
+            other.start_time < new_end_time + buffer,
+            other.start_time >= current_end # Starts after our current slot
         )
-        .first()
+        .exists()
     )
 
-    if conflict:
-        raise HTTPException(
-            status_code=409,
-            detail="Cannot extend: Another booking is scheduled shortly after."
-        )
-
     # 4. Apply the extension
-    booking.end_time = new_end_time
-    
-    db.commit()
-    db.refresh(booking)
-    return booking
+    booking = apply_transition(
+        db,
+        bookings_id,
+        current_user.members_id,
+        "extend",
+        conditions=(Booking.end_time == current_end, ~conflict),
+        values={"end_time": new_end_time},
+        conflict_detail="Cannot extend: Another booking is scheduled shortly after.",
+    )
+    return transitioned(db, booking)
 
 # ===================================================================
 # 10. COMPLETE KEY RETURN (Physical Confirmation) - End of Hire
@@ -425,21 +615,11 @@ def extend_booking(
 def complete_keys_return(
     bookings_id: int,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
-    booking = db.query(Booking).get(bookings_id)
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    if booking.member_id != current_user.members_id:
-        raise HTTPException(status_code=403, detail="Not your booking")
-
-    # The "Physical Truth" milestone for the return
-    booking.keys_returned_at = datetime.now(timezone.utc)
-    
-    db.commit()
-    db.refresh(booking)
-    return booking
+    # The "Physical Truth" milestone for the return (sets keys_returned_at)
+    booking = apply_transition(db, bookings_id, current_user.members_id, "complete_keys_return")
+    return transitioned(db, booking, invalidate=False)
 
 # ===================================================================
 # 11. END HIRE (Final Process Completion)
@@ -448,23 +628,9 @@ def complete_keys_return(
 def end_hire(
     bookings_id: int,
     db: Session = Depends(get_db),
-    current_user: Member = Depends(get_current_member),
+    current_user: TokenClaims = Depends(get_current_claims),
 ):
-    booking = db.query(Booking).get(bookings_id)
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    if booking.member_id != current_user.members_id:
-        raise HTTPException(status_code=403, detail="Not your booking")
-
-    # Validation: Ensure they haven't already ended it
-    if booking.status == "completed":
-        return booking
-
-    # The "Logical Truth" - User has finished all photos and process
-    booking.status = "completed"
-    booking.hire_ended_at = datetime.now(timezone.utc)
-
-    db.commit()
-    db.refresh(booking)
-    return booking
+    # The "Logical Truth" - User has finished all photos and process.
+    # Ending an already completed hire returns it unchanged.
+    booking = apply_transition(db, bookings_id, current_user.members_id, "end")
+    return transitioned(db, booking)
@@ -0,0 +1,222 @@
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from crud import update_record
+from database import get_db
+from models import Airport, Booking, Car, Member, SyncTombstone
+from schemas import CalendarFeedOut
+from security import get_current_member
+from utils import metrics
+from utils.cache import calendar_cache, calendar_scope, invalidate_member_calendar
+from utils.email_utils import booking_event
+from utils.ics import vcalendar
+from utils.time_utils import as_utc
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+# Bookings that appear in the feed, and their iCalendar STATUS
+FEED_STATUSES = {
+    "pending": "TENTATIVE",
+    "active": "CONFIRMED",
+    "confirmed": "CONFIRMED",
+    "in_progress": "CONFIRMED",
+}
+
+
+# ======================================================
+# Helpers
+# ======================================================
+def new_calendar_token(members_id: int) -> str:
+    # The id prefix lets a poll find its cache scope without a DB lookup
+    return f"{members_id}.{secrets.token_urlsafe(24)}"
+
+
+def token_member_id(token: str) -> int | None:
+    prefix, _, secret = token.partition(".")
+    return int(prefix) if prefix.isdigit() and secret else None
+
+
+def feed_url(request: Request, token: str) -> str:
+    return str(request.url_for("member_calendar_feed", token=token))
+
+
+def last_changed(db: Session, members_id: int, now: datetime, rows) -> datetime | None:
+    """
+    When the feed's content last changed: a member's booking updated,
+    deleted or past its end (so gone from the feed), or a car in the feed
+    updated. None if nothing is known.
+    """
+    updated, ended = (
+        db.query(
+            func.max(Booking.updated_at),
+            func.max(Booking.end_time).filter(Booking.end_time < now),
+        )
+        .filter(Booking.member_id == members_id)
+        .one()
+    )
+    deleted = (
+        db.query(func.max(SyncTombstone.deleted_at))
+        .filter(SyncTombstone.entity == "bookings", SyncTombstone.member_id == members_id)
+        .scalar()
+    )
+    stamps = [as_utc(t) for t in (updated, ended, deleted, *(r.car_updated_at for r in rows)) if t is not None]
+    return min(max(stamps), now) if stamps else None
+
+
+def build_feed(db: Session, members_id: int) -> dict:
+    """The member's upcoming bookings as an .ics body, with its validators."""
+    now = datetime.now(timezone.utc)
+    rows = (
+        db.query(
+            Booking.bookings_id,
+            Booking.start_time,
+            Booking.end_time,
+            Booking.status,
+            Booking.created_at,
+            Car.updated_at.label("car_updated_at"),
+            Car.make_model,
+            Car.registration,
+            Airport.name,
+            Airport.parking_description,
+        )
+        .join(Car, Car.cars_id == Booking.car_id)
+        .join(Airport, Airport.airports_id == Car.airport_id)
+        .filter(
+            Booking.member_id == members_id,
+            Booking.status.in_(list(FEED_STATUSES)),
+            Booking.end_time >= now,
+        )
+        .order_by(Booking.start_time)
+        .all()
+    )
+    events = [
+        booking_event(
+            r.bookings_id,
+            r.start_time,
+            r.end_time,
+            r.make_model or r.registration,
+            r.name,
+            r.parking_description,
+            # Stable, so every rebuild (on any worker) has the same ETag
+            stamp=r.created_at or r.start_time,
+            status=FEED_STATUSES[r.status],
+        )
+        for r in rows
+    ]
+    body = vcalendar(events, name="FlyDrive bookings").encode()
+    changed = last_changed(db, members_id, now, rows)
+    return {
+        "body": body,
+        "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+        # Second precision, as HTTP dates carry
+        "last_modified": changed.replace(microsecond=0) if changed else None,
+    }
+
+
+def not_modified(request: Request, feed: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or feed["etag"] in tags or f"W/{feed['etag']}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and feed["last_modified"] is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return feed["last_modified"] <= since
+    return False
+
+
+# ======================================================
+# MEMBER — GET (OR CREATE) MY FEED URL
+# ======================================================
+@router.get("/feed", response_model=CalendarFeedOut)
+def get_feed_url(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Member = Depends(get_current_member),
+):
+    if not current_user.calendar_token:
+        update_record(db, current_user, {"calendar_token": new_calendar_token(current_user.members_id)})
+    return {"url": feed_url(request, current_user.calendar_token)}
+
+
+# ======================================================
+# MEMBER — ROTATE MY FEED URL (the old one stops working)
+# ======================================================
+@router.post("/feed/rotate", response_model=CalendarFeedOut)
+def rotate_feed_url(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Member = Depends(get_current_member),
+):
+    update_record(db, current_user, {"calendar_token": new_calendar_token(current_user.members_id)})
+    invalidate_member_calendar(current_user.members_id)
+    return {"url": feed_url(request, current_user.calendar_token)}
+
+
+# ======================================================
+# PUBLIC (token in the URL) — THE .ics FEED
+# Calendar apps can't send a bearer token; the URL is the secret.
+# ======================================================
+@router.get("/{token}.ics", name="member_calendar_feed")
+def member_calendar_feed(
+    token: str,
+    request: Request,
+    # Primary: must see a just-rotated token
+    db: Session = Depends(get_db),
+):
+    members_id = token_member_id(token)
+    if members_id is None:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+    # The token is checked on every poll, cached or not: a rotation on
+    # another worker may not have reached this worker's cache yet.
+    # Compared in constant time, not in the WHERE clause.
+    current = (
+        db.query(Member.calendar_token)
+        .filter(Member.members_id == members_id)
+        .scalar()
+    )
+    if current is None or not hmac.compare_digest(current.encode(), token.encode()):
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+    scope = calendar_scope(members_id)
+    cached = calendar_cache.get(scope, token)
+    if cached is not None:
+        feed = cached[0]
+        metrics.incr("calendar.cache.hits")
+    else:
+        metrics.incr("calendar.cache.misses")
+        try:
+            generation = calendar_cache.generation(scope)
+        except Exception:
+            generation = None
+
+        feed = build_feed(db, members_id)
+        if generation is not None:
+            calendar_cache.put(scope, token, feed, generation)
+
+    headers = {
+        "ETag": feed["etag"],
+        # Revalidate every poll; a 304 costs one token lookup while cached
+        "Cache-Control": "private, no-cache",
+    }
+    if feed["last_modified"] is not None:
+        headers["Last-Modified"] = format_datetime(feed["last_modified"], usegmt=True)
+    if not_modified(request, feed):
+        metrics.incr("calendar.not_modified")
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed["body"], media_type="text/calendar; charset=utf-8", headers=headers)
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
 
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, load_only, undefer_group
+
+from bulk_import import ImportSpec, run_import
+from crud import create_record, update_by_id
+from delta_sync import record_deletion
+from database import get_db, get_read_db
 from security import get_current_member
-from models import Car, Airport
-from schemas import CarCreate, CarUpdate, CarOut
+from models import Car, Airport, Booking
+from schemas import CarCreate, CarUpdate, CarOut, UtilizationResponse, ImportFormat, ImportMode, ImportResult
+from utils.cache import invalidate_airport_availability
+from utils.fieldsets import FIELDS_QUERY, model_columns, parse_fields, render
 
 router = APIRouter(prefix="/cars", tags=["cars"])
 
+# airport_id is tracked so both old and new airports get invalidated
+CAR_IMPORT = ImportSpec(Car, CarCreate, key=("registration",), track="airport_id")
+
 # ===========================================================
 # Helper: require admin
 # ===========================================================
@@ -22,17 +33,125 @@ def require_admin(current_user = Depends(get_current_member)):
 # ===========================================================
 @router.get("/", response_model=list[CarOut])
 def list_cars(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     airport_id: int | None = None,
     status: str | None = None,
+    fields: str | None = FIELDS_QUERY,
 ):
-    q = db.query(Car)
+    selected = parse_fields(fields, CarOut, always=("cars_id",))
+
+    if selected is None:
+        # CarOut returns every image column
+        q = db.query(Car).options(undefer_group("images"))
+    else:
+        q = db.query(Car).options(load_only(*model_columns(Car, selected)))
     if airport_id is not None:
         q = q.filter(Car.airport_id == airport_id)
     if status is not None:
         q = q.filter(Car.status == status)
 
-    return q.order_by(Car.registration).all()
+    cars = q.order_by(Car.registration).all()
+    return cars if selected is None else render(CarOut, selected, cars)
+
+# ===========================================================
+# ADMIN: Fleet utilization timeline
+# ===========================================================
+OCCUPYING_STATUSES = ["active", "confirmed", "in_progress", "completed", "expired"]
+
+
+@router.get("/utilization", response_model=UtilizationResponse, dependencies=[Depends(require_admin)])
+def fleet_utilization(
+    start: datetime = Query(..., description="Range start (UTC)"),
+    end: datetime = Query(..., description="Range end (UTC)"),
+    slot_minutes: int = Query(15, ge=5, le=24 * 60),
+    airport_id: int | None = None,
+    db: Session = Depends(get_read_db),
+):
+    if start.tzinfo is None or end.tzinfo is None:
+        raise HTTPException(400, "start and end must include timezone information (UTC)")
+
+    start = start.astimezone(timezone.utc)
+    end = end.astimezone(timezone.utc)
+    if end <= start:
+        raise HTTPException(400, "end must be after start")
+    if end - start > timedelta(days=93):
+        raise HTTPException(400, "Range is limited to 93 days")
+
+    # Deferred: numpy is only needed by this report
+    from utils.occupancy import fleet_occupancy, slot_count
+
+    slot = timedelta(minutes=slot_minutes)
+    n_slots = slot_count(start, end, slot)
+
+    # -------------------------------------
+    # 1. Cars (rows) grouped by airport
+    # -------------------------------------
+    q = (
+        db.query(Car.cars_id, Car.registration, Car.airport_id, Airport.name)
+        .outerjoin(Car.airport)
+    )
+    if airport_id is not None:
+        q = q.filter(Car.airport_id == airport_id)
+    cars = q.order_by(Car.airport_id, Car.cars_id).all()
+
+    row_of = {c.cars_id: i for i, c in enumerate(cars)}
+    airport_ids = sorted({c.airport_id for c in cars}, key=lambda a: (a is None, a))
+    group_of = {a: i for i, a in enumerate(airport_ids)}
+    airport_names = {c.airport_id: c.name for c in cars}
+
+    # -------------------------------------
+    # 2. Bookings overlapping the range
+    # -------------------------------------
+    bookings = (
+        db.query(Booking.car_id, Booking.start_time, Booking.end_time)
+        .filter(
+            Booking.car_id.in_(list(row_of)),
+            Booking.status.in_(OCCUPYING_STATUSES),
+            Booking.start_time < end,
+            Booking.end_time > start,
+        )
+        .all()
+    )
+
+    # -------------------------------------
+    # 3. Bitmaps + vectorised reductions
+    # -------------------------------------
+    occ = fleet_occupancy(
+        [(row_of[b.car_id], b.start_time, b.end_time) for b in bookings],
+        len(cars),
+        [group_of[c.airport_id] for c in cars],
+        start,
+        slot,
+        n_slots,
+    )
+
+    return {
+        "start": start,
+        "end": end,
+        "slot_minutes": slot_minutes,
+        "slots": n_slots,
+        "cars": [
+            {
+                "cars_id": c.cars_id,
+                "registration": c.registration,
+                "airport_id": c.airport_id,
+                "busy_slots": occ["busy_slots"][i],
+                "utilization_pct": round(occ["busy_slots"][i] / n_slots * 100, 2),
+                "bitmap": occ["bitmaps"][i],
+            }
+            for i, c in enumerate(cars)
+        ],
+        "airports": [
+            {
+                "airports_id": a,
+                "name": airport_names.get(a),
+                "cars": occ["group_cars"][i],
+                "utilization_pct": round(occ["group_pct"][i], 2),
+            }
+            for i, a in enumerate(airport_ids)
+            if a is not None
+        ],
+    }
 
 # ===========================================================
 # ADMIN: Create car
@@ -42,12 +161,28 @@ def create_car(
     payload: CarCreate,
     db: Session = Depends(get_db),
 ):
-    obj = Car(**payload.model_dump(exclude_unset=True))
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    obj = create_record(db, Car, payload.model_dump(exclude_unset=True))
+    invalidate_airport_availability(obj.airport_id)
     return obj
 
+# ===========================================================
+# ADMIN: Bulk import cars
+# ===========================================================
+@router.post("/import", response_model=ImportResult, dependencies=[Depends(require_admin)])
+async def import_cars(
+    request: Request,
+    format: ImportFormat | None = None,
+    mode: ImportMode = "insert",
+    partial: bool = False,
+):
+    """
+    Bulk create (or with mode=upsert, update) cars from a CSV body with a
+    header row, or NDJSON. Rows are matched on registration.
+    """
+    report = await run_import(request, CAR_IMPORT, format, mode, partial)
+    await run_in_threadpool(invalidate_airport_availability, *report["touched"])
+    return report
+
 # ===========================================================
 # ADMIN: Update car
 # ===========================================================
@@ -57,15 +192,18 @@ def update_car(
     payload: CarUpdate,
     db: Session = Depends(get_db),
 ):
-    obj = db.query(Car).get(cars_id)
+    data = payload.model_dump(exclude_unset=True)
+
+    old_airport_id = None
+    if "airport_id" in data:
+        # Moving airports: the old airport's results are suspect too
+        old_airport_id = db.query(Car.airport_id).filter(Car.cars_id == cars_id).scalar()
+
+    obj = update_by_id(db, Car, cars_id, data)
     if not obj:
         raise HTTPException(404, "Car not found")
 
-    for k, v in payload.model_dump(exclude_unset=True).items():
-        setattr(obj, k, v)
-
-    db.commit()
-    db.refresh(obj)
+    invalidate_airport_availability(old_airport_id, obj.airport_id)
     return obj
 
 # ===========================================================
@@ -80,7 +218,10 @@ def delete_car(
     if not obj:
         raise HTTPException(404, "Car not found")
 
+    airport_id = obj.airport_id
     db.delete(obj)
+    record_deletion(db, "cars", cars_id)
     db.commit()
+    invalidate_airport_availability(airport_id)
 
     return {"ok": True}
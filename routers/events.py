@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from database import get_db
+from security import TokenClaims, get_current_claims
+from utils import metrics
+from utils.events import airport_channel, get_bus, member_channel
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+# Comment line sent when idle, so proxies don't time the stream out
+HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Streams end after this (the client reconnects), so deploys can drain
+MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "900"))
+
+RECONNECT_MS = 3000
+MAX_AIRPORTS = 20
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream(request: Request, channels: set):
+    # Subscribed here, not in the route, so the finally below always runs
+    sub = get_bus().subscribe(channels)
+    metrics.incr("events.streams")
+    deadline = time.monotonic() + MAX_STREAM_SECONDS
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        # Anything before this was missed: refetch once, then rely on events
+        yield sse("ready", {"channels": sorted(channels)})
+
+        while time.monotonic() < deadline:
+            item = await sub.get(min(HEARTBEAT_SECONDS, max(0.0, deadline - time.monotonic())))
+            if await request.is_disconnected():
+                return
+            if sub.overflowed:
+                # Too slow to keep up; events were dropped
+                yield sse("resync", {})
+                return
+            if item is None:
+                yield ": ping\n\n"
+                continue
+            _, event = item
+            yield sse(event.get("type", "message"), event)
+    finally:
+        sub.close()
+
+
+# ======================================================
+# MEMBER — SERVER-SENT EVENTS
+# Replaces polling /bookings/active and /availability:
+#   event: booking       one of the caller's bookings changed
+#                        (change = created | updated | deleted | expired)
+#   event: availability  refetch /availability for that airport_id
+#   event: resync        events were dropped; refetch, then reconnect
+# ======================================================
+@router.get("/stream")
+async def event_stream(
+    request: Request,
+    airport_id: list[int] = Query([], description="Also follow availability at these airports"),
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(get_current_claims),
+):
+    if len(airport_id) > MAX_AIRPORTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_AIRPORTS} airports per stream")
+
+    # The session is only used to authenticate (legacy tokens); don't keep
+    # a pooled connection for the life of the stream
+    await run_in_threadpool(db.close)
+
+    channels = {member_channel(current_user.members_id), *(airport_channel(a) for a in airport_id)}
+    return StreamingResponse(
+        stream(request, channels),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-import boto3
-import os
+from sqlalchemy.orm import Session, load_only
 
-from database import get_db
-from security import get_current_member
+from crud import update_record
+from database import get_db, get_read_db
+from security import TokenClaims, forget_member_status, get_current_claims, get_current_member
 from models import Member
 from schemas import MemberUpdate, MemberOut
+from utils.aws import get_s3_client
+from utils.fieldsets import FIELDS_QUERY, model_columns, parse_fields, render
 
 router = APIRouter(
     prefix="/members",
@@ -20,17 +21,19 @@ router = APIRouter(
 S3_BUCKET = "flydrive_userfiles"
 REGION = "ap-southeast-2"
 
-s3 = boto3.client("s3", region_name=REGION)
-
 
 # =====================================================
 # 1) GET /members/me  → authenticated member profile
 # =====================================================
 @router.get("/me", response_model=MemberOut)
 def get_my_profile(
+    fields: str | None = FIELDS_QUERY,
     current_user: Member = Depends(get_current_member),
 ):
-    return current_user
+    selected = parse_fields(fields, MemberOut, always=("members_id",))
+    if selected is None:
+        return current_user
+    return render(MemberOut, selected, current_user, many=False)
 
 
 # =====================================================
@@ -42,12 +45,7 @@ def update_my_profile(
     db: Session = Depends(get_db),
     current_user: Member = Depends(get_current_member),
 ):
-    for key, value in payload.model_dump(exclude_unset=True).items():
-        setattr(current_user, key, value)
-
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    return update_record(db, current_user, payload.model_dump(exclude_unset=True))
 
 
 # =====================================================
@@ -56,7 +54,7 @@ def update_my_profile(
 @router.get("/{members_id}/upload-presign")
 def get_upload_presigned_urls(
     members_id: int,
-    current_user: Member = Depends(get_current_member)
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
 
     if members_id != current_user.members_id:
@@ -65,7 +63,7 @@ def get_upload_presigned_urls(
     base = f"members/{members_id}"
 
     def presign(key_name: str):
-        return s3.generate_presigned_url(
+        return get_s3_client(REGION).generate_presigned_url(
             ClientMethod="put_object",
             Params={
                 "Bucket": S3_BUCKET,
@@ -98,15 +96,12 @@ def complete_profile(
     if members_id != current_user.members_id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    # Update member with provided profile info
-    for key, value in payload.model_dump(exclude_unset=True).items():
-        setattr(current_user, key, value)
-
-    # Move status to pending verification
-    current_user.status = "pending_verification"
-
-    db.commit()
-    db.refresh(current_user)
+    # Update member with provided profile info,
+    # and move status to pending verification
+    data = payload.model_dump(exclude_unset=True)
+    data["status"] = "pending_verification"
+    update_record(db, current_user, data)
+    forget_member_status(members_id)
 
     return {"status": "pending_verification"}
 
@@ -125,26 +120,35 @@ def require_admin(current_user: Member = Depends(get_current_member)):
 # ADMIN: list all members
 # -----------------------------------------------------
 @router.get("/", response_model=list[MemberOut], dependencies=[Depends(require_admin)])
-def admin_list_members(db: Session = Depends(get_db)):
-    return db.query(Member).order_by(Member.members_id).all()
+def admin_list_members(db: Session = Depends(get_read_db), fields: str | None = FIELDS_QUERY):
+    selected = parse_fields(fields, MemberOut, always=("members_id",))
+    q = db.query(Member)
+    if selected is not None:
+        q = q.options(load_only(*model_columns(Member, selected)))
+    members = q.order_by(Member.members_id).all()
+    return members if selected is None else render(MemberOut, selected, members)
 
 
 # -----------------------------------------------------
 # ADMIN: get a specific member
 # -----------------------------------------------------
 @router.get("/{members_id}", response_model=MemberOut, dependencies=[Depends(require_admin)])
-def admin_get_member(members_id: int, db: Session = Depends(get_db)):
-    member = db.query(Member).get(members_id)
+def admin_get_member(members_id: int, db: Session = Depends(get_read_db), fields: str | None = FIELDS_QUERY):
+    selected = parse_fields(fields, MemberOut, always=("members_id",))
+    q = db.query(Member)
+    if selected is not None:
+        q = q.options(load_only(*model_columns(Member, selected)))
+    member = q.filter(Member.members_id == members_id).first()
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
-    return member
+    return member if selected is None else render(MemberOut, selected, member, many=False)
 
 
 # -----------------------------------------------------
 # ADMIN: list pending verification
 # -----------------------------------------------------
 @router.get("/pending", response_model=list[MemberOut], dependencies=[Depends(require_admin)])
-def admin_pending_members(db: Session = Depends(get_db)):
+def admin_pending_members(db: Session = Depends(get_read_db)):
     return db.query(Member).filter(Member.status == "pending_verification").all()
 
 
@@ -159,6 +163,7 @@ def admin_approve_member(members_id: int, db: Session = Depends(get_db)):
 
     member.status = "verified"
     db.commit()
+    forget_member_status(members_id)
     return {"message": "Member approved"}
 
 
@@ -173,4 +178,5 @@ def admin_reject_member(members_id: int, db: Session = Depends(get_db)):
 
     member.status = "rejected"
     db.commit()
+    forget_member_status(members_id)
     return {"message": "Member rejected"}
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from database import get_db
+from bulk_import import ImportSpec, run_import
+from crud import create_record, update_by_id
+from database import get_db, get_read_db
+from security import get_current_member
 from models import Rate
-from schemas import RateCreate, RateUpdate, RateOut
+from schemas import RateCreate, RateUpdate, RateOut, ImportFormat, ImportMode, ImportResult
 
 router = APIRouter(prefix="/rates", tags=["rates"])
 
+RATE_IMPORT = ImportSpec(Rate, RateCreate, key=("airports_id", "rate_name"))
+
+def require_admin(current_user = Depends(get_current_member)):
+    # Later replace with user.is_admin Boolean
+    if getattr(current_user, "platform", "") != "admin":
+        raise HTTPException(403, "Admin access required.")
+    return current_user
+
 @router.get("/", response_model=list[RateOut])
-def list_rates(db: Session = Depends(get_db), active_only: bool = True, airports_id: int | None = None):
+def list_rates(db: Session = Depends(get_read_db), active_only: bool = True, airports_id: int | None = None):
     q = db.query(Rate)
     if active_only:
         q = q.filter(Rate.is_active == True)
@@ -17,19 +28,24 @@ def list_rates(db: Session = Depends(get_db), active_only: bool = True, airports
 
 @router.post("/", response_model=RateOut)
 def create_rate(payload: RateCreate, db: Session = Depends(get_db)):
-    obj = Rate(**payload.model_dump(exclude_unset=True))
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
-    return obj
+    return create_record(db, Rate, payload.model_dump(exclude_unset=True))
 
 @router.put("/{rates_id}", response_model=RateOut)
 def update_rate(rates_id: int, payload: RateUpdate, db: Session = Depends(get_db)):
-    obj = db.query(Rate).get(rates_id)
+    obj = update_by_id(db, Rate, rates_id, payload.model_dump(exclude_unset=True))
     if not obj:
         raise HTTPException(404, "Rate not found")
-    for k, v in payload.model_dump(exclude_unset=True).items():
-        setattr(obj, k, v)
-    db.commit()
-    db.refresh(obj)
     return obj
+
+@router.post("/import", response_model=ImportResult, dependencies=[Depends(require_admin)])
+async def import_rates(
+    request: Request,
+    format: ImportFormat | None = None,
+    mode: ImportMode = "insert",
+    partial: bool = False,
+):
+    """
+    Bulk create (or with mode=upsert, update) rates from a CSV body with a
+    header row, or NDJSON. Rows are matched on (airports_id, rate_name).
+    """
+    return await run_import(request, RATE_IMPORT, format, mode, partial)
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, get_read_db
+from search_log_partitions import log_search, maintain, query_logs
 from security import get_current_member
-from models import SearchLog
-from schemas import SearchLogCreate, SearchLogOut
-from datetime import timezone
+from schemas import SearchLogCreate, SearchLogOut, SearchLogMaintenanceOut
+from datetime import datetime, timezone
+from utils.time_utils import as_utc
 
 router = APIRouter(prefix="/search_logs", tags=["search_logs"])
 
@@ -24,18 +25,30 @@ def require_admin(current_user = Depends(get_current_member)):
 # ======================================================
 @router.get("/", response_model=list[SearchLogOut], dependencies=[Depends(require_admin)])
 def list_logs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     member_id: int | None = None,
     airport_id: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
 ):
-    q = db.query(SearchLog)
+    # start / end bound search_time ([start, end)); only the partitions
+    # overlapping that range are read
+    return query_logs(
+        db,
+        start=as_utc(start) if start else None,
+        end=as_utc(end) if end else None,
+        member_id=member_id,
+        airport_id=airport_id,
+    )
 
-    if member_id is not None:
-        q = q.filter(SearchLog.member_id == member_id)
-    if airport_id is not None:
-        q = q.filter(SearchLog.airport_id == airport_id)
 
-    return q.order_by(SearchLog.search_time.desc()).all()
+# ======================================================
+# ADMIN — RUN PARTITION MAINTENANCE NOW
+# (also runs hourly in the background, see search_log_partitions.py)
+# ======================================================
+@router.post("/maintenance", response_model=SearchLogMaintenanceOut, dependencies=[Depends(require_admin)])
+def run_maintenance():
+    return maintain()
 
 
 # ======================================================
@@ -59,10 +72,6 @@ def create_log(
                 )
             data[field] = dt.astimezone(timezone.utc)
 
-    obj = SearchLog(**data)
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
-    return obj
+    return log_search(db, data)
 
 
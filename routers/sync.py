@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session, undefer_group
+
+from database import get_db
+from delta_sync import decode_cursor, deletions_since, needs_full_sync, next_cursor, sweep_tombstones
+from models import Booking, Car, Member, Rate
+from routers.bookings import booking_out_options
+from schemas import SyncOut
+from security import TokenClaims, get_current_claims
+from utils.time_utils import utcnow
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+# ======================================================
+# MEMBER — DELTA SYNC
+# Everything the app keeps locally (own profile and bookings, cars,
+# rates) that changed since the cursor, plus what was deleted.
+# ======================================================
+@router.get("", response_model=SyncOut)
+def sync(
+    since: str | None = Query(None, description="cursor from the previous sync"),
+    # Primary: a replica running behind could skip rows for good once the
+    # cursor has moved past them
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(get_current_claims),
+):
+    now = utcnow()
+    since_at = decode_cursor(since) if since else None
+    full = needs_full_sync(since_at, now)
+
+    def changed(model, query):
+        return query if full else query.filter(model.updated_at > since_at)
+
+    member = changed(Member, db.query(Member).filter(Member.members_id == current_user.members_id)).first()
+    bookings = (
+        changed(Booking, db.query(Booking))
+        .join(Booking.car)
+        .join(Car.airport)
+        .options(*booking_out_options())
+        .filter(Booking.member_id == current_user.members_id)
+        .order_by(Booking.start_time.desc())
+        .all()
+    )
+    cars = changed(Car, db.query(Car).options(undefer_group("images"))).order_by(Car.cars_id).all()
+    rates = changed(Rate, db.query(Rate)).order_by(Rate.rates_id).all()
+
+    deleted = {} if full else deletions_since(db, since_at, current_user.members_id)
+    sweep_tombstones()
+    return {
+        "cursor": next_cursor(now),
+        "full": full,
+        "member": member,
+        "bookings": bookings,
+        "cars": cars,
+        "rates": rates,
+        "deleted": deleted,
+    }
@@ -1,17 +1,34 @@
 import os
-import boto3
+from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from security import get_current_member
+from sqlalchemy.orm import Session
+from database import get_db
+from models import Booking, Car
+from security import get_current_claims, get_current_member
+from utils.aws import get_s3_client
+from utils.images import CAR_IMAGE_COLUMNS, generate_variants, key_from_url
 from datetime import timedelta
 
 router = APIRouter(prefix="/upload", tags=["uploads"])
 
+
+def require_admin(current_user = Depends(get_current_member)):
+    if getattr(current_user, "platform", "") != "admin":
+        raise HTTPException(403, "Admin access required.")
+    return current_user
+
 S3_BUCKET = os.getenv("S3_BUCKET")
 if not S3_BUCKET:
     raise RuntimeError("S3_BUCKET not set in environment")
 
-s3_client = boto3.client("s3")
+PRESIGN_EXPIRES_IN = 60 * 10  # 10 minutes
+
+# Inspection photo slots per phase (matches Booking.photourl_{phase}_{angle})
+BOOKING_PHOTO_ANGLES = {
+    "before": ["front", "left", "right", "rear"],
+    "after": ["front", "left", "right", "rear", "dash"],
+}
 
 
 # -------------------------
@@ -51,7 +68,7 @@ def build_s3_key(req: PresignRequest) -> str:
 @router.post("/presign")
 def get_presigned_upload_url(
     req: PresignRequest,
-    user=Depends(get_current_member),  # authenticated caller
+    user=Depends(get_current_claims),  # authenticated caller
 ):
     try:
         key = build_s3_key(req)
@@ -59,7 +76,7 @@ def get_presigned_upload_url(
         raise HTTPException(status_code=400, detail=str(e))
 
     try:
-        upload_url = s3_client.generate_presigned_url(
+        upload_url = get_s3_client().generate_presigned_url(
             ClientMethod="put_object",
             Params={
                 "Bucket": S3_BUCKET,
@@ -86,12 +103,12 @@ class SimplePresignRequest(BaseModel):
 @router.post("/presign-user")
 def get_user_presigned_url(
     req: SimplePresignRequest,
-    user=Depends(get_current_member),
+    user=Depends(get_current_claims),
 ):
     key = f"members/{user.members_id}/{req.filename}"
 
     try:
-        upload_url = s3_client.generate_presigned_url(
+        upload_url = get_s3_client().generate_presigned_url(
             ClientMethod="put_object",
             Params={
                 "Bucket": S3_BUCKET,
@@ -110,3 +127,142 @@ def get_user_presigned_url(
         "public_url": public_url,   # <-- FIXED
         "key": key                  # <-- FIXED
     }
+
+
+# -------------------------
+# Batch manifest for all inspection photos of a booking phase
+# -------------------------
+class BookingPhotoManifestRequest(BaseModel):
+    booking_id: int
+    phase: Literal["before", "after"]
+
+
+@router.post("/presign-booking")
+def get_booking_photo_manifest(
+    req: BookingPhotoManifestRequest,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_claims),
+):
+    """
+    Returns presigned PUT URLs for every photo slot of a booking phase
+    in one call, instead of one /presign round trip per angle.
+    """
+    booking = db.query(Booking).get(req.booking_id)
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    if booking.member_id != user.members_id:
+        raise HTTPException(status_code=403, detail="Not your booking")
+
+    s3 = get_s3_client()
+    slots = []
+    try:
+        for angle in BOOKING_PHOTO_ANGLES[req.phase]:
+            key = build_s3_key(PresignRequest(
+                car_id=booking.car_id,
+                booking_id=booking.bookings_id,
+                phase=req.phase,
+                angle=angle,
+            ))
+            upload_url = s3.generate_presigned_url(
+                ClientMethod="put_object",
+                Params={
+                    "Bucket": S3_BUCKET,
+                    "Key": key,
+                    "ContentType": "image/jpeg",
+                },
+                ExpiresIn=PRESIGN_EXPIRES_IN,
+            )
+            slots.append({
+                "angle": angle,
+                "slot": f"photourl_{req.phase}_{angle}",
+                "upload_url": upload_url,
+                "public_url": f"https://{S3_BUCKET}.s3.ap-southeast-2.amazonaws.com/{key}",
+                "key": key,
+            })
+    except Exception as e:
+        raise HTTPException(500, f"Could not create presigned URL: {e}")
+
+    return {
+        "booking_id": booking.bookings_id,
+        "phase": req.phase,
+        "expires_in": PRESIGN_EXPIRES_IN,
+        "slots": slots,
+    }
+
+
+# -------------------------
+# Derivatives (thumbnail / medium) for uploaded photos
+# -------------------------
+def render_column_variants(obj, columns: list[str], existing: dict | None, prefix: str) -> dict:
+    # Only keys under `prefix` (the booking's or car's own folder) are read
+    # or written; anything else in a URL column is left without variants
+    keys = {}
+    for column in columns:
+        key = key_from_url(getattr(obj, column), prefix)
+        if key:
+            keys[column] = key
+
+    try:
+        rendered = generate_variants(list(keys.values()))
+    except Exception as e:
+        raise HTTPException(400, f"Could not process image: {e}")
+
+    variants = dict(existing or {})
+    for column, key in keys.items():
+        if key in rendered:
+            variants[column] = rendered[key]
+    return variants
+
+
+class BookingDerivativesRequest(BaseModel):
+    booking_id: int
+    phase: Literal["before", "after"]
+
+
+@router.post("/derivatives/booking")
+def create_booking_photo_derivatives(
+    req: BookingDerivativesRequest,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_claims),
+):
+    """
+    Call after the phase photos are uploaded and saved on the booking.
+    Renders thumbnail and medium variants and records their URLs.
+    """
+    booking = db.query(Booking).get(req.booking_id)
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    if booking.member_id != user.members_id:
+        raise HTTPException(status_code=403, detail="Not your booking")
+
+    columns = [f"photourl_{req.phase}_{angle}" for angle in BOOKING_PHOTO_ANGLES[req.phase]]
+    prefix = f"cars/{booking.car_id}/bookings/{booking.bookings_id}/{req.phase}/"
+    booking.photo_variants = render_column_variants(booking, columns, booking.photo_variants, prefix)
+    db.commit()
+
+    return {
+        "booking_id": booking.bookings_id,
+        "variants": booking.photo_variants,
+    }
+
+
+@router.post("/derivatives/car/{car_id}", dependencies=[Depends(require_admin)])
+def create_car_image_derivatives(
+    car_id: int,
+    db: Session = Depends(get_db),
+):
+    car = db.query(Car).get(car_id)
+    if not car:
+        raise HTTPException(404, "Car not found")
+
+    car.image_variants = render_column_variants(
+        car, CAR_IMAGE_COLUMNS, car.image_variants, f"cars/{car.cars_id}/"
+    )
+    db.commit()
+
+    return {
+        "car_id": car.cars_id,
+        "variants": car.image_variants,
+    }
@@ -23,6 +23,13 @@ class AirportOut(AirportBase):
     class Config:
         from_attributes = True
 
+class AirportNearbyOut(AirportOut):
+    distance_km: float
+
+class AirportSearchOut(AirportOut):
+    match: Literal["icao", "icao_prefix", "name_prefix", "word_prefix", "fuzzy"]
+    score: float    # 1.0 for prefix matches, trigram similarity for fuzzy ones
+
 # Cars
 class CarBase(BaseModel):
     registration: Optional[str] = None
@@ -82,6 +89,9 @@ class MemberOut(MemberBase):
     class Config:
         from_attributes = True
 
+class CalendarFeedOut(BaseModel):
+    url: str    # secret .ics subscription URL; anyone with it can read the feed
+
 # ----------------------------
 # Bookings
 # ----------------------------
@@ -170,6 +180,30 @@ class BookingOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+# Offline key pickup (see access_bundles.py)
+class AccessBundleOut(BaseModel):
+    bundle: str                 # ES256 JWS; verify with /bookings/access-bundle/keys
+    kid: str
+    not_before: datetime
+    expires_at: datetime
+
+class KeyEventIn(BaseModel):
+    bookings_id: int
+    event: Literal["keys_retrieved", "keys_returned"]
+    occurred_at: datetime       # device time, with timezone
+
+class KeyEventBatch(BaseModel):
+    events: List[KeyEventIn]
+
+class KeyEventResult(BaseModel):
+    bookings_id: int
+    event: str
+    result: Literal["applied", "duplicate", "rejected"]
+    detail: Optional[str] = None
+
+class KeyEventBatchOut(BaseModel):
+    results: List[KeyEventResult]   # same order as the upload
         
 # Rates
 class RateBase(BaseModel):
@@ -240,6 +274,13 @@ class SearchLogOut(SearchLogBase):
     class Config:
         from_attributes = True
 
+class SearchLogMaintenanceOut(BaseModel):
+    layout: Literal["native", "rotating", "single"]
+    created: List[str]          # partitions created ahead
+    dropped: List[str]          # partitions compacted into search_log_daily, then dropped
+    deleted_rows: int           # rows past retention outside partitions
+    skipped: Optional[str] = None
+
 # ----------------------------
 # Availability Schemas
 # ----------------------------
@@ -264,6 +305,59 @@ class AvailabilityCarOut(BaseModel):
         from_attributes = True
 
 
+class FreeSlotOut(BaseModel):
+    cars_id: int
+    registration: Optional[str] = None
+    make_model: Optional[str] = None
+    slot_start: datetime   # earliest start
+    # Latest end (handover buffer already taken off); None = open ended,
+    # nothing is booked after it within the horizon
+    slot_end: Optional[datetime] = None
+
+
+class FreeSlotsResponse(BaseModel):
+    duration_minutes: int
+    search_start: datetime
+    search_end: datetime
+    slots: List[FreeSlotOut]
+    # Only when booking_id is given
+    booking_id: Optional[int] = None
+    max_extension_minutes: Optional[int] = None   # None = nothing booked within the horizon
+    next_booking_start: Optional[datetime] = None
+
+# ----------------------------
+# Fleet utilization (admin)
+# ----------------------------
+
+class CarUtilizationOut(BaseModel):
+    cars_id: int
+    registration: Optional[str] = None
+    airport_id: Optional[int] = None
+    busy_slots: int
+    utilization_pct: float
+    bitmap: str   # base64, one bit per slot, MSB first
+
+
+class AirportUtilizationOut(BaseModel):
+    airports_id: int
+    name: Optional[str] = None
+    cars: int
+    utilization_pct: float
+
+
+class UtilizationResponse(BaseModel):
+    start: datetime
+    end: datetime
+    slot_minutes: int
+    slots: int
+    cars: List[CarUtilizationOut]
+    airports: List[AirportUtilizationOut]
+
+# Image variant selection (see utils/images.py)
+ImageSize = Literal["original", "thumb", "medium"]
+ImageFormat = Literal["webp", "jpeg"]
+
+
 class AvailabilityResponse(BaseModel):
     airport: str
     total_available: int
@@ -298,14 +392,38 @@ class AuthResponse(BaseModel):
         from_attributes = True
 
 
-
-
-
-
-
-
-
-
-
-
-
+# Bulk import
+ImportFormat = Literal["csv", "ndjson"]
+ImportMode = Literal["insert", "upsert"]
+
+class ImportFieldError(BaseModel):
+    field: Optional[str] = None
+    message: str
+
+class ImportRowError(BaseModel):
+    line: int
+    errors: list[ImportFieldError]
+
+class ImportResult(BaseModel):
+    mode: ImportMode
+    rows: int
+    inserted: int
+    updated: int
+    failed: int
+    committed: bool
+    errors: list[ImportRowError] = []
+
+# Delta sync (see delta_sync.py)
+class SyncDeleted(BaseModel):
+    bookings: List[int] = []
+    cars: List[int] = []
+    rates: List[int] = []
+
+class SyncOut(BaseModel):
+    cursor: str                 # pass back as ?since= next time
+    full: bool                  # True: a full snapshot, replace local data
+    member: Optional[MemberOut] = None      # None = unchanged
+    bookings: List[BookingOut]
+    cars: List[CarOut]
+    rates: List[RateOut]
+    deleted: SyncDeleted
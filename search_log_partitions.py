@@ -0,0 +1,413 @@
+import os
+import random
+import re
+import threading
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+
+from sqlalchemy import (
+    Column, Index, MetaData, Table, distinct, func, insert, inspect, select, text, union_all,
+)
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from crud import create_record
+from database import engine
+from models import SearchLog, SearchLogDaily
+
+# =====================================================
+# Monthly partitions for search_logs, with retention.
+#
+# Every availability call logs a row, so the table is split by month of
+# search_time. Months older than SEARCH_LOG_RETENTION_DAYS are compacted
+# into search_log_daily (searches and distinct members per day and
+# airport) and then dropped whole: no row-by-row DELETE, no index bloat.
+#
+# Maintenance runs in a background thread per worker (and on demand from
+# POST /search_logs/maintenance), never inside a search request. One run
+# at a time across workers: a Postgres session-level advisory lock held
+# for the whole run, so the rollup is never written twice.
+#
+# Layouts, picked per database:
+#   native    Postgres, search_logs is PARTITION BY RANGE (search_time).
+#             Partitions search_logs_pYYYY_MM are created ahead of time and
+#             the planner prunes by search_time on its own.
+#   rotating  SQLite: rows go to plain search_logs_pYYYY_MM tables and a
+#             time-range read selects only the overlapping months.
+#             search_logs itself is read (and aged out) as a legacy table.
+#   single    Postgres without partitioning: old rows are compacted and
+#             deleted in place. migrations/002_search_logs_native.sql
+#             converts the table to "native" on the next deploy, so this
+#             only lasts until migrate.py has run.
+# =====================================================
+
+RETENTION_DAYS = int(os.getenv("SEARCH_LOG_RETENTION_DAYS", "180"))
+PARTITIONS_AHEAD = 2            # future months kept created (native)
+# Background maintenance period per worker; 0 = only on demand
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("SEARCH_LOG_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+ROTATING_ID_BLOCK = 10 ** 9     # ids per rotating partition
+
+PARENT = SearchLog.__tablename__
+PARTITION_NAME = re.compile(rf"^{PARENT}_p(\d{{4}})_(\d{{2}})$")
+
+_layouts = {}                   # database url -> layout
+_ensured = set()                # rotating partitions created by this process
+_partitions = MetaData()        # rotating partition tables (not in Base.metadata)
+_lock = threading.Lock()
+_maintenance_lock = threading.Lock()    # SQLite: one run per process
+_stop = threading.Event()
+_thread = None
+
+
+# -------------------------
+# Months
+# -------------------------
+def month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> date | None:
+    m = PARTITION_NAME.fullmatch(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def month_bounds(month: date) -> tuple:
+    start = datetime.combine(month, dt_time(), tzinfo=timezone.utc)
+    return start, datetime.combine(add_months(month, 1), dt_time(), tzinfo=timezone.utc)
+
+
+def id_block(month: date) -> int:
+    """First search_logs_id of a rotating partition, e.g. 202610_000000000."""
+    return (month.year * 100 + month.month) * ROTATING_ID_BLOCK
+
+
+def retention_cutoff(now: datetime) -> date:
+    """Months that end on or before this are past retention."""
+    return (now - timedelta(days=RETENTION_DAYS)).date()
+
+
+# -------------------------
+# Layout
+# -------------------------
+def layout(db: Session) -> str:
+    bind = db.get_bind().engine
+    key = str(bind.url)
+    found = _layouts.get(key)
+    if found is None:
+        if bind.dialect.name == "sqlite":
+            found = "rotating"
+        else:
+            partitioned = db.execute(text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :name"
+            ), {"name": PARENT}).first()
+            found = "native" if partitioned else "single"
+        _layouts[key] = found
+    return found
+
+
+def list_partitions(db: Session) -> dict:
+    """Existing partitions: month -> table name."""
+    if layout(db) == "native":
+        rows = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :name"
+        ), {"name": PARENT}).scalars()
+    else:
+        rows = inspect(db.connection()).get_table_names()
+    return {partition_month(n): n for n in rows if partition_month(n)}
+
+
+def partition_table(name: str) -> Table:
+    """Rotating partition: search_logs' columns, no foreign keys."""
+    table = _partitions.tables.get(name)
+    if table is None:
+        table = Table(
+            name, _partitions,
+            *[
+                Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+                for c in SearchLog.__table__.columns
+            ],
+            sqlite_autoincrement=True,
+        )
+        Index(f"ix_{name}_search_time", table.c.search_time)
+    return table
+
+
+def ensure_rotating(db: Session, month: date) -> Table:
+    """Creates the month's table if missing (and commits). Call before other writes."""
+    name = partition_name(month)
+    table = partition_table(name)
+    if name in _ensured:
+        return table
+
+    with _lock:
+        conn = db.connection()
+        if not inspect(conn).has_table(name):
+            try:
+                table.create(conn)
+                # Each month numbers its rows from its own block, so
+                # search_logs_id stays unique across partitions
+                db.execute(
+                    text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                    {"name": name, "seq": id_block(month)},
+                )
+                db.commit()
+            except OperationalError:
+                # Another worker created it first
+                db.rollback()
+        _ensured.add(name)
+    return table
+
+
+def quoted(db: Session, name: str) -> str:
+    """A partition (or the parent) as a DDL identifier; DDL takes no bind parameters."""
+    if name != PARENT and partition_month(name) is None:
+        raise ValueError(f"Not a search_logs partition: {name!r}")
+    return db.get_bind().dialect.identifier_preparer.quote_identifier(name)
+
+
+def ensure_native(db: Session, month: date):
+    # Bounds are built from the date's fields, never from a string
+    start, end = (f"{b:%Y-%m-%d} 00:00:00+00" for b in month_bounds(date(month.year, month.month, 1)))
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {quoted(db, partition_name(month))} PARTITION OF {quoted(db, PARENT)} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+
+
+# -------------------------
+# Writes
+# -------------------------
+def log_search(db: Session, data: dict):
+    """Inserts and commits one search log row; returns it (ORM object or Row)."""
+    data = dict(data)
+    if data.get("search_time") is None:
+        # Partition key: a row without one would never age out
+        data["search_time"] = datetime.now(timezone.utc)
+
+    if layout(db) != "rotating":
+        return create_record(db, SearchLog, data)
+
+    table = ensure_rotating(db, month_start(data["search_time"].astimezone(timezone.utc)))
+    row = db.execute(insert(table).values(**data).returning(*table.c)).one()
+    db.commit()
+    return row
+
+
+# -------------------------
+# Reads
+# -------------------------
+def query_logs(
+    db: Session,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    member_id: int | None = None,
+    airport_id: int | None = None,
+) -> list:
+    """Newest first; search_time in [start, end). Reads only overlapping partitions."""
+    def filtered(table):
+        stmt = select(*[table.c[c.name] for c in SearchLog.__table__.columns])
+        if start is not None:
+            stmt = stmt.where(table.c.search_time >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.search_time < end)
+        if member_id is not None:
+            stmt = stmt.where(table.c.member_id == member_id)
+        if airport_id is not None:
+            stmt = stmt.where(table.c.airport_id == airport_id)
+        return stmt
+
+    if layout(db) != "rotating":
+        # Postgres prunes partitions from the search_time bounds itself
+        stmt = filtered(SearchLog.__table__)
+        return db.execute(stmt.order_by(SearchLog.search_time.desc())).all()
+
+    first = month_start(start) if start is not None else None
+    last = month_start(end - timedelta(microseconds=1)) if end is not None else None
+    tables = [SearchLog.__table__] + [
+        partition_table(name)
+        for month, name in sorted(list_partitions(db).items())
+        if (first is None or month >= first) and (last is None or month <= last)
+    ]
+    combined = union_all(*[filtered(t) for t in tables]).subquery()
+    return db.execute(select(combined).order_by(combined.c.search_time.desc())).all()
+
+
+# -------------------------
+# Retention
+# -------------------------
+def compact(db: Session, table: Table, before: datetime | None = None, since: datetime | None = None) -> int:
+    """Rolls table's rows (in [since, before)) into search_log_daily."""
+    day = func.date(table.c.search_time)
+    source = (
+        select(
+            day,
+            table.c.airport_id,
+            func.count(),
+            func.count(distinct(table.c.member_id)),
+        )
+        .where(table.c.search_time.is_not(None))
+        .group_by(day, table.c.airport_id)
+    )
+    if before is not None:
+        source = source.where(table.c.search_time < before)
+    if since is not None:
+        source = source.where(table.c.search_time >= since)
+    result = db.execute(
+        insert(SearchLogDaily).from_select(["day", "airport_id", "searches", "members"], source)
+    )
+    return result.rowcount or 0
+
+
+def drop_expired_partition(db: Session, month: date, name: str) -> bool:
+    table = partition_table(name)
+    try:
+        compact(db, table)
+        db.execute(text(f"DROP TABLE {quoted(db, name)}"))
+        db.commit()
+    except Exception as e:
+        # Most likely another worker dropped it first
+        db.rollback()
+        print(f"Search logs: could not drop {name}: {e!r}")
+        return False
+    _ensured.discard(name)
+    _partitions.remove(table)
+    return True
+
+
+def expire_in_place(db: Session, table: Table, before: datetime) -> int:
+    """
+    Compacts and deletes rows older than `before` one day at a time, each
+    day in its own transaction: short locks, and a run cut short leaves no
+    day half rolled up.
+    """
+    deleted = 0
+    since = None
+    while True:
+        oldest = select(func.min(table.c.search_time)).where(table.c.search_time < before)
+        if since is not None:
+            oldest = oldest.where(table.c.search_time >= since)
+        first = db.execute(oldest).scalar()
+        if first is None:
+            return deleted
+        if isinstance(first, str):
+            first = datetime.fromisoformat(first)
+        day = datetime.combine(first.date(), dt_time(), tzinfo=timezone.utc)
+        since = min(day + timedelta(days=1), before)
+
+        compact(db, table, before=since, since=day)
+        deleted += db.execute(
+            table.delete().where(table.c.search_time >= day, table.c.search_time < since)
+        ).rowcount
+        db.commit()
+
+
+def try_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name == "postgresql":
+        # Session-level: survives the commits below, unlike an xact lock
+        return bool(db.execute(
+            text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": PARENT}
+        ).scalar())
+    # SQLite allows one writer at a time anyway; this keeps the background
+    # run and an admin run in the same process from interleaving
+    return _maintenance_lock.acquire(blocking=False)
+
+
+def unlock(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        db.rollback()
+        db.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": PARENT})
+        db.commit()
+    else:
+        _maintenance_lock.release()
+
+
+def maintain(now: datetime | None = None) -> dict:
+    """Creates upcoming partitions and drops (after compacting) expired ones."""
+    # One connection for the whole run: the advisory lock lives on it
+    with engine.connect() as conn:
+        db = Session(bind=conn)
+        try:
+            if not try_lock(db):
+                report = {"layout": layout(db), "created": [], "dropped": [], "deleted_rows": 0}
+                db.rollback()
+                return {**report, "skipped": "maintenance already running"}
+            try:
+                return run_maintenance(db, now or datetime.now(timezone.utc))
+            finally:
+                unlock(db)
+        finally:
+            db.close()
+
+
+def run_maintenance(db: Session, now: datetime) -> dict:
+    """maintain() with the lock held."""
+    cutoff = retention_cutoff(now)
+    cutoff_at = datetime.combine(cutoff, dt_time(), tzinfo=timezone.utc)
+    kind = layout(db)
+    report = {"layout": kind, "created": [], "dropped": [], "deleted_rows": 0}
+
+    if kind == "native":
+        existing = list_partitions(db)
+        for n in range(PARTITIONS_AHEAD + 1):
+            month = add_months(month_start(now), n)
+            if month not in existing:
+                ensure_native(db, month)
+                report["created"].append(partition_name(month))
+        db.commit()
+    elif kind == "rotating":
+        ensure_rotating(db, month_start(now))
+        db.commit()
+
+    if kind == "single":
+        report["deleted_rows"] = expire_in_place(db, SearchLog.__table__, cutoff_at)
+        return report
+
+    for month, name in sorted(list_partitions(db).items()):
+        if add_months(month, 1) <= cutoff and drop_expired_partition(db, month, name):
+            report["dropped"].append(name)
+    if kind == "rotating":
+        report["deleted_rows"] = expire_in_place(db, SearchLog.__table__, cutoff_at)
+    return report
+
+
+# -------------------------
+# Background job
+# -------------------------
+def run_periodically():
+    # Workers start together; spread their first runs out
+    if _stop.wait(random.uniform(0, min(MAINTENANCE_INTERVAL_SECONDS, 60))):
+        return
+    while True:
+        try:
+            report = maintain()
+            if report["created"] or report["dropped"] or report["deleted_rows"]:
+                print(f"Search logs maintenance: {report}")
+        except Exception as e:
+            print(f"Search logs maintenance failed: {e!r}")
+        if _stop.wait(MAINTENANCE_INTERVAL_SECONDS):
+            return
+
+
+def start_background_maintenance():
+    """Call once per worker (app lifespan)."""
+    global _thread
+    if MAINTENANCE_INTERVAL_SECONDS <= 0 or (_thread is not None and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=run_periodically, name="search-log-maintenance", daemon=True)
+    _thread.start()
+
+
+def stop_background_maintenance():
+    _stop.set()
@@ -1,7 +1,9 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 import os
+import time
 from dotenv import load_dotenv
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
@@ -22,6 +24,19 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Member statuses whose tokens are honoured. Login issues tokens to
+# new_user and verified members (routers/auth.py); complete-profile moves
+# a signed-in member to pending_verification without ending their session.
+# Anything else (rejected, suspended, ...) or a deleted member is refused.
+ACTIVE_STATUSES = ("new_user", "verified", "pending_verification")
+
+# Token-only routes re-read the member's status at most this often per
+# worker, so a suspension takes effect within it rather than at token
+# expiry. Write and key routes re-read it on every request.
+MEMBER_STATUS_TTL_SECONDS = float(os.getenv("MEMBER_STATUS_TTL_SECONDS", "60"))
+
+_member_statuses = {}   # members_id -> (exists, status, monotonic time read)
+
 
 # Strict authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -33,6 +48,13 @@ oauth2_scheme_optional = OAuth2PasswordBearer(
 )
 
 
+@dataclass(frozen=True)
+class TokenClaims:
+    """Caller identity from the token alone; no DB access."""
+    members_id: int
+    status: Optional[str] = None    # member status when the token was issued
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     now = datetime.now(timezone.utc)
@@ -46,28 +68,117 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_member(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
-) -> Member:
+def create_member_token(member: Member) -> str:
+    # sub = members_id (a string, per the JWT spec). Tokens issued before
+    # this carry the email instead; see load_member.
+    return create_access_token({"sub": str(member.members_id), "status": member.status})
+
+
+def decode_token(token: Optional[str]) -> Optional[dict]:
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+
+def token_subject(token: Optional[str]) -> Optional[str]:
+    """
+    `sub` claim of a valid token, or None. No DB access, so middleware
+    can key things by caller before the route runs.
+    """
+    payload = decode_token(token)
+    return payload.get("sub") if payload else None
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token
+
+
+def member_id_claim(payload: dict) -> Optional[int]:
+    """members_id from `sub`, or None for a legacy (email) token."""
+    sub = payload.get("sub")
+    if isinstance(sub, str) and sub.isdigit():
+        return int(sub)
+    return None
+
+
+def load_member(db: Session, payload: Optional[dict]) -> Optional[Member]:
+    if not payload or not payload.get("sub"):
+        return None
+    members_id = member_id_claim(payload)
+    if members_id is not None:
+        # Primary key: served from the session's identity map if loaded
+        return db.get(Member, members_id)
+    # Legacy token: sub is the email
+    return db.query(Member).filter(Member.email == payload["sub"]).first()
+
+
+def claims_for(db: Session, payload: Optional[dict]) -> Optional[TokenClaims]:
+    if not payload or not payload.get("sub"):
+        return None
+    members_id = member_id_claim(payload)
+    if members_id is not None:
+        return TokenClaims(members_id=members_id, status=payload.get("status"))
+    # Legacy token: one lookup to find out who it is
+    member = load_member(db, payload)
+    if member is None:
+        return None
+    _member_statuses[member.members_id] = (True, member.status, time.monotonic())
+    return TokenClaims(members_id=member.members_id, status=member.status)
 
-    credentials_exception = HTTPException(
+
+def member_status(db: Session, members_id: int, max_age: float) -> tuple[bool, Optional[str]]:
+    """(exists, status), re-read by primary key once older than max_age seconds."""
+    cached = _member_statuses.get(members_id)
+    if cached is not None and time.monotonic() - cached[2] < max_age:
+        return cached[0], cached[1]
+    row = db.query(Member.status).filter(Member.members_id == members_id).first()
+    _member_statuses[members_id] = (row is not None, row and row.status, time.monotonic())
+    return row is not None, row and row.status
+
+
+def forget_member_status(members_id: int):
+    """Call after changing a member's status; other workers catch up within the TTL."""
+    _member_statuses.pop(members_id, None)
+
+
+def check_active(status: Optional[str]):
+    if status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=403, detail="Account is not active")
+
+
+def active_claims(db: Session, claims: TokenClaims, max_age: float) -> TokenClaims:
+    """claims with the member's current status; 401 if deleted, 403 if not active."""
+    exists, current = member_status(db, claims.members_id, max_age)
+    if not exists:
+        raise credentials_exception()
+    check_active(current)
+    return TokenClaims(members_id=claims.members_id, status=current)
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if not email:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
 
-    user = db.query(Member).filter(Member.email == email).first()
+def get_current_member(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> Member:
+    """Full member record, loaded by primary key. Use when the route needs more than the id."""
+    user = load_member(db, decode_token(token))
     if not user:
-        raise credentials_exception
+        raise credentials_exception()
 
     return user
 
@@ -80,16 +191,45 @@ def get_current_member_optional(
     Returns authenticated Member OR None.
     Never raises 401.
     """
+    return load_member(db, decode_token(token))
 
-    if not token:
-        return None
 
+def get_current_claims(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> TokenClaims:
+    """
+    Identity from the token, for routes that only need the caller's
+    members_id. The member's status is checked against a per-worker copy
+    at most MEMBER_STATUS_TTL_SECONDS old (legacy email tokens also cost
+    a lookup to find the member).
+    """
+    claims = claims_for(db, decode_token(token))
+    if claims is None:
+        raise credentials_exception()
+    return active_claims(db, claims, MEMBER_STATUS_TTL_SECONDS)
+
+
+def get_current_claims_fresh(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> TokenClaims:
+    """get_current_claims with the status read now: for writes and key access."""
+    claims = claims_for(db, decode_token(token))
+    if claims is None:
+        raise credentials_exception()
+    return active_claims(db, claims, 0)
+
+
+def get_current_claims_optional(
+    db: Session = Depends(get_db),
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+) -> Optional[TokenClaims]:
+    """Caller's claims, or None (anonymous) for no token or an inactive member."""
+    claims = claims_for(db, decode_token(token))
+    if claims is None:
+        return None
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if not email:
-            return None
-    except JWTError:
+        return active_claims(db, claims, MEMBER_STATUS_TTL_SECONDS)
+    except HTTPException:
         return None
-
-    return db.query(Member).filter(Member.email == email).first()
@@ -1,7 +1,7 @@
 #!/bin/bash
 set -e
 
-echo "From start.sh: Activating venv and Starting uvicorn..."
+echo "From start.sh: Activating venv and Starting gunicorn (uvicorn workers)..."
 
 # App Runner sets WORKDIR to /app//, but be explicit:
 cd /app
@@ -9,5 +9,22 @@ cd /app
 # Activate the virtual environment that we create in the build step
 source .venv/bin/activate
 
-# Run uvicorn from the venv
-exec uvicorn main:app --host 0.0.0.0 --port 8080
+# Schema changes (idempotent; see migrations/)
+python migrate.py
+
+# Each worker runs routes on 40 threads (THREADPOOL_SIZE, AnyIO's default)
+# and hands out at most REQUEST_CONCURRENCY database sessions at once
+# (default DB_POOL_SIZE + DB_MAX_OVERFLOW = 15); requests waiting for a
+# session queue, then get 503. Routes without a session aren't limited.
+# See threadpool.py.
+
+# GET /metrics is off unless METRICS_TOKEN is set; scrapers send it as a
+# bearer token (see main.py).
+
+# Single-process dev mode: SERVER_MODE=dev ./start.sh
+if [ "${SERVER_MODE:-production}" = "dev" ]; then
+    exec uvicorn main:app --host 0.0.0.0 --port 8080
+fi
+
+# Multi-worker production server (see gunicorn.conf.py)
+exec gunicorn -c gunicorn.conf.py main:app
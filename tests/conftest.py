@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# Settings the app reads at import time; a real environment's values win
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("S3_BUCKET", "test-bucket")
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-2")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--benchmark", action="store_true",
+        help="also run wall-clock budget tests (@pytest.mark.benchmark)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: wall-clock budget; skipped without --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="timing budget; run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def db():
+    from database import Base, SessionLocal, engine
+    import models  # noqa: F401 (registers the tables)
+    import security
+
+    Base.metadata.create_all(engine)
+    # Ids are reused between tests; so would be cached member statuses
+    security._member_statuses.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def statements():
+    """SQL statements sent to the database while the test runs."""
+    from database import engine
+
+    sent = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield sent
+    event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    # No lifespan: the background jobs stay off
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def auth_headers():
+    """Bearer headers for a member, as /auth issues them."""
+    from security import create_member_token
+
+    def headers(member) -> dict:
+        return {"Authorization": f"Bearer {create_member_token(member)}"}
+    return headers
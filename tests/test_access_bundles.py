@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import jwt
+
+import access_bundles
+from crud import create_record
+from models import Booking, Car, Member
+
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    monkeypatch.setenv("ACCESS_BUNDLE_PRIVATE_KEY", pem)
+    monkeypatch.setattr(access_bundles, "_key", None)
+
+
+@pytest.fixture
+def member(db):
+    return create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+
+
+@pytest.fixture
+def car(db):
+    return create_record(db, Car, {"registration": "ABC1", "lockbox_ble_name": "LB-1", "keyfob_code": "1234"})
+
+
+def booking(db, member, car, status, start, end):
+    return create_record(db, Booking, {
+        "member_id": member.members_id, "car_id": car.cars_id, "status": status,
+        "start_time": start, "end_time": end,
+    })
+
+
+def upload(client, headers, *events):
+    body = {"events": [
+        {"bookings_id": b.bookings_id, "event": event, "occurred_at": at.isoformat()}
+        for b, event, at in events
+    ]}
+    r = client.post("/bookings/key-events", json=body, headers=headers)
+    assert r.status_code == 200, r.text
+    return [(x["result"], x["detail"]) for x in r.json()["results"]]
+
+
+def test_bundle_verifies_against_published_keys(client, db, member, car, auth_headers, signing_key):
+    b = booking(db, member, car, "confirmed", NOW + timedelta(hours=1), NOW + timedelta(hours=3))
+    r = client.get(f"/bookings/{b.bookings_id}/access-bundle", headers=auth_headers(member))
+    assert r.status_code == 200, r.text
+
+    jwks = client.get("/bookings/access-bundle/keys").json()
+    assert jwks == access_bundles.public_keys()
+    [key] = jwks["keys"]
+    assert jwt.get_unverified_header(r.json()["bundle"])["kid"] == key["kid"] == r.json()["kid"]
+
+    claims = jwt.decode(
+        r.json()["bundle"], key, algorithms=["ES256"],
+        audience=access_bundles.AUDIENCE, issuer=access_bundles.ISSUER,
+        # nbf is 30 minutes before start_time, still ahead of now
+        options={"verify_nbf": False},
+    )
+    assert claims["bid"] == b.bookings_id and claims["sub"] == str(member.members_id)
+    assert claims["car"]["lockbox_ble_name"] == "LB-1"
+    assert claims["exp"] == int((NOW + timedelta(hours=3) + access_bundles.RETURN_GRACE).timestamp())
+
+
+def test_bundle_for_another_members_booking(client, db, member, car, auth_headers, signing_key):
+    other = create_record(db, Member, {"name": "Sam", "email": "sam@example.com", "status": "verified"})
+    b = booking(db, other, car, "confirmed", NOW, NOW + timedelta(hours=2))
+    r = client.get(f"/bookings/{b.bookings_id}/access-bundle", headers=auth_headers(member))
+    assert r.status_code == 403
+
+
+def test_pickup_and_return(client, db, member, car, auth_headers):
+    b = booking(db, member, car, "confirmed", NOW - timedelta(hours=1), NOW + timedelta(hours=1))
+    headers = auth_headers(member)
+    # Uploaded return-first; applied oldest first
+    assert upload(
+        client, headers,
+        (b, "keys_returned", NOW - timedelta(minutes=5)),
+        (b, "keys_retrieved", NOW - timedelta(minutes=50)),
+    ) == [("applied", None), ("applied", None)]
+    db.expire_all()
+    assert db.get(Booking, b.bookings_id).status == "in_progress"
+
+
+def test_replayed_upload_is_a_duplicate(client, db, member, car, auth_headers):
+    b = booking(db, member, car, "confirmed", NOW - timedelta(hours=1), NOW + timedelta(hours=1))
+    event = (b, "keys_retrieved", NOW - timedelta(minutes=50))
+    headers = auth_headers(member)
+    assert upload(client, headers, event) == [("applied", None)]
+    assert upload(client, headers, event) == [("duplicate", "Already recorded")]
+
+
+def test_pickup_after_hire_ended_is_rejected(client, db, member, car, auth_headers):
+    b = booking(db, member, car, "completed", NOW - timedelta(hours=3), NOW - timedelta(hours=1))
+    assert upload(client, auth_headers(member), (b, "keys_retrieved", NOW - timedelta(hours=2))) == [
+        ("rejected", "Cannot complete key retrieval: booking is completed"),
+    ]
+    db.expire_all()
+    assert db.get(Booking, b.bookings_id).status == "completed"
+
+
+def test_return_on_expired_booking(client, db, member, car, auth_headers):
+    # Overdue well past the grace period: a return up to now still counts
+    end = NOW - access_bundles.RETURN_GRACE - timedelta(hours=2)
+    b = booking(db, member, car, "expired", end - timedelta(hours=2), end)
+    headers = auth_headers(member)
+    assert upload(client, headers, (b, "keys_returned", NOW - timedelta(minutes=10))) == [("applied", None)]
+    db.expire_all()
+    assert db.get(Booking, b.bookings_id).keys_returned_at is not None
+
+
+def test_return_outside_window_on_ended_booking(client, db, member, car, auth_headers):
+    end = NOW - access_bundles.RETURN_GRACE - timedelta(hours=2)
+    b = booking(db, member, car, "in_progress", end - timedelta(hours=2), end)
+    assert upload(client, auth_headers(member), (b, "keys_returned", NOW - timedelta(minutes=10))) == [
+        ("rejected", "occurred_at is outside the booking's access window"),
+    ]
+
+
+def test_future_timestamp_is_rejected(client, db, member, car, auth_headers):
+    b = booking(db, member, car, "confirmed", NOW - timedelta(hours=1), NOW + timedelta(hours=1))
+    ahead = NOW + access_bundles.CLOCK_SKEW + timedelta(minutes=5)
+    assert upload(client, auth_headers(member), (b, "keys_retrieved", ahead)) == [
+        ("rejected", "occurred_at is in the future"),
+    ]
+
+
+def test_another_members_booking(client, db, member, car, auth_headers):
+    other = create_record(db, Member, {"name": "Sam", "email": "sam@example.com", "status": "verified"})
+    b = booking(db, other, car, "confirmed", NOW - timedelta(hours=1), NOW + timedelta(hours=1))
+    assert upload(client, auth_headers(member), (b, "keys_retrieved", NOW - timedelta(minutes=5))) == [
+        ("rejected", "Not your booking"),
+    ]
+    db.expire_all()
+    assert db.get(Booking, b.bookings_id).keys_retrieved_at is None
+
+
+def test_event_window():
+    row = Booking(status="in_progress", start_time=NOW - timedelta(hours=2), end_time=NOW - timedelta(hours=1))
+    earliest, latest = access_bundles.event_window(row, "keys_returned", NOW)
+    assert earliest == NOW - timedelta(hours=2) - access_bundles.EARLY_ACCESS - access_bundles.CLOCK_SKEW
+    assert latest == NOW + access_bundles.CLOCK_SKEW  # end + grace is past now
+
+    row.status = "expired"
+    row.end_time = NOW - access_bundles.RETURN_GRACE - timedelta(hours=1)
+    assert access_bundles.event_window(row, "keys_returned", NOW)[1] == NOW + access_bundles.CLOCK_SKEW
+    assert access_bundles.event_window(row, "keys_retrieved", NOW)[1] == (
+        row.end_time + access_bundles.RETURN_GRACE + access_bundles.CLOCK_SKEW
+    )
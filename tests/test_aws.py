@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+from crud import create_record
+from models import Booking, Car, Member
+from utils import aws
+
+
+class StubS3:
+    def __init__(self, region_name):
+        self.region_name = region_name
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"https://stub/{Params['Bucket']}/{Params['Key']}?method={ClientMethod}&expires={ExpiresIn}"
+
+
+@pytest.fixture
+def boto3(monkeypatch):
+    """A stand-in boto3 that counts the clients built from it."""
+    built = []
+
+    def client(service, region_name=None):
+        assert service == "s3"
+        time.sleep(0.01)  # widen the window for racing threads
+        built.append(StubS3(region_name))
+        return built[-1]
+
+    monkeypatch.setitem(sys.modules, "boto3", types.SimpleNamespace(client=client))
+    aws.reset_clients()
+    yield built
+    aws.reset_clients()
+
+
+def test_import_does_not_load_boto3():
+    code = "import sys, utils.aws; print('boto3' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_client_built_once_and_shared(boto3):
+    assert boto3 == []
+    first = aws.get_s3_client()
+    assert aws.get_s3_client() is first and len(boto3) == 1
+    # One per region
+    assert aws.get_s3_client("us-east-1") is not first and len(boto3) == 2
+
+
+def test_threads_share_one_client(boto3):
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(aws.get_s3_client())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(boto3) == 1 and all(c is boto3[0] for c in got)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_builds_its_own(boto3):
+    parent = aws.get_s3_client()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # What gunicorn's post_fork does
+        aws.reset_clients()
+        child = aws.get_s3_client()
+        os.write(write, b"new" if child is not parent else b"shared")
+        os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    assert os.read(read, 16) == b"new"
+    assert aws.get_s3_client() is parent
+
+
+def test_presign_manifest_uses_one_client(client, db, auth_headers, boto3):
+    member = create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+    car = create_record(db, Car, {"registration": "ABC1"})
+    booking = create_record(db, Booking, {
+        "member_id": member.members_id, "car_id": car.cars_id, "status": "confirmed",
+        "start_time": datetime(2026, 11, 2, 9, tzinfo=timezone.utc),
+        "end_time": datetime(2026, 11, 2, 12, tzinfo=timezone.utc),
+    })
+
+    r = client.post(
+        "/upload/presign-booking", json={"booking_id": booking.bookings_id, "phase": "before"},
+        headers=auth_headers(member),
+    )
+    assert r.status_code == 200, r.text
+    slots = r.json()["slots"]
+    assert [s["slot"] for s in slots] == [
+        "photourl_before_front", "photourl_before_left", "photourl_before_right", "photourl_before_rear",
+    ]
+    assert all(s["upload_url"].startswith("https://stub/") and s["key"] in s["upload_url"] for s in slots)
+    assert len(boto3) == 1
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from booking_states import apply_transition
+from crud import create_record
+from models import Airport, Booking, Car, Member
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+@pytest.fixture
+def member(db):
+    return create_record(db, Member, {"name": "Pat", "email": "pat@example.com"})
+
+
+@pytest.fixture
+def booking(db, member):
+    car = create_record(db, Car, {"registration": "ABC1"})
+
+    def make(status):
+        return create_record(db, Booking, {
+            "member_id": member.members_id,
+            "car_id": car.cars_id,
+            "start_time": NOW - timedelta(hours=1),
+            "end_time": NOW + timedelta(hours=2),
+            "status": status,
+        })
+    return make
+
+
+# complete_keys, complete_keys_return and end never checked the status
+@pytest.mark.parametrize("status", ["confirmed", "in_progress", "expired", "completed", None])
+def test_key_transitions_accept_any_status(db, member, booking, status):
+    b = booking(status)
+    b = apply_transition(db, b.bookings_id, member.members_id, "complete_keys")
+    assert b.status == "in_progress" and b.keys_retrieved_at is not None
+
+    b = booking(status)
+    b = apply_transition(db, b.bookings_id, member.members_id, "complete_keys_return")
+    assert b.status == status and b.keys_returned_at is not None
+
+
+@pytest.mark.parametrize("status", ["confirmed", "in_progress", "expired", None])
+def test_end_from_any_open_status(db, member, booking, status):
+    b = booking(status)
+    b = apply_transition(db, b.bookings_id, member.members_id, "end")
+    assert b.status == "completed" and b.hire_ended_at is not None
+
+
+def test_end_of_completed_booking_is_unchanged(db, member, booking):
+    b = booking("completed")
+    b = apply_transition(db, b.bookings_id, member.members_id, "end")
+    assert b.status == "completed" and b.hire_ended_at is None
+
+
+@pytest.mark.parametrize("action, status", [("start", "in_progress"), ("extend", "confirmed")])
+def test_start_and_extend_check_status(db, member, booking, action, status):
+    b = booking(status)
+    with pytest.raises(HTTPException) as exc:
+        apply_transition(db, b.bookings_id, member.members_id, action)
+    assert exc.value.status_code == 400
+
+
+def test_extend_route(client, db, member, auth_headers):
+    airport = create_record(db, Airport, {"name": "SYD", "latitude": -33.9, "longitude": 151.2})
+    car = create_record(db, Car, {"registration": "ABC2", "airport_id": airport.airports_id})
+    b = create_record(db, Booking, {
+        "member_id": member.members_id, "car_id": car.cars_id, "status": "in_progress",
+        "start_time": NOW - timedelta(hours=1), "end_time": NOW + timedelta(hours=2),
+    })
+    r = client.put(
+        f"/bookings/{b.bookings_id}/extend", params={"extension_minutes": 30}, headers=auth_headers(member),
+    )
+    assert r.status_code == 200, r.text
+    assert datetime.fromisoformat(r.json()["end_time"]).replace(tzinfo=timezone.utc) == NOW + timedelta(hours=2, minutes=30)
+
+
+def test_extend_someone_elses_booking(client, db, booking, auth_headers, statements):
+    b = booking("in_progress")
+    other = create_record(db, Member, {"name": "Sam", "email": "sam@example.com"})
+    headers = auth_headers(other)
+    assert client.put("/bookings/999/extend", params={"extension_minutes": 30}, headers=headers).status_code == 404
+
+    statements.clear()
+    r = client.put(f"/bookings/{b.bookings_id}/extend", params={"extension_minutes": 30}, headers=headers)
+    assert r.status_code == 403
+    # The owner's end time is only read with the caller's member_id
+    assert not [s for s in statements if "bookings.end_time" in s and "member_id" not in s]
+    db.expire_all()
+    assert db.get(Booking, b.bookings_id).end_time.replace(tzinfo=timezone.utc) == NOW + timedelta(hours=2)
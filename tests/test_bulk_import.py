@@ -0,0 +1,77 @@
+import pytest
+
+import bulk_import
+from crud import create_record
+from models import Car, Member
+
+CSV = {"content-type": "text/csv"}
+
+
+@pytest.fixture
+def admin(db, auth_headers):
+    member = create_record(db, Member, {"name": "Ad", "email": "admin@example.com", "status": "verified", "platform": "admin"})
+    return {**auth_headers(member), **CSV}
+
+
+def registrations(db):
+    db.expire_all()
+    return {c.registration: c.price_hourly for c in db.query(Car)}
+
+
+def test_insert(client, db, admin):
+    body = "registration,make_model,price_hourly\nABC1,Corolla,20\nABC2,Yaris,18\n"
+    r = client.post("/cars/import", content=body, headers=admin)
+    assert r.status_code == 200, r.text
+    assert r.json() | {"errors": []} == {
+        "mode": "insert", "rows": 2, "inserted": 2, "updated": 0, "failed": 0, "committed": True, "errors": [],
+    }
+    assert registrations(db) == {"ABC1": 20, "ABC2": 18}
+
+
+def test_insert_of_existing_key_fails_whole_import(client, db, admin):
+    create_record(db, Car, {"registration": "ABC1", "price_hourly": 20})
+    body = "registration,price_hourly\nABC2,18\nABC1,25\n"
+    r = client.post("/cars/import", content=body, headers=admin)
+    assert r.status_code == 422
+    report = r.json()["detail"]
+    assert report["committed"] is False and report["inserted"] == 0 and report["failed"] == 1
+    assert report["errors"] == [
+        {"line": 3, "errors": [{"field": "registration", "message": "already exists (use mode=upsert)"}]},
+    ]
+    assert registrations(db) == {"ABC1": 20}
+
+
+def test_upsert_updates_existing_rows(client, db, admin):
+    create_record(db, Car, {"registration": "ABC1", "price_hourly": 20})
+    body = '{"registration": "ABC1", "price_hourly": 25}\n{"registration": "ABC2", "price_hourly": 18}\n'
+    r = client.post(
+        "/cars/import", params={"mode": "upsert"}, content=body,
+        headers={**admin, "content-type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200, r.text
+    assert (r.json()["inserted"], r.json()["updated"]) == (1, 1)
+    assert registrations(db) == {"ABC1": 25, "ABC2": 18}
+
+
+def test_partial_commits_valid_rows(client, db, admin):
+    body = "registration,price_hourly\nABC1,20\nABC2,not-a-number\n,15\nABC3,30\n"
+    r = client.post("/cars/import", params={"partial": "true"}, content=body, headers=admin)
+    assert r.status_code == 200, r.text
+    report = r.json()
+    assert (report["inserted"], report["failed"], report["committed"]) == (2, 2, True)
+    assert [e["line"] for e in report["errors"]] == [3, 4]
+    assert registrations(db) == {"ABC1": 20, "ABC3": 30}
+
+
+def test_duplicate_keys_in_one_upload(client, db, admin, monkeypatch):
+    # Within a chunk and across chunks
+    monkeypatch.setattr(bulk_import, "CHUNK_SIZE", 2)
+    body = "registration\nABC1\nABC1\nABC2\nABC1\n"
+    r = client.post("/cars/import", content=body, headers=admin)
+    assert r.status_code == 422
+    assert r.json()["detail"]["errors"] == [
+        {"line": 3, "errors": [{"field": "registration", "message": "duplicate of line 2"}]},
+        {"line": 5, "errors": [{"field": "registration", "message": "duplicate of line 2"}]},
+    ]
+    assert registrations(db) == {}
+
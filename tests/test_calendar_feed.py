@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from crud import create_record, update_by_id
+from models import Airport, Booking, Car, Member
+from utils.cache import invalidate_member_calendar
+
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture
+def feed(client, db, auth_headers):
+    member = create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+    airport = create_record(db, Airport, {"name": "SYD", "latitude": -33.9, "longitude": 151.2})
+    car = create_record(db, Car, {
+        "registration": "ABC1", "make_model": "Corolla", "airport_id": airport.airports_id,
+        "updated_at": NOW - timedelta(days=3),
+    })
+    booking = create_record(db, Booking, {
+        "member_id": member.members_id, "car_id": car.cars_id, "status": "confirmed",
+        "start_time": NOW + timedelta(days=1), "end_time": NOW + timedelta(days=1, hours=3),
+        "updated_at": NOW - timedelta(days=2),
+    })
+    url = client.get("/calendar/feed", headers=auth_headers(member)).json()["url"]
+    return {"member": member, "booking": booking, "path": url.split("testserver")[1]}
+
+
+def test_feed_validators(client, feed):
+    r = client.get(feed["path"])
+    assert r.status_code == 200 and b"Corolla" in r.content
+    # When the booking last changed, not when the feed was built
+    assert r.headers["Last-Modified"] == format_datetime(
+        (NOW - timedelta(days=2)).replace(microsecond=0), usegmt=True,
+    )
+
+    etag = r.headers["ETag"]
+    assert client.get(feed["path"], headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(feed["path"], headers={"If-None-Match": '"other"'}).status_code == 200
+    ims = r.headers["Last-Modified"]
+    assert client.get(feed["path"], headers={"If-Modified-Since": ims}).status_code == 304
+
+
+def test_booking_change_moves_last_modified(client, db, feed):
+    first = client.get(feed["path"])
+    update_by_id(db, Booking, feed["booking"].bookings_id, {"status": "cancelled"})
+    invalidate_member_calendar(feed["member"].members_id)
+
+    r = client.get(feed["path"], headers={
+        "If-None-Match": first.headers["ETag"], "If-Modified-Since": first.headers["Last-Modified"],
+    })
+    assert r.status_code == 200 and b"Corolla" not in r.content
+    assert r.headers["ETag"] != first.headers["ETag"]
+    assert client.get(feed["path"], headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 200
+
+
+def test_rotated_token_is_rejected(client, feed, auth_headers):
+    assert client.get(feed["path"]).status_code == 200
+    r = client.post("/calendar/feed/rotate", headers=auth_headers(feed["member"]))
+    new_path = r.json()["url"].split("testserver")[1]
+
+    assert client.get(feed["path"]).status_code == 404
+    assert client.get(new_path).status_code == 200
+
+
+@pytest.mark.parametrize("token", ["nope", "1.", "999.secret"])
+def test_unknown_tokens(client, feed, token):
+    assert client.get(f"/calendar/{token}.ics").status_code == 404
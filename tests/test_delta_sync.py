@@ -0,0 +1,62 @@
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+import bulk_import
+import delta_sync
+from crud import create_record
+from models import Member
+
+
+@pytest.fixture
+def members(db, auth_headers):
+    admin = create_record(db, Member, {"name": "Ad", "email": "admin@example.com", "status": "verified", "platform": "admin"})
+    member = create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+    return auth_headers(admin), auth_headers(member)
+
+
+def test_slow_import_is_not_skipped_by_a_sync_during_it(client, members, monkeypatch):
+    admin, member = members
+    # No lag at all: the import's own stamps must land after the cursor
+    monkeypatch.setattr(delta_sync, "SYNC_LAG", timedelta(0))
+    monkeypatch.setattr(delta_sync, "_last_sweep", time.monotonic())  # no tombstone DELETE mid-import
+    monkeypatch.setattr(bulk_import, "CHUNK_SIZE", 1)
+
+    first_chunk_written, synced = threading.Event(), threading.Event()
+    write_chunk = bulk_import.write_chunk
+
+    def slow_write_chunk(*args):
+        failed = write_chunk(*args)
+        if not first_chunk_written.is_set():
+            first_chunk_written.set()
+            synced.wait(10)
+        return failed
+
+    monkeypatch.setattr(bulk_import, "write_chunk", slow_write_chunk)
+
+    result = {}
+
+    def run_import():
+        result["import"] = client.post(
+            "/cars/import", content="registration\nABC1\nABC2\n",
+            headers={**admin, "content-type": "text/csv"},
+        )
+
+    importer = threading.Thread(target=run_import)
+    importer.start()
+    assert first_chunk_written.wait(10)
+
+    # A sync while the import is uncommitted: ABC1 is stamped but invisible
+    time.sleep(0.01)
+    r = client.get("/sync", headers=member)
+    assert r.status_code == 200
+    assert r.json()["cars"] == []
+    cursor = r.json()["cursor"]
+    synced.set()
+    importer.join(10)
+    assert result["import"].status_code == 200, result["import"].text
+
+    r = client.get("/sync", params={"since": cursor}, headers=member)
+    assert sorted(c["registration"] for c in r.json()["cars"]) == ["ABC1", "ABC2"]
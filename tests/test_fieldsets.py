@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from crud import create_record
+from models import Airport, Booking, Car, Member
+from schemas import BookingOut
+from utils.fieldsets import model_columns, parse_fields
+
+START = datetime(2026, 11, 2, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def member(db):
+    member = create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+    airport = create_record(db, Airport, {"name": "SYD", "latitude": -33.9, "longitude": 151.2, "is_active": True})
+    car = create_record(db, Car, {
+        "registration": "ABC1", "make_model": "Corolla", "airport_id": airport.airports_id,
+        "price_hourly": 20, "image_url": "https://img/abc1.jpg", "lockbox_serial": "LB-1",
+    })
+    for day in range(2):
+        create_record(db, Booking, {
+            "member_id": member.members_id, "car_id": car.cars_id, "status": "confirmed",
+            "start_time": START + timedelta(days=day), "end_time": START + timedelta(days=day, hours=3),
+            "photourl_before_front": "https://img/before.jpg",
+        })
+    return member
+
+
+def booking_selects(statements):
+    return [s for s in statements if "FROM bookings" in s or "FROM cars" in s or "FROM airports" in s]
+
+
+def test_parse_fields():
+    assert parse_fields(None, BookingOut) is None
+    assert parse_fields(" status, ,end_time", BookingOut, always=("bookings_id",)) == {
+        "status", "end_time", "bookings_id",
+    }
+    with pytest.raises(HTTPException) as exc:
+        parse_fields("status,nope,photourl_before_front", BookingOut)
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Unknown field(s): nope, photourl_before_front"
+    # "car" is a relationship, not a column
+    assert [c.key for c in model_columns(Booking, {"car", "status", "bookings_id"})] == ["bookings_id", "status"]
+
+
+def test_unknown_field_is_400(client, member, auth_headers):
+    r = client.get("/bookings/", params={"fields": "status,lockbox_serial"}, headers=auth_headers(member))
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Unknown field(s): lockbox_serial"
+
+
+def test_fields_omitted_returns_everything(client, member, auth_headers):
+    r = client.get("/bookings/", headers=auth_headers(member))
+    assert r.status_code == 200
+    [first, _] = r.json()
+    assert set(first) == set(BookingOut.model_fields)
+    assert first["car"]["registration"] == "ABC1" and first["car"]["airport"]["name"] == "SYD"
+
+
+def test_always_fields_are_added(client, member, auth_headers):
+    r = client.get("/bookings/", params={"fields": "status"}, headers=auth_headers(member))
+    assert r.status_code == 200
+    assert [set(b) for b in r.json()] == [{"bookings_id", "status"}] * 2
+
+
+def test_load_only_without_lazy_loads(client, member, auth_headers, statements):
+    headers = auth_headers(member)
+    client.get("/bookings/", headers=headers)  # member status cached
+    statements.clear()
+
+    r = client.get("/bookings/", params={"fields": "status,start_time"}, headers=headers)
+    assert r.status_code == 200
+    [select] = booking_selects(statements)
+    columns = select.split("FROM")[0]
+    assert "bookings.status" in columns and "bookings.start_time" in columns
+    assert "photourl" not in columns and "bookings.end_time" not in columns
+    assert "cars." not in columns
+
+
+def test_nested_car(client, member, auth_headers, statements):
+    headers = auth_headers(member)
+    client.get("/bookings/", headers=headers)
+    statements.clear()
+
+    r = client.get("/bookings/", params={"fields": "car"}, headers=headers)
+    assert r.status_code == 200
+    assert [set(b) for b in r.json()] == [{"bookings_id", "car"}] * 2
+    car = r.json()[0]["car"]
+    assert car["make_model"] == "Corolla" and car["airport"]["latitude"] == -33.9
+    # Car and airport come from the same statement's joins
+    [select] = booking_selects(statements)
+    assert "cars.lockbox_serial" not in select and "bookings.status" not in select.split("FROM")[0]
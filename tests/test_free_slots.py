@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from crud import create_record
+from models import Booking, Car, Member
+from routers.availability import HANDOVER_BUFFER, sweep_free_gaps
+
+T0 = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+
+
+def at(hours: float) -> datetime:
+    return T0 + timedelta(hours=hours)
+
+
+def booked(car_id, start, end):
+    return SimpleNamespace(car_id=car_id, start_time=at(start), end_time=at(end))
+
+
+def gaps(bookings, car_ids=(1,), duration_hours=1, horizon_hours=12):
+    return list(sweep_free_gaps(
+        bookings, list(car_ids), T0, at(horizon_hours), timedelta(hours=duration_hours),
+    ))
+
+
+def test_car_with_no_bookings_is_open_ended():
+    assert gaps([], car_ids=(1, 2)) == [(1, T0, None), (2, T0, None)]
+
+
+def test_trailing_gap_is_open_ended():
+    assert gaps([booked(1, 0, 2)]) == [(1, at(2), None)]
+
+
+def test_trailing_gap_must_fit_before_the_horizon():
+    # Free from 11:00, but bookings after 20:00 + buffer aren't read
+    assert gaps([booked(1, 0, 11)], duration_hours=2) == []
+    assert gaps([booked(1, 0, 10)], duration_hours=2) == [(1, at(10), None)]
+
+
+def test_adjacent_bookings_leave_no_gap():
+    assert gaps([booked(1, 0, 2), booked(1, 2, 4)]) == [(1, at(4), None)]
+
+
+def test_handover_buffer_before_next_booking():
+    # 2 h between bookings, 30 min of it is the buffer
+    bookings = [booked(1, 0, 2), booked(1, 4, 6)]
+    assert gaps(bookings, duration_hours=2) == [(1, at(6), None)]
+    assert gaps(bookings, duration_hours=1.5) == [(1, at(2), at(4) - HANDOVER_BUFFER), (1, at(6), None)]
+
+
+def test_gap_exactly_the_duration():
+    gap_end = at(3) - HANDOVER_BUFFER
+    assert gaps([booked(1, 0, 1), booked(1, 3, 5)], duration_hours=1.5) == [
+        (1, at(1), gap_end), (1, at(5), None),
+    ]
+    assert gaps([booked(1, 0, 1), booked(1, 3, 5)], duration_hours=1.6) == [(1, at(5), None)]
+
+
+def test_gaps_per_car():
+    bookings = [booked(1, 1, 3), booked(2, 0, 12)]
+    # Car 1: 08:00-08:30 is too short; car 2 is booked throughout
+    assert gaps(bookings, car_ids=(1, 2, 3)) == [(1, at(3), None), (3, T0, None)]
+
+
+def test_free_slots_endpoint(client, db, auth_headers):
+    member = create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+    car = create_record(db, Car, {"registration": "ABC1"})
+    hire = create_record(db, Booking, {
+        "member_id": member.members_id, "car_id": car.cars_id, "status": "in_progress",
+        "start_time": at(-2), "end_time": at(1),
+    })
+    params = {"car_id": car.cars_id, "duration_minutes": 60, "after": T0.isoformat(), "horizon_hours": 12}
+
+    r = client.get("/availability/free-slots", params=params)
+    assert r.status_code == 200, r.text
+    [slot] = r.json()["slots"]
+    assert slot["slot_end"] is None
+    assert datetime.fromisoformat(slot["slot_start"]) == at(1)
+
+    # Nothing booked after the hire: no limit, not "until the horizon"
+    r = client.get(
+        "/availability/free-slots", params={**params, "booking_id": hire.bookings_id},
+        headers=auth_headers(member),
+    )
+    assert r.status_code == 200, r.text
+    assert r.json()["max_extension_minutes"] is None and r.json()["next_booking_start"] is None
+    assert r.json()["slots"][0]["slot_end"] is None
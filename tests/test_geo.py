@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from utils.airport_index import AirportIndex
+from utils.geo import KDTree, chord_for_km, haversine_km, to_xyz
+
+
+@pytest.fixture(scope="module")
+def places():
+    rng = random.Random(42)
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(400)]
+    # Clusters at the awkward spots: poles, antimeridian, duplicates
+    points += [(89.9, lon) for lon in (-179.0, 0.0, 120.0)]
+    points += [(-33.9, 179.95), (-33.9, -179.95), (0.0, 180.0), (0.0, -180.0)]
+    points += [(51.47, -0.45)] * 3
+    return points
+
+
+def brute_force(places, lat, lon):
+    return sorted(range(len(places)), key=lambda i: haversine_km(lat, lon, *places[i]))
+
+
+def targets():
+    rng = random.Random(7)
+    yield from [(90.0, 0.0), (-90.0, 0.0), (-33.9, 180.0), (0.0, -179.99), (51.47, -0.45)]
+    for _ in range(50):
+        yield rng.uniform(-90, 90), rng.uniform(-180, 180)
+
+
+@pytest.mark.parametrize("lat, lon", list(targets()))
+def test_nearest_matches_brute_force(places, lat, lon):
+    tree = KDTree([to_xyz(*p) for p in places])
+    expected = brute_force(places, lat, lon)
+    for k in (1, 5, 20):
+        got = tree.nearest(to_xyz(lat, lon), k)
+        distances = [round(haversine_km(lat, lon, *places[i]), 6) for i in got]
+        # Ties (duplicate points) may come back in either order
+        assert distances == [round(haversine_km(lat, lon, *places[i]), 6) for i in expected[:k]]
+
+
+@pytest.mark.parametrize("radius_km", [0.0, 50.0, 800.0, 5000.0, 25000.0])
+def test_within_matches_brute_force(places, radius_km):
+    tree = KDTree([to_xyz(*p) for p in places])
+    for lat, lon in list(targets())[:20]:
+        got = set(tree.within(to_xyz(lat, lon), chord_for_km(radius_km)))
+        expected = {i for i, p in enumerate(places) if haversine_km(lat, lon, *p) <= radius_km}
+        # Float noise can only differ exactly on the boundary
+        edge = {i for i in got ^ expected if abs(haversine_km(lat, lon, *places[i]) - radius_km) > 1e-6}
+        assert edge == set()
+
+
+def test_small_trees():
+    assert KDTree([]).nearest(to_xyz(0, 0), 3) == []
+    assert KDTree([]).within(to_xyz(0, 0), 1.0) == []
+    tree = KDTree([to_xyz(0, 0), to_xyz(0, 10)])
+    assert tree.nearest(to_xyz(0, 9), 0) == []
+    assert tree.nearest(to_xyz(0, 9), 5) == [1, 0]
+
+
+def test_nearby_across_the_antimeridian():
+    airports = [
+        {"airports_id": 1, "name": "Suva", "icao_code": "NFSU", "latitude": -18.04, "longitude": 178.56},
+        {"airports_id": 2, "name": "Nadi", "icao_code": "NFFN", "latitude": -17.76, "longitude": 177.44},
+        {"airports_id": 3, "name": "Apia", "icao_code": "NSFA", "latitude": -13.83, "longitude": -172.01},
+        {"airports_id": 4, "name": "No fix", "icao_code": None, "latitude": None, "longitude": None},
+    ]
+    index = AirportIndex(airports, generation=0)
+    near = index.nearby(-18.0, -179.9, None, 2)
+    assert [a["airports_id"] for a in near] == [1, 2]
+    assert near[0]["distance_km"] == pytest.approx(haversine_km(-18.0, -179.9, -18.04, 178.56))
+    assert [a["airports_id"] for a in index.nearby(-18.0, -179.9, 300, 10)] == [1, 2]
+    assert [a["airports_id"] for a in index.nearby(-18.0, -179.9, 1000, 10)] == [1, 2, 3]
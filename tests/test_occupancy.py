@@ -0,0 +1,85 @@
+import base64
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from crud import create_record
+from models import Airport, Booking, Car, Member
+from utils.occupancy import encode_bitmaps, fleet_occupancy, occupancy_matrix, slot_count
+
+T0 = datetime(2026, 11, 2, tzinfo=timezone.utc)
+SLOT = timedelta(minutes=15)
+
+
+def brute_force(bookings, n_cars, n_slots):
+    busy = [[False] * n_slots for _ in range(n_cars)]
+    for row, start, end in bookings:
+        for s in range(n_slots):
+            slot_start = T0 + s * SLOT
+            if start < slot_start + SLOT and end > slot_start:
+                busy[row][s] = True
+    return busy
+
+
+def test_matrix_matches_brute_force():
+    rng = random.Random(3)
+    n_cars, n_slots = 6, 96
+    bookings = []
+    for _ in range(40):
+        start = T0 + timedelta(minutes=rng.randrange(-300, 1500))
+        bookings.append((rng.randrange(n_cars), start, start + timedelta(minutes=rng.randrange(1, 400))))
+    # Boundaries: exactly on a slot edge, overlapping, zero length
+    bookings += [(0, T0 + SLOT, T0 + 2 * SLOT), (0, T0 + SLOT, T0 + 3 * SLOT), (1, T0 + SLOT, T0 + SLOT)]
+
+    got = fleet_occupancy(bookings, n_cars, [0] * n_cars, T0, SLOT, n_slots)
+    expected = brute_force(bookings, n_cars, n_slots)
+    assert got["busy_slots"] == [sum(r) for r in expected]
+    assert got["bitmaps"] == encode_bitmaps(np.array(expected))
+
+
+def test_partial_slots_count_as_busy():
+    occupied = occupancy_matrix(np.array([0]), np.array([1.2]), np.array([2.01]), 1, 4)
+    assert occupied.tolist() == [[False, True, True, False]]
+
+
+def test_bitmap_bit_order():
+    # Slot 0 is the highest bit of the first byte; rows pad to whole bytes
+    occupied = np.zeros((1, 10), dtype=bool)
+    occupied[0, [0, 9]] = True
+    assert base64.b64decode(encode_bitmaps(occupied)[0]) == bytes([0b10000000, 0b01000000])
+
+
+def test_group_utilization():
+    bookings = [(0, T0, T0 + 2 * SLOT), (2, T0, T0 + 4 * SLOT)]
+    got = fleet_occupancy(bookings, 3, [0, 0, 1], T0, SLOT, 4)
+    assert got["group_cars"] == [2, 1]
+    assert got["group_pct"] == [25.0, 100.0]
+    assert fleet_occupancy([], 0, [], T0, SLOT, 4)["group_pct"] == []
+
+
+def test_slot_count_rounds_up():
+    assert slot_count(T0, T0 + timedelta(minutes=61), SLOT) == 5
+    assert slot_count(T0, T0 + timedelta(hours=1), SLOT) == 4
+
+
+def test_utilization_route(client, db, auth_headers):
+    admin = create_record(db, Member, {"name": "Ad", "email": "ad@example.com", "status": "verified", "platform": "admin"})
+    airport = create_record(db, Airport, {"name": "SYD"})
+    cars = [create_record(db, Car, {"registration": f"C{i}", "airport_id": airport.airports_id}) for i in range(2)]
+    create_record(db, Booking, {
+        "member_id": admin.members_id, "car_id": cars[0].cars_id, "status": "confirmed",
+        "start_time": T0 + timedelta(hours=1), "end_time": T0 + timedelta(hours=2),
+    })
+
+    r = client.get(
+        "/cars/utilization",
+        params={"start": T0.isoformat(), "end": (T0 + timedelta(hours=4)).isoformat(), "slot_minutes": 60},
+        headers=auth_headers(admin),
+    )
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [(c["busy_slots"], c["utilization_pct"]) for c in body["cars"]] == [(1, 25.0), (0, 0.0)]
+    assert base64.b64decode(body["cars"][0]["bitmap"]) == bytes([0b01000000])
+    assert body["airports"] == [{"airports_id": airport.airports_id, "name": "SYD", "cars": 2, "utilization_pct": 12.5}]
@@ -0,0 +1,53 @@
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql
+
+import search_log_partitions as slp
+
+
+class RecordingSession:
+    """Just enough of a Postgres Session for the DDL helpers."""
+
+    def __init__(self):
+        self.sent = []
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=postgresql.dialect())
+
+    def execute(self, statement):
+        self.sent.append(str(statement))
+
+
+def test_ensure_native_ddl():
+    db = RecordingSession()
+    slp.ensure_native(db, date(2026, 12, 1))
+    assert db.sent == [
+        'CREATE TABLE IF NOT EXISTS "search_logs_p2026_12" PARTITION OF "search_logs" '
+        "FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')"
+    ]
+
+
+@pytest.mark.parametrize("name", [
+    "search_logs_p2026_1",
+    "search_logs_p2026_10\n",
+    'search_logs_p2026_10"; DROP TABLE members; --',
+    "members",
+])
+def test_only_partition_names_reach_ddl(name):
+    with pytest.raises(ValueError):
+        slp.quoted(RecordingSession(), name)
+
+
+def test_rotating_maintenance_drops_expired_months(db):
+    now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    slp.log_search(db, {"search_time": datetime(2026, 1, 10, 9, tzinfo=timezone.utc)})
+    slp.log_search(db, {"search_time": datetime(2026, 10, 1, 9, tzinfo=timezone.utc)})
+
+    report = slp.maintain(now)
+    assert report["dropped"] == ["search_logs_p2026_01"]
+    tables = inspect(db.get_bind()).get_table_names()
+    assert "search_logs_p2026_01" not in tables and "search_logs_p2026_10" in tables
+    assert [(r.day, r.searches) for r in db.query(slp.SearchLogDaily)] == [(date(2026, 1, 10), 1)]
@@ -0,0 +1,60 @@
+import pytest
+
+import security
+from crud import create_record, update_by_id
+from models import Member
+
+
+@pytest.fixture
+def member(db):
+    return create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+
+
+def set_status(db, member, status):
+    update_by_id(db, Member, member.members_id, {"status": status})
+
+
+def test_active_member(client, member, auth_headers):
+    assert client.get("/bookings/", headers=auth_headers(member)).status_code == 200
+
+
+def test_suspended_member_refused_within_ttl(client, db, member, auth_headers, monkeypatch):
+    headers = auth_headers(member)
+    assert client.get("/bookings/", headers=headers).status_code == 200
+
+    set_status(db, member, "suspended")
+    # Token-only routes: the cached status stands until the TTL is up
+    assert client.get("/bookings/", headers=headers).status_code == 200
+    monkeypatch.setattr(security, "MEMBER_STATUS_TTL_SECONDS", 0)
+    r = client.get("/bookings/", headers=headers)
+    assert r.status_code == 403
+    assert r.json()["detail"] == "Account is not active"
+
+
+def test_key_routes_read_status_every_time(client, db, member, auth_headers):
+    headers = auth_headers(member)
+    assert client.get("/bookings/", headers=headers).status_code == 200  # caches "verified"
+
+    set_status(db, member, "rejected")
+    assert client.post("/bookings/key-events", json={"events": []}, headers=headers).status_code == 403
+    assert client.get("/bookings/1/access-bundle", headers=headers).status_code == 403
+    assert client.put("/bookings/1/extend", params={"extension_minutes": 30}, headers=headers).status_code == 403
+    assert client.post("/bookings/", json={}, headers=headers).status_code in (403, 422)
+
+
+def test_deleted_member_refused(client, db, member, auth_headers, monkeypatch):
+    headers = auth_headers(member)
+    db.delete(member)
+    db.commit()
+    monkeypatch.setattr(security, "MEMBER_STATUS_TTL_SECONDS", 0)
+    assert client.get("/bookings/", headers=headers).status_code == 401
+    assert client.get("/sync", headers=headers).status_code == 401
+
+
+def test_admin_rejection_takes_effect_at_once(client, db, member, auth_headers):
+    admin = create_record(db, Member, {"name": "Ad", "email": "ad@example.com", "status": "verified", "platform": "admin"})
+    headers = auth_headers(member)
+    assert client.get("/bookings/", headers=headers).status_code == 200
+
+    assert client.post(f"/members/{member.members_id}/reject", headers=auth_headers(admin)).status_code == 200
+    assert client.get("/bookings/", headers=headers).status_code == 403
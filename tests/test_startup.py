@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from benchmarks.startup import DEFERRED_MODULES, first_response_ms, import_time_ms, imported_modules
+
+# Cold start budgets (see benchmarks/startup.py). Locally with SQLite:
+# ~600 ms to import main, ~800 ms to first response. Timings depend on the
+# machine, so these only run with `pytest --benchmark`; the structural
+# check below always runs.
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+FIRST_RESPONSE_BUDGET_MS = float(os.getenv("STARTUP_FIRST_RESPONSE_BUDGET_MS", "2500"))
+
+
+@pytest.mark.benchmark
+def test_import_within_budget():
+    ms = import_time_ms()
+    assert ms <= IMPORT_BUDGET_MS, f"import main took {ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+
+@pytest.mark.benchmark
+def test_first_response_within_budget():
+    ms = min(first_response_ms() for _ in range(2))
+    assert ms <= FIRST_RESPONSE_BUDGET_MS, (
+        f"first response after {ms:.0f} ms (budget {FIRST_RESPONSE_BUDGET_MS:.0f} ms)"
+    )
+
+
+def test_heavy_clients_not_imported_at_startup():
+    assert not set(DEFERRED_MODULES) & imported_modules()
@@ -0,0 +1,84 @@
+import pytest
+
+from utils.airport_index import AirportIndex
+from utils.text_search import PrefixTrie, TrigramIndex, normalize, trigrams, words
+
+
+def test_normalize():
+    assert normalize("  Zürich-Kloten (ZRH) ") == "zurich kloten zrh"
+    assert normalize(None) == "" and words("São Paulo/Guarulhos") == ["sao", "paulo", "guarulhos"]
+    assert trigrams("cat") == {"  c", " ca", "cat", "at "}
+
+
+def test_prefix_trie():
+    trie = PrefixTrie()
+    for doc_id, token in enumerate(["sydney", "syd", "sunshine", "perth"]):
+        trie.add(token, doc_id)
+    trie.add("sydney", 9)
+    assert trie.lookup("syd") == {0, 1, 9}
+    assert trie.lookup("s") == {0, 1, 2, 9}
+    assert trie.lookup("sydneys") == set() and trie.lookup("x") == set()
+    # Empty prefix: nothing is indexed at the root
+    assert trie.lookup("") == set()
+
+
+def test_trigram_similarity():
+    index = TrigramIndex()
+    index.add("melbourne", 1)
+    index.add("brisbane", 2)
+    index.add("melb", 3)
+
+    exact = index.similar("melbourne", 0.0)
+    assert exact[1] == 1.0 and exact[1] > exact.get(3, 0.0)
+    typo = index.similar("melborne", 0.3)
+    assert set(typo) == {1, 3} and 1.0 > typo[1] > typo[3] >= 0.3
+    assert set(index.similar("melborne", 0.5)) == {1}
+    assert index.similar("zzz", 0.0) == {}
+
+
+def test_best_token_per_document():
+    index = TrigramIndex()
+    index.add("gold", 1)
+    index.add("coast", 1)
+    assert index.similar("coast", 0.0)[1] == 1.0
+
+
+@pytest.fixture(scope="module")
+def index():
+    airports = [
+        {"airports_id": 1, "name": "Sydney Kingsford Smith", "icao_code": "YSSY"},
+        {"airports_id": 2, "name": "Sydney Bankstown", "icao_code": "YSBK"},
+        {"airports_id": 3, "name": "Melbourne Tullamarine", "icao_code": "YMML"},
+        {"airports_id": 4, "name": "Avalon", "icao_code": "YMAV"},
+        {"airports_id": 5, "name": "Western Sydney", "icao_code": "YSWS"},
+        {"airports_id": 6, "name": "Gold Coast", "icao_code": "YBCG"},
+    ]
+    for a in airports:
+        a.update(latitude=None, longitude=None)
+    return AirportIndex(airports, generation=0)
+
+
+def ranked(index, q, limit=10):
+    return [(a["airports_id"], a["match"]) for a in index.search(q, limit)]
+
+
+def test_search_ranking(index):
+    assert ranked(index, "YSSY") == [(1, "icao")]
+    assert ranked(index, "ys")[:3] == [(2, "icao_prefix"), (1, "icao_prefix"), (5, "icao_prefix")]
+    # Name prefix before a later word; shorter name first within a kind
+    assert ranked(index, "sydney") == [(2, "name_prefix"), (1, "name_prefix"), (5, "word_prefix")]
+    assert ranked(index, "sydney king", 1) == [(1, "name_prefix")]
+    assert ranked(index, "syd king", 1) == [(1, "word_prefix")]
+    assert ranked(index, "coast gold", 1) == [(6, "word_prefix")]
+
+
+def test_search_fills_with_fuzzy_matches(index):
+    results = index.search("melborne", 3)
+    assert [(a["airports_id"], a["match"]) for a in results][:1] == [(3, "fuzzy")]
+    assert all(a["score"] >= 0.3 for a in results)
+    assert [a["score"] for a in results] == sorted((a["score"] for a in results), reverse=True)
+
+
+def test_search_limit_and_empty(index):
+    assert len(index.search("y", 2)) == 2
+    assert index.search("  ", 5) == [] and index.search("qqqq", 5) == []
@@ -0,0 +1,44 @@
+import anyio
+import pytest
+from anyio import to_thread
+
+import threadpool
+from crud import create_record
+from models import Member
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(threadpool, "REQUEST_CONCURRENCY", 1)
+    monkeypatch.setattr(threadpool, "MAX_QUEUE_SECONDS", 0.1)
+
+    async def semaphore():
+        return anyio.Semaphore(1)
+
+    monkeypatch.setattr(threadpool, "_gate", anyio.run(semaphore))
+    return threadpool._gate
+
+
+def test_threadpool_keeps_anyio_default(monkeypatch):
+    monkeypatch.setattr(threadpool, "_gate", None)
+
+    async def configured():
+        threadpool.configure()
+        return to_thread.current_default_thread_limiter().total_tokens
+
+    assert anyio.run(configured) == 40
+    assert threadpool.REQUEST_CONCURRENCY < threadpool.THREADPOOL_SIZE
+
+
+def test_only_db_routes_wait_for_a_slot(client, db, auth_headers, one_slot):
+    member = create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+    headers = auth_headers(member)
+
+    one_slot.acquire_nowait()  # every session slot taken
+    r = client.get("/bookings/", headers=headers)
+    assert r.status_code == 503 and r.headers["Retry-After"] == "1"
+    assert client.get("/").status_code == 200
+
+    one_slot.release()
+    assert client.get("/bookings/", headers=headers).status_code == 200
+    assert one_slot.value == 1  # released with the session
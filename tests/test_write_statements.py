@@ -0,0 +1,143 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from booking_states import apply_transition
+from crud import create_record, update_by_id
+from models import Airport, Booking, Car, Member, Rate, Subscription
+from schemas import AirportOut, CarOut, MemberOut, RateOut, SubscriptionOut
+
+# crud.py and booking_states.py promise one statement per write: no
+# SELECT before it, no refresh() after it, and nothing lazy-loaded when
+# the result is serialised.
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+@pytest.fixture
+def airport(db):
+    return create_record(db, Airport, {"name": "Moorabbin", "icao_code": "YMMB", "is_active": True})
+
+
+@pytest.fixture
+def member(db):
+    return create_record(db, Member, {"name": "Pat", "email": "pat@example.com", "status": "verified"})
+
+
+@pytest.fixture
+def car(db, airport):
+    return create_record(
+        db, Car, {"registration": "ABC1", "airport_id": airport.airports_id, "status": "active", "price_hourly": 20}
+    )
+
+
+def make_booking(db, member, car, status):
+    return create_record(db, Booking, {
+        "member_id": member.members_id,
+        "car_id": car.cars_id,
+        "start_time": NOW - timedelta(hours=1),
+        "end_time": NOW + timedelta(hours=2),
+        "status": status,
+    })
+
+
+WRITES = {
+    "airport": (
+        AirportOut,
+        lambda db, ctx: create_record(db, Airport, {"name": "Essendon", "icao_code": "YMEN"}),
+        lambda db, ctx: update_by_id(db, Airport, ctx["airport"].airports_id, {"name": "Essendon Fields"}),
+    ),
+    "rate": (
+        RateOut,
+        lambda db, ctx: create_record(db, Rate, {
+            "airports_id": ctx["airport"].airports_id, "rate_name": "Standard", "hourly_rate": 20,
+            "active_from": date(2026, 1, 1), "is_active": True,
+        }),
+        lambda db, ctx: update_by_id(db, Rate, ctx["created"].rates_id, {"hourly_rate": 22}),
+    ),
+    "subscription": (
+        SubscriptionOut,
+        lambda db, ctx: create_record(db, Subscription, {
+            "member_id": ctx["member"].members_id, "platform": "ios", "purchase_token": "t", "status": "active",
+        }),
+        lambda db, ctx: update_by_id(db, Subscription, ctx["created"].subscriptions_id, {"status": "cancelled"}),
+    ),
+    "car": (
+        CarOut,
+        lambda db, ctx: create_record(db, Car, {
+            "registration": "ABC2", "airport_id": ctx["airport"].airports_id, "status": "active",
+        }),
+        lambda db, ctx: update_by_id(db, Car, ctx["created"].cars_id, {"price_hourly": 25}),
+    ),
+    "member": (
+        MemberOut,
+        lambda db, ctx: create_record(db, Member, {"name": "Sam", "email": "sam@example.com"}),
+        lambda db, ctx: update_by_id(db, Member, ctx["created"].members_id, {"name": "Sam Lee"}),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", WRITES)
+def test_create_and_update_are_one_statement(db, statements, airport, member, name):
+    schema, create, update = WRITES[name]
+    ctx = {"airport": airport, "member": member}
+
+    statements.clear()
+    ctx["created"] = create(db, ctx)
+    schema.model_validate(ctx["created"])
+    assert len(statements) == 1, statements
+    assert statements[0].startswith("INSERT")
+
+    statements.clear()
+    updated = update(db, ctx)
+    schema.model_validate(updated)
+    assert len(statements) == 1, statements
+    assert statements[0].startswith("UPDATE")
+
+
+def test_booking_create_and_update_are_one_statement(db, statements, member, car):
+    statements.clear()
+    booking = make_booking(db, member, car, "confirmed")
+    assert len(statements) == 1, statements
+
+    statements.clear()
+    booking = update_by_id(
+        db, Booking, booking.bookings_id, {"end_time": NOW + timedelta(hours=3)},
+        Booking.member_id == member.members_id,
+    )
+    # Photo columns are deferred; RETURNING brings them along
+    assert booking.photourl_before_front is None
+    assert len(statements) == 1, statements
+
+
+@pytest.mark.parametrize("action, status, values", [
+    ("start", "confirmed", None),
+    ("complete_keys", "confirmed", None),
+    ("complete_keys", "in_progress", None),
+    ("complete_keys_return", "in_progress", None),
+    ("complete_keys_return", "completed", None),
+    ("end", "confirmed", None),
+    ("end", "in_progress", None),
+    ("end", "expired", None),
+    ("extend", "in_progress", {"end_time": NOW + timedelta(hours=4)}),
+])
+def test_transitions_are_one_statement(db, statements, member, car, action, status, values):
+    booking = make_booking(db, member, car, status)
+
+    statements.clear()
+    booking = apply_transition(db, booking.bookings_id, member.members_id, action, values=values)
+    assert len(statements) == 1, statements
+    assert statements[0].startswith("UPDATE")
+    assert booking.photourl_before_front is None  # nothing left to lazy-load
+
+
+def test_create_returns_server_defaults(db, statements, client):
+    # created_at is filled by the database (DEFAULT now()), not the app
+    statements.clear()
+    airport = create_record(db, Airport, {"name": "Tyabb"})
+    assert airport.created_at is not None
+    assert len(statements) == 1, statements
+
+    r = client.post("/airports/", json={"name": "Lilydale"})
+    assert r.status_code == 200
+    assert r.json()["created_at"] is not None
@@ -0,0 +1,136 @@
+import math
+import os
+import time
+
+from contextlib import asynccontextmanager
+
+import anyio
+from anyio import to_thread
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from database import DB_MAX_OVERFLOW, DB_POOL_SIZE, engine
+from utils import metrics
+
+# =====================================================
+# Capacity control for sync routes.
+#
+# Every route is a sync `def`, so FastAPI runs it (and each sync dependency,
+# and the response validation) on AnyIO's thread limiter. That stays at
+# AnyIO's default of 40 threads: routes that don't touch the database
+# (health checks, JWKS, presigned uploads) are never held to the pool size.
+#
+# A request keeps its DB connection between those thread hops. If more
+# requests check out sessions than there are connections, the threads end
+# up blocked inside SQLAlchemy waiting for a connection held by a request
+# that is itself queued for a thread -- until pool_timeout fires.
+#
+# So a session is only handed out with a slot from a separate limiter of
+# REQUEST_CONCURRENCY (default: the DB pool's full capacity). get_db waits
+# for one in the event loop (connection_slot), before any thread is taken;
+# excess requests are shed with 503 once the queue is too long or they
+# have waited too long. The Idempotency-Key store takes a slot the same
+# way (run_db). With fewer slots than threads, a request holding a
+# connection always finds a thread to finish on.
+#
+# Telemetry (GET /metrics, per worker):
+#   threadpool.queue_wait_seconds     time each request waited for a slot
+#   threadpool.in_flight / waiting    slots held / requests queued for one
+#   threadpool.active                 threads busy running route code
+#   db.pool.checked_out               connections in use on the primary
+#   threadpool.rejected               requests shed with 503
+#
+# High queue wait while db.pool.checked_out is below the pool size means
+# slots are held by requests between DB calls (or REQUEST_CONCURRENCY is
+# set below the pool).
+# =====================================================
+
+REQUEST_CONCURRENCY = int(os.getenv("REQUEST_CONCURRENCY", "0")) or DB_POOL_SIZE + DB_MAX_OVERFLOW
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
+# Requests allowed to queue before new ones get 503 (0 = never)
+MAX_WAITING = int(os.getenv("THREADPOOL_MAX_WAITING", str(REQUEST_CONCURRENCY * 4)))
+
+# Longest a request may wait for a slot before it gets 503
+MAX_QUEUE_SECONDS = float(os.getenv("THREADPOOL_MAX_QUEUE_SECONDS", "10"))
+
+_gate = None
+
+
+def configure():
+    """Call from the event loop at startup (limiters belong to one event loop)."""
+    global _gate
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # A Semaphore, not a CapacityLimiter: one request may hold a slot for
+    # its route while its middleware takes another for the key store
+    _gate = anyio.Semaphore(REQUEST_CONCURRENCY)
+    metrics.gauge("threadpool.size", THREADPOOL_SIZE)
+    metrics.gauge("threadpool.concurrency", REQUEST_CONCURRENCY)
+    print(
+        f"Threadpool: {THREADPOOL_SIZE} threads, {REQUEST_CONCURRENCY} DB sessions at once, "
+        f"shedding above {MAX_WAITING or 'no limit'} waiting"
+    )
+
+
+def gate() -> anyio.Semaphore:
+    if _gate is None:
+        # Lifespan didn't run (e.g. TestClient outside a with-block)
+        configure()
+    return _gate
+
+
+def pool_checked_out(eng):
+    checkedout = getattr(eng.pool, "checkedout", None)
+    return checkedout() if checkedout else None
+
+
+def record_gauges(stats):
+    metrics.gauge("threadpool.in_flight", REQUEST_CONCURRENCY - _gate.value)
+    metrics.gauge("threadpool.waiting", stats.tasks_waiting)
+    metrics.gauge("threadpool.active", to_thread.current_default_thread_limiter().borrowed_tokens)
+    metrics.gauge("db.pool.checked_out", pool_checked_out(engine))
+
+
+def shed(waiting: int):
+    metrics.incr("threadpool.rejected")
+    retry_after = max(1, math.ceil(waiting / REQUEST_CONCURRENCY))
+    raise HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry shortly.",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+@asynccontextmanager
+async def connection_slot():
+    """
+    A slot for a request's session (database.db_slot, under get_db). Waits
+    in the event loop; 503 when the queue is full or the wait exceeds
+    MAX_QUEUE_SECONDS.
+    """
+    limiter = gate()
+    stats = limiter.statistics()
+    record_gauges(stats)
+    metrics.incr("threadpool.requests")
+    if limiter.value == 0:
+        metrics.incr("threadpool.saturated")
+    if MAX_WAITING and stats.tasks_waiting >= MAX_WAITING:
+        shed(stats.tasks_waiting)
+
+    started = time.monotonic()
+    with anyio.move_on_after(MAX_QUEUE_SECONDS) as scope:
+        await limiter.acquire()
+    metrics.observe("threadpool.queue_wait_seconds", time.monotonic() - started)
+    if scope.cancelled_caught:
+        shed(limiter.statistics().tasks_waiting)
+
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+async def run_db(func, *args):
+    """run_in_threadpool for DB work outside a route (no shedding: it waits)."""
+    async with gate():
+        return await run_in_threadpool(func, *args)
@@ -0,0 +1,205 @@
+import heapq
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from models import Airport
+from utils.cache import get_generations
+from utils.geo import KDTree, chord_for_km, haversine_km, to_xyz
+from utils.text_search import PrefixTrie, TrigramIndex, normalize, words
+
+# =====================================================
+# In-memory index of active airports for /airports/nearby and
+# /airports/search.
+#
+# Built from the primary on first use and rebuilt lazily after any airport
+# write: writers bump the "airports" generation after commit (shared via
+# Redis when REDIS_URL is set), and a query that sees a newer generation
+# than its index rebuilds before answering.
+#
+# Without Redis, generations are per process and a write only reaches the
+# worker that handled it, so every index is also rebuilt once it is older
+# than AIRPORT_INDEX_MAX_AGE_SECONDS (gunicorn.conf.py shortens this when
+# running several workers without Redis).
+# =====================================================
+
+SCOPE = "airports"
+
+AIRPORT_FIELDS = (
+    "airports_id",
+    "name",
+    "icao_code",
+    "latitude",
+    "longitude",
+    "parking_description",
+    "is_active",
+    "created_at",
+)
+
+MAX_AGE_SECONDS = float(os.getenv("AIRPORT_INDEX_MAX_AGE_SECONDS", "3600"))
+
+# Jaccard similarity of trigram sets; pg_trgm's default cut-off
+FUZZY_THRESHOLD = 0.3
+
+# Search match kinds, best first
+MATCH_RANKS = {"icao": 0, "icao_prefix": 1, "name_prefix": 2, "word_prefix": 3}
+
+
+class AirportIndex:
+
+    def __init__(self, airports: list[dict], generation: int):
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self.airports = airports
+
+        # Geo: airports with coordinates, by position in self.airports
+        self.located = [
+            i for i, a in enumerate(airports)
+            if a["latitude"] is not None and a["longitude"] is not None
+        ]
+        self.tree = KDTree([
+            to_xyz(airports[i]["latitude"], airports[i]["longitude"]) for i in self.located
+        ])
+
+        # Text: ICAO code and every word of the name
+        self.icao = [normalize(a["icao_code"]).replace(" ", "") for a in airports]
+        self.name = [normalize(a["name"]) for a in airports]
+        self.trie = PrefixTrie()
+        self.trigrams = TrigramIndex()
+        for i in range(len(airports)):
+            tokens = set(self.name[i].split())
+            if self.icao[i]:
+                tokens.add(self.icao[i])
+            for token in tokens:
+                self.trie.add(token, i)
+                self.trigrams.add(token, i)
+
+    def with_distance(self, i: int, lat: float, lon: float) -> dict:
+        a = self.airports[i]
+        return {**a, "distance_km": haversine_km(lat, lon, a["latitude"], a["longitude"])}
+
+    def nearby(self, lat: float, lon: float, radius_km: float | None, limit: int) -> list[dict]:
+        """Closest first; within radius_km if given, else the `limit` nearest."""
+        target = to_xyz(lat, lon)
+        if radius_km is None:
+            hits = self.tree.nearest(target, limit)
+        else:
+            hits = self.tree.within(target, chord_for_km(radius_km))
+
+        results = [self.with_distance(self.located[i], lat, lon) for i in hits]
+        if radius_km is not None:
+            # Chord test is exact; this only trims float noise at the edge
+            results = [r for r in results if r["distance_km"] <= radius_km]
+        results.sort(key=lambda r: r["distance_km"])
+        return results[:limit]
+
+    def match_kind(self, i: int, query: str) -> str:
+        icao = self.icao[i]
+        if icao and icao == query.replace(" ", ""):
+            return "icao"
+        if icao and icao.startswith(query):
+            return "icao_prefix"
+        if self.name[i].startswith(query):
+            return "name_prefix"
+        return "word_prefix"
+
+    def search(self, q: str, limit: int) -> list[dict]:
+        """
+        Typeahead: every query word must start a word of the name (or the
+        ICAO code). If that finds fewer than `limit`, the rest are filled
+        with typo-tolerant trigram matches, most similar first.
+        """
+        query_words = words(q)
+        if not query_words:
+            return []
+        query = " ".join(query_words)
+
+        hits = None
+        for w in query_words:
+            found = self.trie.lookup(w)
+            hits = set(found) if hits is None else hits & found
+
+        ranked = []
+        for i in hits:
+            kind = self.match_kind(i, query)
+            # Within a kind, the shortest completion first
+            completion = len(self.icao[i]) if kind == "icao_prefix" else len(self.name[i])
+            ranked.append((MATCH_RANKS[kind], completion, self.name[i], i, kind))
+        results = [
+            {**self.airports[i], "match": kind, "score": 1.0}
+            for *_, i, kind in heapq.nsmallest(limit, ranked)
+        ]
+        if len(results) >= limit:
+            return results
+
+        # Fuzzy: average over the query words of their best token similarity
+        totals = {}
+        for w in query_words:
+            for i, score in self.trigrams.similar(w, 0.0).items():
+                if i not in hits:
+                    totals[i] = totals.get(i, 0.0) + score
+        fuzzy = [
+            (-total / len(query_words), self.name[i], i)
+            for i, total in totals.items()
+            if total / len(query_words) >= FUZZY_THRESHOLD
+        ]
+        for neg_score, _, i in heapq.nsmallest(limit - len(results), fuzzy):
+            results.append({**self.airports[i], "match": "fuzzy", "score": round(-neg_score, 3)})
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def load_airports(db: Session) -> list[dict]:
+    rows = (
+        db.query(*[getattr(Airport, f) for f in AIRPORT_FIELDS])
+        .filter(Airport.is_active == True)
+        .all()
+    )
+    return [
+        {
+            **row._asdict(),
+            "latitude": float(row.latitude) if row.latitude is not None else None,
+            "longitude": float(row.longitude) if row.longitude is not None else None,
+        }
+        for row in rows
+    ]
+
+
+def is_current(index: AirportIndex, generation) -> bool:
+    return index.generation == generation and time.monotonic() - index.built_at < MAX_AGE_SECONDS
+
+
+def get_airport_index(db: Session) -> AirportIndex:
+    global _index
+    try:
+        generation = get_generations().get(SCOPE)
+    except Exception as e:
+        # Generation store down: a possibly stale index beats an error
+        print(f"Airport index generation lookup failed: {e!r}")
+        if _index is not None:
+            return _index
+        generation = None
+    index = _index
+    if index is not None and is_current(index, generation):
+        return index
+
+    with _index_lock:
+        if _index is None or not is_current(_index, generation):
+            # Read at `generation`: a write committed during the load bumps
+            # it again, so the next query rebuilds
+            _index = AirportIndex(load_airports(db), generation)
+            print(f"Airport index rebuilt: {len(_index.airports)} airports (generation {generation})")
+        return _index
+
+
+def invalidate_airport_index():
+    """Call after committing any airport write."""
+    try:
+        get_generations().bump(SCOPE)
+    except Exception as e:
+        print(f"Airport index invalidation failed: {e!r}")
@@ -0,0 +1,31 @@
+import threading
+
+# Shared, lazily-built AWS clients.
+# boto3 is slow to import and to build clients for, so nothing here runs
+# at import time: the first request that needs S3 pays the cost once and
+# every router reuses the same client afterwards.
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_s3_client(region_name: str | None = None):
+    client = _clients.get(region_name)
+    if client is not None:
+        return client
+
+    # boto3 session/client creation is not thread-safe
+    with _lock:
+        client = _clients.get(region_name)
+        if client is None:
+            import boto3
+            client = boto3.client("s3", region_name=region_name)
+            _clients[region_name] = client
+    return client
+
+
+def reset_clients():
+    # After fork: drop clients (and their connection pools) from the parent
+    global _lock
+    _clients.clear()
+    _lock = threading.Lock()
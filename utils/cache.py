@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils import metrics
+from utils.events import airport_channel, publish
+from utils.redis_client import get_redis
+
+# =====================================================
+# Short-TTL result cache with per-scope generations.
+#
+# Every entry remembers the generation of its scope (e.g. "airport:3") at
+# the time its data was read. Writers bump the generation AFTER commit;
+# an entry whose generation no longer matches is never served, and a
+# result computed from pre-commit data is never stored. So a confirmed
+# booking makes the old results unreachable immediately, not after TTL.
+#
+# Generations live in-process by default. With REDIS_URL set they are
+# shared, so a write on one worker invalidates every worker's cache.
+# =====================================================
+
+
+class LocalGenerations:
+
+    def __init__(self):
+        self._gens = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope: str) -> int:
+        return self._gens.get(scope, 0)
+
+    def bump(self, scope: str):
+        with self._lock:
+            self._gens[scope] = self._gens.get(scope, 0) + 1
+
+
+class RedisGenerations:
+
+    def __init__(self, client):
+        self._redis = client
+
+    def get(self, scope: str) -> int:
+        return int(self._redis.get(f"gen:{scope}") or 0)
+
+    def bump(self, scope: str):
+        self._redis.incr(f"gen:{scope}")
+
+
+_generations = None
+_generations_lock = threading.Lock()
+
+
+def get_generations():
+    global _generations
+    if _generations is None:
+        with _generations_lock:
+            if _generations is None:
+                client = get_redis()
+                _generations = RedisGenerations(client) if client else LocalGenerations()
+    return _generations
+
+
+class GenerationalCache:
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 5000):
+        self.name = name
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (value, stored_at, scope, generation)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def generation(self, scope: str) -> int:
+        return get_generations().get(scope)
+
+    def get(self, scope: str, key):
+        """Returns (value, age_seconds) or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, stored_at, entry_scope, generation = entry
+        age = time.monotonic() - stored_at
+        try:
+            current = self.generation(entry_scope)
+        except Exception as e:
+            # Can't prove the entry is fresh, so don't serve it
+            print(f"Cache generation lookup failed: {e!r}")
+            return None
+        if age > self.ttl or generation != current:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return value, age
+
+    def put(self, scope: str, key, value, generation: int) -> bool:
+        """Stores value read at `generation`; refused if a write happened since."""
+        if not self.enabled:
+            return False
+        try:
+            if generation != self.generation(scope):
+                return False
+        except Exception:
+            return False
+        with self._lock:
+            self._entries[key] = (value, time.monotonic(), scope, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def invalidate(self, scope: str):
+        get_generations().bump(scope)
+
+
+availability_cache = GenerationalCache(
+    "availability",
+    ttl_seconds=float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "10")),
+)
+
+
+def invalidate_airport_availability(*airport_ids):
+    """Call after committing anything that changes which cars are free. Also notifies subscribers."""
+    for airport_id in {a for a in airport_ids if a is not None}:
+        try:
+            availability_cache.invalidate(f"airport:{airport_id}")
+            metrics.incr("availability.cache.invalidations")
+        except Exception as e:
+            # Generation store down: entries still expire after TTL
+            print(f"Availability cache invalidation failed: {e!r}")
+        # Tell /events/stream subscribers to refetch
+        publish(airport_channel(airport_id), {"type": "availability", "airport_id": airport_id})
+
+
+calendar_cache = GenerationalCache(
+    "calendar",
+    ttl_seconds=float(os.getenv("CALENDAR_CACHE_TTL_SECONDS", "900")),
+)
+
+
+def calendar_scope(members_id: int) -> str:
+    return f"calendar:{members_id}"
+
+
+def invalidate_member_calendar(*member_ids):
+    """Call after committing any change to these members' bookings (or feed token)."""
+    for members_id in {m for m in member_ids if m is not None}:
+        try:
+            calendar_cache.invalidate(calendar_scope(members_id))
+        except Exception as e:
+            # Generation store down: the feed still refreshes after TTL
+            print(f"Calendar cache invalidation failed: {e!r}")
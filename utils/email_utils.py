@@ -5,42 +5,54 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
-from datetime import timezone
+from zoneinfo import ZoneInfo
 
 from models import Booking, Member, Car, Airport
+from utils.ics import vcalendar, vevent
+
+# Times in emails are shown in the operator's local zone
+LOCAL_TZ = ZoneInfo("Australia/Melbourne")
+
+
+def booking_event(
+    bookings_id: int,
+    start_time,
+    end_time,
+    car_name: str,
+    airport_name: str,
+    parking_description: str | None = None,
+    stamp=None,
+    status: str = "CONFIRMED",
+) -> list[str]:
+    """VEVENT for a booking; same UID in the email attachment and the calendar feed."""
+    description = f"Your FlyDrive Connect booking is confirmed. Car: {car_name}, Airport: {airport_name}."
+    if parking_description:
+        description += f" Parking: {parking_description}"
+    return vevent(
+        uid=f"booking-{bookings_id}@flydriveconnect",
+        start=start_time,
+        end=end_time,
+        summary=f"FlyDrive Booking – {car_name}",
+        location=airport_name,
+        description=description,
+        stamp=stamp,
+        status=status,
+    )
+
 
 def generate_booking_ics(booking: Booking, car: Car, airport: Airport) -> str:
     """
     Generate a simple .ics calendar event for the booking.
-    All times are treated as UTC here; adjust if you want local zones.
+    Times are written in UTC; calendar apps show them in local time.
     """
-    mel_tz = ZoneInfo("Australia/Melbourne")
-    
-    start_local = booking.start_time.astimezone(mel_tz)
-    end_local = booking.end_time.astimezone(mel_tz)
-    
-    dt_start = booking.start_time.astimezone(timezone.utc)
-    dt_end = booking.end_time.astimezone(timezone.utc)
-
-    def fmt(dt):
-        return dt.strftime("%Y%m%dT%H%M%SZ")  # UTC format
-
-    uid = f"booking-{booking.bookings_id}@flydriveconnect"
-
-    ics = f"""BEGIN:VCALENDAR
-VERSION:2.0
-PRODID:-//FlyDrive Connect//EN
-BEGIN:VEVENT
-UID:{uid}
-SUMMARY:FlyDrive Booking – {car.make_model or car.registration}
-DTSTART:{fmt(dt_start)}
-DTEND:{fmt(dt_end)}
-LOCATION:{airport.name}
-DESCRIPTION:Your FlyDrive Connect booking is confirmed. Car: {car.make_model or car.registration}, Airport: {airport.name}.
-END:VEVENT
-END:VCALENDAR
-"""
-    return ics
+    return vcalendar([booking_event(
+        booking.bookings_id,
+        booking.start_time,
+        booking.end_time,
+        car.make_model or car.registration,
+        airport.name,
+        airport.parking_description,
+    )])
 
 
 def send_booking_confirmation_email(
@@ -72,6 +84,9 @@ def send_booking_confirmation_email(
         print("Email not sent: member has no email")
         return
 
+    start_local = booking.start_time.astimezone(LOCAL_TZ)
+    end_local = booking.end_time.astimezone(LOCAL_TZ)
+
     subject = f"Your FlyDrive Booking #{booking.bookings_id}"
     body_text = f"""
 Hi {member.name or ''},
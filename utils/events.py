@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+from utils import metrics
+from utils.redis_client import get_redis
+
+# =====================================================
+# Publish / subscribe bus for server-sent events.
+#
+# Write paths publish small change notices after commit:
+#   member:<members_id>   their bookings changed
+#   airport:<airport_id>  availability there may have changed
+# and /events/stream forwards the channels a client subscribed to.
+#
+# In-process by default, so a client only hears about writes served by
+# the same worker. With REDIS_URL set, events go through Redis pub/sub
+# and every worker delivers every event to its own subscribers.
+#
+# Delivery is best effort: a slow client whose queue fills up gets a
+# "resync" event and should refetch instead of relying on the stream.
+# =====================================================
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+REDIS_PREFIX = "events:"
+
+
+class Subscription:
+
+    def __init__(self, bus, channels: set):
+        self.bus = bus
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, channel: str, event: dict):
+        # Any thread; the queue belongs to the subscriber's event loop
+        try:
+            self.loop.call_soon_threadsafe(self._put, channel, event)
+        except RuntimeError:
+            pass    # loop closed (shutting down)
+
+    def _put(self, channel: str, event: dict):
+        try:
+            self.queue.put_nowait((channel, event))
+        except asyncio.QueueFull:
+            self.overflowed = True
+            metrics.incr("events.dropped")
+
+    async def get(self, timeout: float):
+        """(channel, event), or None after `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class LocalBus:
+
+    def __init__(self):
+        self._subscribers = {}      # channel -> set of Subscription
+        self._streams = 0
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, event: dict):
+        self.deliver(channel, event)
+
+    def deliver(self, channel: str, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for sub in subscribers:
+            sub.push(channel, event)
+        metrics.incr("events.delivered", len(subscribers))
+
+    def subscribe(self, channels) -> Subscription:
+        """Call from the event loop that will read the subscription."""
+        sub = Subscription(self, set(channels))
+        with self._lock:
+            for channel in sub.channels:
+                self._subscribers.setdefault(channel, set()).add(sub)
+            self._streams += 1
+            metrics.gauge("events.subscribers", self._streams)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            for channel in sub.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(sub)
+                    if not subscribers:
+                        del self._subscribers[channel]
+            self._streams -= 1
+            metrics.gauge("events.subscribers", self._streams)
+
+
+class RedisBus(LocalBus):
+    """Publishes through Redis; one listener thread per worker fans events out locally."""
+
+    def __init__(self, client):
+        super().__init__()
+        self._redis = client
+        self._listener = None
+
+    def publish(self, channel: str, event: dict):
+        self._redis.publish(REDIS_PREFIX + channel, json.dumps(event, default=str))
+
+    def subscribe(self, channels) -> Subscription:
+        self._start_listener()
+        return super().subscribe(channels)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        backoff = 1.0
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(REDIS_PREFIX + "*")
+                backoff = 1.0
+                for message in pubsub.listen():
+                    if message.get("type") != "pmessage":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self.deliver(channel[len(REDIS_PREFIX):], json.loads(message["data"]))
+            except Exception as e:
+                # Events published while disconnected are lost; clients
+                # resync when their stream reconnects
+                print(f"Event listener lost Redis: {e!r}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                client = get_redis()
+                _bus = RedisBus(client) if client else LocalBus()
+    return _bus
+
+
+def publish(channel: str, event: dict):
+    """Call after commit. Never raises: events are a hint, the DB is the truth."""
+    try:
+        get_bus().publish(channel, event)
+        metrics.incr("events.published")
+    except Exception as e:
+        print(f"Event publish failed on {channel}: {e!r}")
+
+
+def member_channel(members_id: int) -> str:
+    return f"member:{members_id}"
+
+
+def airport_channel(airport_id: int) -> str:
+    return f"airport:{airport_id}"
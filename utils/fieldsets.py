@@ -0,0 +1,73 @@
+from functools import lru_cache
+
+from fastapi import HTTPException, Query
+from fastapi.responses import Response
+from pydantic import ConfigDict, TypeAdapter, create_model
+from sqlalchemy import inspect
+
+# =====================================================
+# Sparse fieldsets: ?fields=cars_id,make_model,price_hourly
+#
+# Screens that show a model and a price shouldn't pay for every image URL
+# and lockbox field. With fields= set, routes select only the matching
+# columns (load_only) and serialise through a model holding just those
+# fields; without it, responses are unchanged.
+#
+# Top-level fields only: a nested object (BookingOut.car) is all or nothing.
+# =====================================================
+
+FIELDS_QUERY = Query(None, description="Comma-separated fields to return (default: all)")
+
+
+def parse_fields(fields: str | None, schema, always: tuple = ()) -> frozenset | None:
+    """Requested fields, checked against the schema; None = all of them."""
+    if fields is None:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}",
+        )
+    return frozenset(requested | set(always))
+
+
+def model_columns(model, fields) -> list:
+    """Column attributes of `model` named in `fields` (for load_only)."""
+    names = {prop.key for prop in inspect(model).column_attrs}
+    return [getattr(model, f) for f in sorted(fields) if f in names]
+
+
+@lru_cache(maxsize=256)
+def partial_model(schema, fields: frozenset):
+    """`schema` cut down to `fields`, same types and defaults."""
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (f.annotation, f) for name, f in schema.model_fields.items() if name in fields},
+    )
+
+
+@lru_cache(maxsize=256)
+def _adapter(schema, fields: frozenset, many: bool) -> TypeAdapter:
+    model = partial_model(schema, fields)
+    return TypeAdapter(list[model] if many else model)
+
+
+def serialize(schema, fields: frozenset, data, many: bool = True):
+    """Like render(), but JSON-ready Python data, to nest in a larger response."""
+    adapter = _adapter(schema, fields, many)
+    return adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json")
+
+
+def render(schema, fields: frozenset, data, many: bool = True) -> Response:
+    """
+    Serialises ORM objects, schema instances or dicts to JSON with only
+    `fields`, skipping response_model (which would fill the rest with nulls).
+    """
+    adapter = _adapter(schema, fields, many)
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(data, from_attributes=True)),
+        media_type="application/json",
+    )
@@ -0,0 +1,98 @@
+import heapq
+import math
+
+# =====================================================
+# Great-circle helpers and a small static KD-tree.
+#
+# Points are indexed as 3D unit vectors rather than (lat, lon): straight-line
+# (chord) distance between unit vectors grows with great-circle distance, so
+# a plain Euclidean KD-tree answers nearest / within-radius queries exactly,
+# with no special cases at the poles or the antimeridian.
+# =====================================================
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def to_xyz(lat: float, lon: float) -> tuple:
+    p, l = math.radians(lat), math.radians(lon)
+    return (math.cos(p) * math.cos(l), math.cos(p) * math.sin(l), math.sin(p))
+
+
+def chord_for_km(km: float) -> float:
+    """Unit-sphere chord length for a great-circle distance."""
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+class KDTree:
+    """Static 3D KD-tree over unit vectors; items are returned by index."""
+
+    def __init__(self, points: list[tuple]):
+        self.points = points
+        # node = (point index, axis, left node, right node)
+        self.root = self._build(list(range(len(points))), 0)
+
+    def _build(self, idx: list[int], depth: int):
+        if not idx:
+            return None
+        axis = depth % 3
+        idx.sort(key=lambda i: self.points[i][axis])
+        mid = len(idx) // 2
+        return (
+            idx[mid],
+            axis,
+            self._build(idx[:mid], depth + 1),
+            self._build(idx[mid + 1:], depth + 1),
+        )
+
+    def within(self, target: tuple, chord: float) -> list[int]:
+        """Indexes of points within `chord` of target."""
+        out = []
+        r2 = chord * chord
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            i, axis, left, right = node
+            p = self.points[i]
+            d2 = (p[0] - target[0]) ** 2 + (p[1] - target[1]) ** 2 + (p[2] - target[2]) ** 2
+            if d2 <= r2:
+                out.append(i)
+            diff = target[axis] - p[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append(near)
+            if diff * diff <= r2:
+                stack.append(far)
+        return out
+
+    def nearest(self, target: tuple, k: int) -> list[int]:
+        """Indexes of the k points closest to target, closest first."""
+        heap = []   # max-heap of (-d2, index)
+
+        def visit(node):
+            if node is None:
+                return
+            i, axis, left, right = node
+            p = self.points[i]
+            d2 = (p[0] - target[0]) ** 2 + (p[1] - target[1]) ** 2 + (p[2] - target[2]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, i))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, i))
+            diff = target[axis] - p[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        if k > 0:
+            visit(self.root)
+        return [i for _, i in sorted(heap, reverse=True)]
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+from utils.time_utils import as_utc
+
+# =====================================================
+# Minimal iCalendar (RFC 5545) writer: escaping, line folding, CRLF.
+# =====================================================
+
+PRODID = "-//FlyDrive Connect//EN"
+
+
+def ics_time(dt: datetime) -> str:
+    return as_utc(dt).strftime("%Y%m%dT%H%M%SZ")
+
+
+def escape(text) -> str:
+    return (
+        str(text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line: str) -> str:
+    """Lines longer than 75 octets continue on the next line after a space."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1    # don't split a UTF-8 sequence
+        parts.append(data[start:end].decode("utf-8"))
+        start, limit = end, 74
+    return "\r\n ".join(parts)
+
+
+def vevent(
+    uid: str,
+    start: datetime,
+    end: datetime,
+    summary: str,
+    location: str | None = None,
+    description: str | None = None,
+    stamp: datetime | None = None,
+    status: str = "CONFIRMED",
+) -> list[str]:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{ics_time(stamp or datetime.now(timezone.utc))}",
+        f"DTSTART:{ics_time(start)}",
+        f"DTEND:{ics_time(end)}",
+        f"SUMMARY:{escape(summary)}",
+        f"STATUS:{status}",
+    ]
+    if location:
+        lines.append(f"LOCATION:{escape(location)}")
+    if description:
+        lines.append(f"DESCRIPTION:{escape(description)}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def vcalendar(events: list[list[str]], name: str | None = None, method: str | None = None) -> str:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN"]
+    if method:
+        lines.append(f"METHOD:{method}")
+    if name:
+        lines.append(f"X-WR-CALNAME:{escape(name)}")
+    for event in events:
+        lines.extend(event)
+    lines.append("END:VCALENDAR")
+    return "".join(fold(line) + "\r\n" for line in lines)
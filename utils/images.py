@@ -0,0 +1,220 @@
+import io
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.aws import get_s3_client
+
+# =====================================================
+# Image derivatives (thumbnail / medium) for car gallery
+# and inspection photos.
+#
+# Originals are uploaded by the app straight to storage via presigned URLs.
+# The ingestion step reads them back, renders every variant in a process
+# pool (Pillow is CPU bound and holds the GIL) and writes the variants next
+# to the original:
+#
+#   cars/1/bookings/7/before/front.jpg
+#   cars/1/bookings/7/before/front_thumb.webp
+#   cars/1/bookings/7/before/front_medium.jpeg
+#
+# Storage is S3 by default. Set MEDIA_ROOT to use a local directory instead
+# (dev / tests); AWS_ENDPOINT_URL points boto3 at an S3 stand-in.
+# =====================================================
+
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_REGION = "ap-southeast-2"
+MEDIA_ROOT = os.getenv("MEDIA_ROOT")
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "/media")
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "0")) or None  # None = cpu count
+
+# longest edge in pixels
+VARIANT_SIZES = {"thumb": 320, "medium": 1024}
+VARIANT_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+IMAGE_SIZES = ("original", *VARIANT_SIZES)
+
+CAR_IMAGE_COLUMNS = [
+    "image_url",
+    "carleft_url",
+    "carright_url",
+    "carback_url",
+    "carfront_url",
+    "cardash_url",
+]
+
+
+# -------------------------
+# Storage
+# -------------------------
+def public_url(key: str) -> str:
+    if MEDIA_ROOT:
+        return f"{MEDIA_BASE_URL}/{key}"
+    return f"https://{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com/{key}"
+
+
+def safe_key(key: str) -> bool:
+    """
+    Relative, already normalised, no "..": photo URLs are set by members,
+    so a key must not be able to step out of the folder it claims to be in.
+    """
+    return (
+        bool(key)
+        and "\\" not in key
+        and not key.startswith("/")
+        and posixpath.normpath(key) == key
+        and ".." not in key.split("/")
+    )
+
+
+def key_from_url(url: str | None, prefix: str = "") -> str | None:
+    """
+    Storage key for one of our own public URLs under `prefix` (e.g. the
+    booking's own folder), None for anything else.
+    """
+    if not url:
+        return None
+    base = public_url("")
+    if not url.startswith(base):
+        return None
+    key = url[len(base):].split("?", 1)[0]
+    if not safe_key(key) or not key.startswith(prefix):
+        return None
+    return key
+
+
+def media_path(key: str) -> str:
+    """Local file for `key`, refusing anything that resolves outside MEDIA_ROOT."""
+    root = os.path.realpath(MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, key))
+    if not safe_key(key) or os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return path
+
+
+def read_object(key: str) -> bytes | None:
+    if MEDIA_ROOT:
+        path = media_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    s3 = get_s3_client()
+    try:
+        return s3.get_object(Bucket=S3_BUCKET, Key=key)["Body"].read()
+    except s3.exceptions.NoSuchKey:
+        return None
+
+
+def write_object(key: str, data: bytes, content_type: str):
+    if MEDIA_ROOT:
+        path = media_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return
+
+    get_s3_client().put_object(
+        Bucket=S3_BUCKET,
+        Key=key,
+        Body=data,
+        ContentType=content_type,
+    )
+
+
+def variant_key(key: str, size: str, fmt: str) -> str:
+    stem = key.rsplit(".", 1)[0]
+    return f"{stem}_{size}.{fmt}"
+
+
+# -------------------------
+# Rendering (runs in worker processes)
+# -------------------------
+def render_variants(data: bytes) -> dict:
+    """Returns {(size, fmt): encoded bytes} for one original image."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+
+        out = {}
+        for size, edge in VARIANT_SIZES.items():
+            resized = img.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            for fmt, (pil_format, _) in VARIANT_FORMATS.items():
+                buf = io.BytesIO()
+                if pil_format == "JPEG":
+                    resized.save(buf, pil_format, quality=82, optimize=True, progressive=True)
+                else:
+                    resized.save(buf, pil_format, quality=80, method=4)
+                out[(size, fmt)] = buf.getvalue()
+        return out
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    # Created on first use so it is never inherited across a fork
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _pool
+
+
+def reset_pool():
+    # After fork: the parent's pool (if any) is not usable from the child
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+# -------------------------
+# Ingestion
+# -------------------------
+def generate_variants(keys: list[str]) -> dict:
+    """
+    Renders and stores every variant for the given originals.
+    Returns {key: {size: {fmt: url}}}; originals missing from storage are skipped.
+    """
+    originals = {key: read_object(key) for key in keys}
+    found = [key for key, data in originals.items() if data is not None]
+    if not found:
+        return {}
+
+    rendered = get_pool().map(render_variants, [originals[key] for key in found])
+
+    result = {}
+    for key, variants in zip(found, rendered):
+        urls = {}
+        for (size, fmt), data in variants.items():
+            vkey = variant_key(key, size, fmt)
+            write_object(vkey, data, VARIANT_FORMATS[fmt][1])
+            urls.setdefault(size, {})[fmt] = public_url(vkey)
+        result[key] = urls
+    return result
+
+
+def pick_image_url(
+    url: str | None,
+    variants: dict | None,
+    column: str,
+    size: str = "original",
+    fmt: str = "webp",
+) -> str | None:
+    """Variant URL for an image column, falling back to the original."""
+    if size == "original" or not variants:
+        return url
+    return (variants.get(column) or {}).get(size, {}).get(fmt) or url
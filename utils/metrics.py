@@ -0,0 +1,52 @@
+import threading
+
+# =====================================================
+# Minimal in-process metrics: counters, gauges and value observations.
+# Served as JSON from GET /metrics (per worker process, METRICS_TOKEN).
+# =====================================================
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_observations = {}   # name -> [count, total, max]
+
+
+def incr(name: str, n: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name: str, value: float):
+    """Last sampled value, e.g. threads currently busy."""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float):
+    with _lock:
+        obs = _observations.setdefault(name, [0, 0.0, 0.0])
+        obs[0] += 1
+        obs[1] += value
+        obs[2] = max(obs[2], value)
+
+
+def ratio(numerator: str, denominator: str) -> float | None:
+    with _lock:
+        total = _counters.get(denominator, 0)
+        return round(_counters.get(numerator, 0) / total, 4) if total else None
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "observations": {
+                name: {
+                    "count": count,
+                    "avg": round(total / count, 6) if count else None,
+                    "max": round(peak, 6),
+                }
+                for name, (count, total, peak) in _observations.items()
+            },
+        }
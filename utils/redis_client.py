@@ -0,0 +1,29 @@
+import os
+import threading
+
+# One lazily-built Redis client per process, shared by the rate limiter,
+# cache generations and replica routing. None when REDIS_URL is unset.
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_redis():
+    global _client
+    if not REDIS_URL:
+        return None
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import redis
+                _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+def reset():
+    # After fork: never share the parent's connection pool
+    global _client, _lock
+    _client = None
+    _lock = threading.Lock()
@@ -0,0 +1,87 @@
+import re
+import unicodedata
+from collections import Counter
+
+# =====================================================
+# Small in-memory text indexes for typeahead.
+#
+# Documents are lists of tokens (words, codes) and are referred to by an
+# integer id chosen by the caller.
+#   PrefixTrie     token prefix -> ids, O(len(prefix)) per lookup
+#   TrigramIndex   typo-tolerant match on pg_trgm-style trigrams,
+#                  scored by Jaccard similarity per token
+# =====================================================
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str | None) -> str:
+    """Lowercase, accents stripped, punctuation collapsed to single spaces."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+def words(text: str | None) -> list[str]:
+    return normalize(text).split()
+
+
+def trigrams(word: str) -> set[str]:
+    # Padded like pg_trgm, so leading characters weigh more than trailing
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PrefixTrie:
+    """Each node keeps the ids under it, so a lookup never walks the subtree."""
+
+    def __init__(self):
+        self.root = {}      # char -> node; node[""] = set of ids
+
+    def add(self, token: str, doc_id: int):
+        node = self.root
+        for ch in token:
+            child = node.get(ch)
+            if child is None:
+                child = node[ch] = {"": set()}
+            child[""].add(doc_id)
+            node = child
+
+    def lookup(self, prefix: str) -> set[int]:
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        return node.get("", set())
+
+
+class TrigramIndex:
+
+    def __init__(self):
+        self.postings = {}      # trigram -> [token number]
+        self.tokens = []        # token number -> (doc id, trigram count)
+
+    def add(self, token: str, doc_id: int):
+        grams = trigrams(token)
+        number = len(self.tokens)
+        self.tokens.append((doc_id, len(grams)))
+        for g in grams:
+            self.postings.setdefault(g, []).append(number)
+
+    def similar(self, word: str, threshold: float) -> dict[int, float]:
+        """doc id -> best similarity of any of its tokens to `word`."""
+        grams = trigrams(word)
+        shared = Counter()
+        for g in grams:
+            shared.update(self.postings.get(g, ()))
+
+        best = {}
+        for number, common in shared.items():
+            doc_id, size = self.tokens[number]
+            score = common / (len(grams) + size - common)
+            if score >= threshold and score > best.get(doc_id, 0.0):
+                best[doc_id] = score
+        return best
@@ -0,0 +1,12 @@
+from datetime import datetime, timezone
+
+
+def as_utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they were stored as UTC
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)